@@ -2,17 +2,37 @@
 SPSS Prep Tool - Package for automating SPSS data preparation.
 
 A Streamlit web application for preparing Google Forms Excel exports for IBM SPSS analysis.
+
+Submodules are imported on first access, so ``import spss_prep`` stays cheap and
+the library modules never import streamlit. The web app lives in ``spss_prep.app``
+and is only loaded when it is run.
+
+``__all__`` lists only the library modules that import without pandas or
+streamlit, so ``from spss_prep import *`` stays cheap as well. The pipeline
+modules (jobs, merge, cache), the programs (cli, service, watcher) and their
+helpers are reached by attribute (``spss_prep.jobs``) or imported directly.
 """
 
+import importlib
+from typing import Any
+
 __version__ = "1.2.0"
 __author__ = "SPSS Prep Tool Contributors"
 __email__ = "your-email@example.com"
 __license__ = "MIT"
 __url__ = "https://github.com/your-org/spss-prep-tool"
 
-__all__ = ["encoder", "sps_generator", "utils", "app"]
+__all__ = ["encoder", "sps_generator", "utils", "likert", "normalize", "analysis", "codebook", "verify", "append"]
 
+# Importable by attribute, but left out of __all__ (pandas, streamlit or programs)
+_OTHER_MODULES = ["merge", "jobs", "cache", "workspace", "memory", "cli", "service", "watcher", "app"]
 
-# Entry point removed - use: streamlit run src/spss_prep/app.py
+
+def __getattr__(name: str) -> Any:
+    """Import submodules lazily (e.g. ``spss_prep.encoder``)."""
+    if name in __all__ or name in _OTHER_MODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+# Entry point removed - use: streamlit run src/spss_prep/app.py
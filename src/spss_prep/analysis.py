@@ -0,0 +1,273 @@
+"""
+Shared per-sheet analysis of distinct values.
+
+A sheet is factorized once into integer codes and its distinct values. Encoding,
+the Excel writer's column widths and the syntax generator's string widths then
+work on the distinct values (O(uniques)) and broadcast through the codes,
+instead of scanning or stringifying every cell again.
+
+Columns are analyzed on first use, so date columns or ignored columns that
+never need their distinct values cost nothing.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .encoder import SPSS_MAX_STRING_WIDTH, ColumnConfig, is_text_dtype, parse_numbers
+from .utils import generate_unique_var_names
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Display format the Excel writer uses for date/time cells
+EXCEL_DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+class ColumnAnalysis:
+    """
+    Distinct values of one column and the code of every cell.
+
+    ``codes`` holds, for each row, the position of its value in ``uniques``
+    (-1 for missing cells). Everything else is derived from the distinct
+    values on first use and kept.
+    """
+
+    __slots__ = ('codes', 'uniques', '_keys', '_counts', '_numbers', '_lookups')
+
+    def __init__(self, values: pd.Series):
+        import pandas as pd
+
+        self.codes, self.uniques = pd.factorize(values)
+        self._keys: Optional[List[str]] = None
+        self._counts: Optional[np.ndarray] = None
+        self._numbers: Optional[np.ndarray] = None
+        self._lookups: Dict[ColumnConfig, np.ndarray] = {}
+
+    @property
+    def keys(self) -> List[str]:
+        """Distinct values as strings (the keys of value mappings)."""
+        if self._keys is None:
+            self._keys = [str(value) for value in self.uniques]
+        return self._keys
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of cells holding each distinct value."""
+        if self._counts is None:
+            import numpy as np
+
+            # Shifting by one keeps missing cells (-1) in bin 0 instead of filtering them out
+            self._counts = np.bincount(self.codes + 1, minlength=len(self.uniques) + 1)[1:]
+        return self._counts
+
+    @property
+    def has_missing(self) -> bool:
+        """Whether any cell is missing."""
+        return bool(len(self.codes)) and int(self.codes.min()) < 0
+
+    def source_kind(self) -> str:
+        """
+        How SPSS reads the raw column from the uploaded workbook.
+
+        Returns:
+            'number' for numeric (or empty) columns, 'date' for date cells,
+            'text' for everything else
+        """
+        import pandas as pd
+
+        if is_text_dtype(self.uniques.dtype):
+            return 'text'
+        kind = pd.api.types.infer_dtype(self.uniques, skipna=True)
+        if kind in ('empty', 'integer', 'floating', 'mixed-integer-float', 'decimal'):
+            return 'number'
+        if kind in ('datetime64', 'datetime', 'date'):
+            return 'date'
+        return 'text'
+
+    def numbers(self) -> np.ndarray:
+        """Parsed number of each distinct value (NaN where not numeric)."""
+        if self._numbers is None:
+            self._numbers = parse_numbers(self.uniques)
+        return self._numbers
+
+    def lookup(self, config: ColumnConfig) -> np.ndarray:
+        """
+        Output value of each distinct value under a configuration (computed once).
+
+        Categories map through the configured codes (and the spelling
+        normalization recorded at detection); Scale columns use the numbers
+        from detection and parse only values it did not see.
+
+        Args:
+            config: Ordinal, Nominal or Scale configuration of the column
+
+        Returns:
+            float array with one entry per distinct value plus a trailing NaN,
+            so that ``lookup[codes]`` maps missing cells (-1) to NaN
+        """
+        table = self._lookups.get(config)
+        if table is None:
+            import numpy as np
+
+            if config.encoding_type == 'Scale':
+                numbers = config.get_numbers()
+                table = np.array([numbers.get(key, np.nan) for key in self.keys] + [np.nan], dtype=float)
+                unseen = [index for index, key in enumerate(self.keys) if key not in numbers]
+                if unseen:
+                    table[unseen] = self.numbers()[unseen]
+            else:
+                mapping = config.get_mapping()
+                value_map = config.value_map
+                table = np.array(
+                    [mapping.get(value_map.get(key, key), np.nan) for key in self.keys] + [np.nan],
+                    dtype=float
+                )
+            table.flags.writeable = False
+            self._lookups[config] = table
+        return table
+
+    def encode(self, config: ColumnConfig, index: Any) -> pd.Series:
+        """
+        Broadcast the lookup table of a configuration to all rows.
+
+        Args:
+            config: Ordinal, Nominal or Scale configuration of the column
+            index: Index of the output column
+
+        Returns:
+            int64 column when every cell got a whole number, float64 otherwise
+        """
+        import numpy as np
+        import pandas as pd
+
+        table = self.lookup(config)
+        encoded = table[self.codes]
+        if _whole_numbers(table, self.has_missing):
+            encoded = encoded.astype(np.int64)
+        return pd.Series(encoded, index=index)
+
+    def text_width(self) -> int:
+        """Length of the longest distinct value as text."""
+        return max((len(key) for key in self.keys), default=0)
+
+    def spss_string_width(self) -> int:
+        """SPSS string width (UTF-8 bytes) of the longest distinct value."""
+        width = max((len(key.encode('utf-8')) for key in self.keys), default=1)
+        return min(max(width, 1), SPSS_MAX_STRING_WIDTH)
+
+    def encoded_width(self, config: ColumnConfig) -> int:
+        """Length of the longest encoded value as text, without encoding the column."""
+        import numpy as np
+
+        table = self.lookup(config)
+        values = table[:-1][~np.isnan(table[:-1])]
+        if _whole_numbers(table, self.has_missing):
+            return max((len(str(int(value))) for value in values), default=0)
+        return max((len(str(float(value))) for value in values), default=0)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the codes."""
+        return int(self.codes.nbytes)
+
+
+def _whole_numbers(table: np.ndarray, has_missing: bool) -> bool:
+    """Whether a column encoded with this table is written as int64."""
+    import numpy as np
+
+    values = table[:-1]
+    if has_missing or np.isnan(values).any():
+        return False
+    return bool(np.array_equal(values, np.round(values)))
+
+
+class DatasetAnalysis:
+    """
+    Analysis of one sheet, built once and shared by the pipeline stages.
+
+    Holds the column analyses (created on first access) and the unique SPSS
+    variable names of the sheet's columns.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._columns: Dict[Any, ColumnAnalysis] = {}
+        self._var_names: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def column(self, name: Any) -> ColumnAnalysis:
+        """
+        Analysis of a column (factorized on first access).
+
+        Args:
+            name: Column name
+
+        Returns:
+            ColumnAnalysis of the column
+        """
+        with self._lock:
+            analysis = self._columns.get(name)
+            if analysis is None:
+                analysis = ColumnAnalysis(self.df[name])
+                self._columns[name] = analysis
+            return analysis
+
+    @property
+    def var_names(self) -> Dict[str, str]:
+        """Unique SPSS variable name of every column (see generate_unique_var_names)."""
+        if self._var_names is None:
+            self._var_names = generate_unique_var_names(list(self.df.columns))
+        return self._var_names
+
+    def content_widths(self, configs: Dict[str, ColumnConfig]) -> List[int]:
+        """
+        Widest cell text of each column of the encoded sheet, from distinct values only.
+
+        Args:
+            configs: Column configurations used for encoding
+
+        Returns:
+            One width per column, in column order (headers not included)
+        """
+        widths = []
+        for col in self.df.columns:
+            config = configs.get(col)
+            encoding_type = config.encoding_type if config is not None else 'Ignore'
+            if encoding_type == 'Date' or self.df[col].dtype.kind == 'M':
+                width = len(EXCEL_DATETIME_FORMAT)
+            elif config is not None and encoding_type in ('Ordinal', 'Nominal', 'Scale'):
+                width = self.column(col).encoded_width(config)
+            else:
+                width = self.column(col).text_width()
+            widths.append(width)
+        return widths
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the analyzed columns."""
+        with self._lock:
+            return sum(analysis.nbytes for analysis in self._columns.values())
+
+
+def analyze_frames(frames: Dict[str, pd.DataFrame]) -> Dict[str, DatasetAnalysis]:
+    """
+    Create one (lazy) analysis per sheet.
+
+    Args:
+        frames: Dictionary of sheet name -> dataframe
+
+    Returns:
+        Dictionary of sheet name -> DatasetAnalysis
+    """
+    return {sheet_name: DatasetAnalysis(df) for sheet_name, df in frames.items()}
+
+
+def analysis_for(df: pd.DataFrame, analysis: Optional[DatasetAnalysis]) -> DatasetAnalysis:
+    """Use a shared analysis if it belongs to this dataframe, or analyze it now."""
+    if analysis is not None and analysis.df is df:
+        return analysis
+    return DatasetAnalysis(df)
+
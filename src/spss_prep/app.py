@@ -14,61 +14,196 @@ TODO LIST (In-Code):
 [P1] Multi-response detection & warning - DONE
 [P2] Preview SPSS syntax in UI - DONE
 [P2] Download buttons for files - DONE
+[P2] Sample-first detection with background refinement - DONE
+[P2] Multi-sheet workbooks (one dataset per sheet) - DONE
+[P2] Multi-file merge with a shared codebook - DONE
+[P2] Merge spelling variants of answers - DONE
+[P2] Spill session data to disk and resume after reconnects - DONE
+[P2] Server-wide memory budget with LRU eviction of idle sessions - DONE
 """
 
 import streamlit as st
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
-import tempfile
-from typing import Dict, List, Optional
+from typing import Dict, List, Sequence
 import logging
 
-from .encoder import detect_columns, ColumnConfig, apply_encoding, save_encoded_excel
-from .sps_generator import generate_sps_syntax, save_sps_file
-from .utils import sanitize_variable_name, generate_unique_var_names, is_likely_likert, is_multi_response
+from .encoder import (
+    apply_bulk_order, default_column_config, detect_columns, detect_columns_sample,
+    detect_sheets, load_workbook, merge_column_order, ColumnConfig
+)
+from .cache import get_default_cache, hash_bytes
+from .jobs import CANCELLED, DONE, FAILED, run_cached_encoding_pipeline, submit_job
+from .memory import get_default_governor
+from .merge import MERGED_SHEET, build_shared_codebook, detect_merged, load_files, run_merge_pipeline
+from .workspace import SessionWorkspace, WorkspaceQuotaExceeded, start_cleanup_thread
+from .likert import infer_likert_order
+from .normalize import align_order
+from .verify import skipped_checks, verification_issues
+from .utils import sanitize_variable_name, generate_unique_var_names
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Page config
-st.set_page_config(
-    page_title="SPSS Prep Tool",
-    page_icon="📊",
-    layout="wide"
-)
+# Shared pool for background full-data detection (one task per upload)
+_detection_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="detect")
 
-# Initialize session state
-if 'uploaded_file' not in st.session_state:
-    st.session_state.uploaded_file = None
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'column_info' not in st.session_state:
-    st.session_state.column_info = {}
-if 'column_configs' not in st.session_state:
-    st.session_state.column_configs = {}
-if 'column_orders' not in st.session_state:
-    st.session_state.column_orders = {}
-if 'encoded_df' not in st.session_state:
-    st.session_state.encoded_df = None
-if 'sps_syntax' not in st.session_state:
-    st.session_state.sps_syntax = None
-if 'encoded_path' not in st.session_state:
-    st.session_state.encoded_path = None
-if 'sps_path' not in st.session_state:
-    st.session_state.sps_path = None
-if 'unique_var_names' not in st.session_state:
-    st.session_state.unique_var_names = {}
+# Files in the session workspace that let a reconnecting browser resume
+STATE_FILE = 'session_state.pkl'
+COLUMN_INFO_FILE = 'column_info.pkl'
+PREVIEW_FILE = 'encoded_preview.pkl'
+BUNDLE_FILE = 'spss_prep_output.zip'
+
+
+def init_session_state() -> None:
+    """Initialize session state on the first run of a session."""
+    if 'workspace' not in st.session_state:
+        # Restores the saved state first, so the defaults below only fill gaps
+        st.session_state.workspace = open_workspace()
+    if 'source' not in st.session_state:
+        st.session_state.source = None
+    if 'resumed' not in st.session_state:
+        st.session_state.resumed = False
+    if 'page_running' not in st.session_state:
+        st.session_state.page_running = False
+    if 'column_info' not in st.session_state:
+        st.session_state.column_info = {}
+    if 'column_configs' not in st.session_state:
+        st.session_state.column_configs = {}
+    if 'column_orders' not in st.session_state:
+        st.session_state.column_orders = {}
+    if 'encoded_frames' not in st.session_state:
+        st.session_state.encoded_frames = None
+    if 'sps_syntax' not in st.session_state:
+        st.session_state.sps_syntax = None
+    if 'verification' not in st.session_state:
+        st.session_state.verification = {}
+    if 'output_bundle' not in st.session_state:
+        st.session_state.output_bundle = None
+    if 'unique_var_names' not in st.session_state:
+        st.session_state.unique_var_names = {}
+    if 'detection_future' not in st.session_state:
+        st.session_state.detection_future = None
+    if 'encoding_job' not in st.session_state:
+        st.session_state.encoding_job = None
+    if 'bulk_order_errors' not in st.session_state:
+        st.session_state.bulk_order_errors = {}
+
+
+def open_workspace() -> SessionWorkspace:
+    """
+    Reopen the workspace named in the page URL, or start a new one.
+    
+    The session id is kept in the URL (?session=...), so a browser that
+    reconnects or reloads the page gets its data back from disk.
+    
+    Returns:
+        The session workspace
+    """
+    workspace = SessionWorkspace.resume(st.query_params.get('session'))
+    if workspace is None:
+        workspace = SessionWorkspace()
+    else:
+        restore_session_state(workspace)
+    st.query_params['session'] = workspace.session_id
+    return workspace
+
+
+def restore_session_state(workspace: SessionWorkspace) -> None:
+    """Load the state saved by save_session_state into a new session."""
+    state = workspace.load_object(STATE_FILE)
+    if state is None or not workspace.has_frames():
+        return
+    
+    st.session_state.source = state['source']
+    st.session_state.resumed = True
+    st.session_state.column_configs = state['column_configs']
+    st.session_state.column_orders = state['column_orders']
+    st.session_state.unique_var_names = state['unique_var_names']
+    
+    # A sample-only detection is redone: its background full pass did not survive
+    column_info = workspace.load_object(COLUMN_INFO_FILE) or {}
+    if not any(info.get('is_sample') for sheet_info in column_info.values() for info in sheet_info.values()):
+        st.session_state.column_info = column_info
+    
+    if state['sps_syntax']:
+        st.session_state.sps_syntax = state['sps_syntax']
+        st.session_state.verification = state.get('verification', {})
+        st.session_state.encoded_frames = workspace.load_object(PREVIEW_FILE)
+        st.session_state.output_bundle = workspace.file_path(BUNDLE_FILE)
+    logger.info(f"Resumed session {workspace.session_id}")
+
+
+def save_session_state() -> None:
+    """Save configurations and outputs next to the spilled frames."""
+    if st.session_state.source is None:
+        return
+    st.session_state.workspace.save_object(STATE_FILE, {
+        'source': st.session_state.source,
+        'column_configs': st.session_state.column_configs,
+        'column_orders': st.session_state.column_orders,
+        'unique_var_names': st.session_state.unique_var_names,
+        'sps_syntax': st.session_state.sps_syntax,
+        'verification': st.session_state.verification,
+    })
+
+
+def save_column_info() -> None:
+    """Save detection results (rewritten only when detection changes them)."""
+    st.session_state.workspace.save_object(COLUMN_INFO_FILE, st.session_state.column_info)
+
+
+def spill_upload(uploaded_files: List, normalize_answers: bool) -> Dict:
+    """
+    Parse uploaded files once and spill their sheets to the session workspace.
+    
+    Later runs memory-map the sheets from disk instead of parsing again.
+    
+    Args:
+        uploaded_files: Files from the uploader (several files are merged)
+        normalize_answers: Merge spelling variants of answers
+        
+    Returns:
+        Description of the data source (also stored as st.session_state.source)
+    """
+    reset_detection_state()
+    merge_mode = len(uploaded_files) > 1
+    if merge_mode:
+        # Several exports of one form: first sheet of each file
+        frames = load_files({f.name: f for f in uploaded_files})
+        input_hash = None
+    else:
+        # Read every sheet of the workbook
+        frames = load_workbook(uploaded_files[0])
+        input_hash = hash_bytes(uploaded_files[0].getvalue())
+    
+    workspace = st.session_state.workspace
+    workspace.save_frames(frames)
+    # The next access maps the spilled files instead of keeping the parsed frames
+    get_default_governor().discard([workspace.session_id])
+    
+    source = {
+        'file_ids': [getattr(f, 'file_id', f.name) for f in uploaded_files],
+        'file_names': [f.name for f in uploaded_files],
+        'merge_mode': merge_mode,
+        'normalize_answers': normalize_answers,
+        'input_hash': input_hash,
+    }
+    st.session_state.source = source
+    st.session_state.resumed = False
+    return source
 
 
 def get_todo_status() -> Dict[str, bool]:
     """Calculate TODO completion status based on app state."""
     status = {
-        'upload': st.session_state.uploaded_file is not None,
+        'upload': st.session_state.source is not None,
         'detect': st.session_state.column_info != {},
         'configure': len(st.session_state.column_configs) > 0,
-        'apply': st.session_state.encoded_df is not None,
+        'apply': st.session_state.encoded_frames is not None,
         'preview': st.session_state.sps_syntax is not None,
-        'download': st.session_state.encoded_path is not None
+        'download': st.session_state.output_bundle is not None
     }
     return status
 
@@ -109,67 +244,278 @@ def render_sidebar():
         help="Add SAVE OUTFILE command to .sps to create .sav file"
     )
     
-    write_same_folder = st.sidebar.checkbox(
-        "Write .sps to same folder as encoded file",
-        value=True,
-        help="Place the .sps file next to the encoded Excel file"
-    )
-    
     sanitize_names = st.sidebar.checkbox(
         "Sanitize variable names for SPSS",
         value=True,
         help="Convert column names to SPSS-compatible format"
     )
     
+    normalize_answers = st.sidebar.checkbox(
+        "Merge spelling variants of answers",
+        value=False,
+        help="Treat answers that only differ in case, spaces or Arabic letter forms "
+             "(أ/إ/ا, ة/ه, diacritics, tatweel) as one category"
+    )
+    
+    cache_stats = get_default_cache().stats()
+    st.sidebar.caption(
+        f"♻️ Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries"
+    )
+    
+    render_memory_stats()
+    
     st.sidebar.markdown("---")
     
     if st.sidebar.button("🔄 Reset UI / Clear State"):
+        get_default_governor().discard([st.session_state.workspace.session_id])
+        st.session_state.workspace.cleanup()
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.rerun()
     
-    return include_save, write_same_folder, sanitize_names
+    return include_save, sanitize_names, normalize_answers
+
+
+def render_memory_stats() -> None:
+    """Show how much memory the loaded sheets of all sessions use."""
+    stats = get_default_governor().stats()
+    mb = 1024 * 1024
+    st.sidebar.caption(
+        f"🧠 Session memory: {stats['bytes'] / mb:.1f} / {stats['budget_bytes'] / mb:.0f} MB, "
+        f"{stats['sessions']} sessions loaded, {stats['evictions']} evictions"
+    )
+    if stats['per_session']:
+        with st.sidebar.expander("Memory per session"):
+            current = st.session_state.workspace.session_id
+            for session_id, nbytes, idle in stats['per_session']:
+                label = "this session" if session_id == current else session_id[:8]
+                st.caption(f"{label}: {nbytes / mb:.1f} MB, idle {idle:.0f}s")
 
 
-def move_option_up(column: str, index: int):
+def move_option_up(sheet_name: str, column: str, index: int):
     """Move an option up in the order."""
     if index > 0:
-        order = st.session_state.column_orders[column]
+        order = st.session_state.column_orders[sheet_name][column]
         order[index], order[index-1] = order[index-1], order[index]
-        st.session_state.column_orders[column] = order
+        st.session_state.column_orders[sheet_name][column] = order
 
 
-def move_option_down(column: str, index: int):
+def move_option_down(sheet_name: str, column: str, index: int):
     """Move an option down in the order."""
-    order = st.session_state.column_orders[column]
+    order = st.session_state.column_orders[sheet_name][column]
     if index < len(order) - 1:
         order[index], order[index+1] = order[index+1], order[index]
-        st.session_state.column_orders[column] = order
+        st.session_state.column_orders[sheet_name][column] = order
+
+
+def apply_pasted_order(sheet_name: str, column: str, text_key: str) -> None:
+    """Replace an order with the values pasted into the bulk editor."""
+    order = st.session_state.column_orders[sheet_name][column]
+    lines = st.session_state[text_key].splitlines()
+    key = f"{sheet_name}_{column}"
+    try:
+        st.session_state.column_orders[sheet_name][column] = apply_bulk_order(order, lines)
+    except ValueError as e:
+        st.session_state.bulk_order_errors[key] = str(e)
+    else:
+        st.session_state.bulk_order_errors.pop(key, None)
+
+
+def apply_refined_detection() -> bool:
+    """
+    Merge the result of the background full-data detection, if it finished.
+    
+    Newly discovered values are appended to each column's order so any
+    reordering done on the sample is kept.
+    
+    Returns:
+        True if a refined result was merged into the session state
+    """
+    future = st.session_state.detection_future
+    if future is None or not future.done():
+        return False
+    
+    st.session_state.detection_future = None
+    try:
+        full_info = future.result()
+    except Exception as e:
+        logger.error(f"Background detection failed: {str(e)}", exc_info=True)
+        for sheet_info in st.session_state.column_info.values():
+            for info in sheet_info.values():
+                info.pop('is_sample', None)
+        save_column_info()
+        return True
+    
+    for sheet_name, sheet_info in full_info.items():
+        orders = st.session_state.column_orders.get(sheet_name, {})
+        for col_name, info in sheet_info.items():
+            if col_name in orders:
+                order = orders[col_name]
+                if info.get('value_map'):
+                    # The full pass may spell an answer differently than the sample did
+                    order = align_order(order, info['unique_values'])
+                orders[col_name] = merge_column_order(order, info['unique_values'])
+    st.session_state.column_info = full_info
+    save_column_info()
+    logger.info("Merged full-data column detection")
+    return True
+
+
+@st.fragment(run_every=1.0)
+def watch_refinement() -> None:
+    """Poll the background detection and rerun the page once it completes."""
+    future = st.session_state.detection_future
+    if future is None:
+        return
+    if future.done():
+        st.rerun()
+    st.caption("⏳ Refining column detection on the full dataset...")
+
+
+def collect_encoding_job() -> None:
+    """Move the result of a finished encoding job into the session state."""
+    job = st.session_state.encoding_job
+    if job is None or not job.finished:
+        return
+    
+    if job.status == DONE:
+        result = job.result
+        workspace = st.session_state.workspace
+        # The session keeps previews and a path; the bundle itself is spilled to disk
+        try:
+            workspace.save_bytes(BUNDLE_FILE, result['bundle'])
+        except WorkspaceQuotaExceeded as e:
+            st.session_state.output_bundle = None
+            st.error(f"❌ The generated files do not fit in this session's disk space: {str(e)}")
+        else:
+            bundle_path = workspace.file_path(BUNDLE_FILE)
+            previews = {name: df.head() for name, df in result['encoded_frames'].items()}
+            workspace.save_object(PREVIEW_FILE, previews)
+            st.session_state.encoded_frames = previews
+            st.session_state.sps_syntax = result['sps_syntax']
+            st.session_state.verification = result.get('verification', {})
+            st.session_state.output_bundle = bundle_path
+            if result.get('cached'):
+                st.success("✅ Files loaded from cache (same file and settings as before)")
+            else:
+                st.success("✅ Files generated successfully!")
+    elif job.status == CANCELLED:
+        st.warning("⏹️ Encoding cancelled")
+    elif job.status == FAILED:
+        st.error(f"❌ Error generating files: {job.message}")
+    st.session_state.encoding_job = None
+
+
+@st.fragment(run_every=0.5)
+def watch_encoding_job() -> None:
+    """Show progress of the running encoding job with a cancel button."""
+    job = st.session_state.encoding_job
+    if job is None:
+        return
+    if job.finished:
+        st.rerun()
+    
+    st.progress(job.progress, text=job.message or "Starting...")
+    if st.button("⏹️ Cancel", key="cancel_encoding", disabled=job.cancel_requested):
+        job.cancel()
+
+
+def reset_detection_state() -> None:
+    """Forget detection results, configs and outputs of a previous upload."""
+    st.session_state.column_info = {}
+    st.session_state.column_configs = {}
+    st.session_state.column_orders = {}
+    st.session_state.unique_var_names = {}
+    st.session_state.bulk_order_errors = {}
+    st.session_state.detection_future = None
+    st.session_state.encoded_frames = None
+    st.session_state.sps_syntax = None
+    st.session_state.verification = {}
+    st.session_state.output_bundle = None
 
 
-def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
-    """Render configuration card for a single column."""
+def read_bundle(path: str) -> bytes:
+    """Contents of the output bundle (empty if it was removed since the page was drawn)."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.warning(f"Output bundle {path} is gone")
+        return b''
+
+
+def show_verification(verification: Dict) -> None:
+    """Show the round-trip check of the last run: discrepancies per column, or a short confirmation."""
+    if not verification:
+        return
+    issues = verification_issues(verification)
+    if issues:
+        lines: List[str] = []
+        for sheet_name, sheet_issues in issues.items():
+            prefix = f"{sheet_name} / " if len(verification) > 1 else ""
+            for col, messages in sheet_issues.items():
+                lines.extend(f"- **{prefix}{col}**: {message}" for message in messages)
+        st.warning("⚠️ Round-trip check found discrepancies:\n\n" + "\n".join(lines))
+    else:
+        checked = sum(len(report) for report in verification.values())
+        st.caption(f"✔ Round-trip check: {checked} column(s) verified, no discrepancies")
+    skipped = skipped_checks(verification)
+    if skipped:
+        columns = sum(len(sheet_skipped) for sheet_skipped in skipped.values())
+        checks = sorted({
+            check for sheet_skipped in skipped.values() for checks in sheet_skipped.values() for check in checks
+        })
+        st.caption(f"Not checked for {columns} column(s): {'; '.join(checks)}")
+
+
+def sheet_containers(frames: Dict) -> Sequence:
+    """One tab per sheet for multi-sheet workbooks, or the page itself for one sheet."""
+    if len(frames) > 1:
+        return st.tabs([f"🗂️ {name}" for name in frames])
+    return [st.container()]
+
+
+@st.fragment
+def render_column_card(sheet_name: str, col_name: str, col_info: Dict, sanitize_names: bool):
+    """
+    Render configuration card for a single column of a sheet.
+    
+    Runs as a fragment: interacting with a card only re-executes that card,
+    not the whole page. Changes made in a card-only rerun are saved to the
+    session workspace right away; full runs save once at the end of the page.
+    """
+    render_column_settings(sheet_name, col_name, col_info, sanitize_names)
+    if not st.session_state.page_running:
+        save_session_state()
+
+
+def render_column_settings(sheet_name: str, col_name: str, col_info: Dict, sanitize_names: bool) -> None:
+    """Render the metadata and encoding controls of a column card."""
+    column_orders = st.session_state.column_orders.setdefault(sheet_name, {})
+    column_configs = st.session_state.column_configs.setdefault(sheet_name, {})
+    unique_var_names = st.session_state.unique_var_names.get(sheet_name, {})
+    # Widget keys must be unique across sheets
+    key = f"{sheet_name}_{col_name}"
+    
+    # Recognized rating scales (memoized per value set) start in their natural order
+    is_likert, suggested_order = infer_likert_order(col_info['unique_values'])
     
     # Initialize order if not exists
-    if col_name not in st.session_state.column_orders:
-        st.session_state.column_orders[col_name] = col_info['unique_values'].copy()
+    if col_name not in column_orders:
+        column_orders[col_name] = suggested_order
     
     # Initialize config if not exists
-    if col_name not in st.session_state.column_configs:
-        # Detect if numeric, ordinal, or nominal
-        if col_info['is_numeric']:
-            default_type = 'Scale'
-        elif is_likely_likert(col_info['unique_values']):
-            default_type = 'Ordinal'
-        else:
-            default_type = 'Nominal'
+    if col_name not in column_configs:
+        # Detect if date/time, free text, numeric, ordinal, or nominal
+        default_type = default_column_config(col_name, col_info).encoding_type
         # Use pre-generated unique name or fallback to simple sanitization
-        if sanitize_names and col_name in st.session_state.unique_var_names:
-            sanitized = st.session_state.unique_var_names[col_name]
+        if sanitize_names and col_name in unique_var_names:
+            sanitized = unique_var_names[col_name]
         else:
             sanitized = sanitize_variable_name(col_name) if sanitize_names else col_name
         
-        st.session_state.column_configs[col_name] = {
+        column_configs[col_name] = {
             'encoding_type': default_type,
             'start_value': 1,
             'direction': 'Ascending',
@@ -177,9 +523,10 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
             'sanitized_name': sanitized
         }
     
-    config = st.session_state.column_configs[col_name]
+    config = column_configs[col_name]
     
-    with st.expander(f"📋 **{col_name}**", expanded=False):
+    badge = " ⏳ *refining*" if col_info.get('is_sample') else ""
+    with st.expander(f"📋 **{col_name}**{badge}", expanded=False):
         col1, col2 = st.columns([2, 1])
         
         with col1:
@@ -187,15 +534,25 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
             n_unique = col_info['n_unique']
             n_missing = col_info['n_missing']
             
-            if col_info['is_numeric']:
+            if col_info.get('is_datetime'):
+                st.info(f"🕒 Detected as date/time column ({n_missing} missing)")
+                if col_info.get('min') is not None:
+                    st.caption(f"From {col_info['min']} to {col_info['max']}")
+            elif col_info.get('is_text'):
+                distinct = f"{n_unique} distinct answers" if n_unique is not None else "many distinct answers"
+                st.info(f"📝 Detected as free text ({distinct} | {n_missing} missing)")
+                st.caption("Too many distinct answers for value labels; exported unchanged as an SPSS string.")
+            elif col_info['is_numeric']:
                 st.info(f"ℹ️ Detected as numeric column ({n_unique} unique values)")
             elif col_info['has_multi_response']:
                 st.warning(f"⚠️ Multi-response detected ({n_unique} unique combinations)")
                 st.caption("Contains comma/semicolon separators. Currently treating as atomic strings.")
             else:
+                if col_info.get('value_map'):
+                    st.caption(f"🔤 {len(col_info['value_map'])} spelling variants merged into their most common form")
                 if col_info['is_numeric']:
                     type_hint = "Scale (numeric)"
-                elif is_likely_likert(col_info['unique_values']):
+                elif is_likert:
                     type_hint = "Ordinal (ordered categories)"
                 else:
                     type_hint = "Nominal (categories)"
@@ -207,13 +564,43 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
                 sanitized = st.text_input(
                     "SPSS Variable Name",
                     value=config['sanitized_name'],
-                    key=f"sanitized_{col_name}",
+                    key=f"sanitized_{key}",
                     help="SPSS-compatible variable name"
                 )
                 config['sanitized_name'] = sanitized
         
         st.markdown("---")
         
+        if col_info.get('is_datetime'):
+            # Timestamps are written as native SPSS dates, never as categories
+            measure_type = st.selectbox(
+                "Measure (SPSS Variable Level)",
+                options=['Date', 'Ignore'],
+                index=['Date', 'Ignore'].index(config['encoding_type']) if config['encoding_type'] in ['Date', 'Ignore'] else 0,
+                key=f"type_{key}",
+                help=f"Date: numeric SPSS date/time ({col_info.get('spss_format')}) | Ignore: don't export"
+            )
+            config['encoding_type'] = measure_type
+            return
+        
+        if col_info.get('is_text'):
+            # Free text passes through untouched; only a capped summary is shown
+            measure_type = st.selectbox(
+                "Measure (SPSS Variable Level)",
+                options=['String', 'Ignore'],
+                index=['String', 'Ignore'].index(config['encoding_type']) if config['encoding_type'] in ['String', 'Ignore'] else 0,
+                key=f"type_{key}",
+                help=f"String: keep the text (A{col_info.get('max_width', 1)}) | Ignore: don't export"
+            )
+            config['encoding_type'] = measure_type
+            
+            st.markdown("**Most frequent answers:**")
+            summary_lines = [
+                f"  {value} (**{count}**)" for value, count in col_info['value_counts'].items()
+            ]
+            st.markdown('\n'.join(summary_lines))
+            return
+        
         # Encoding controls
         col_a, col_b, col_c = st.columns(3)
         
@@ -222,7 +609,7 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
                 "Measure (SPSS Variable Level)",
                 options=['Ordinal', 'Nominal', 'Scale', 'Ignore'],
                 index=['Ordinal', 'Nominal', 'Scale', 'Ignore'].index(config['encoding_type']) if config['encoding_type'] in ['Ordinal', 'Nominal', 'Scale', 'Ignore'] else 0,
-                key=f"type_{col_name}",
+                key=f"type_{key}",
                 help="Ordinal: ordered categories (e.g., Likert scales) | Nominal: unordered categories | Scale: continuous numeric | Ignore: don't encode"
             )
             # Update config with new value (backward compatible: Likert -> Ordinal)
@@ -235,7 +622,7 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
                 "Start Value",
                 min_value=0,
                 value=config['start_value'],
-                key=f"start_{col_name}",
+                key=f"start_{key}",
                 help="Starting numeric code"
             )
             config['start_value'] = int(start_value)
@@ -245,7 +632,7 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
                 "Direction",
                 options=['Ascending', 'Descending'],
                 index=['Ascending', 'Descending'].index(config['direction']),
-                key=f"dir_{col_name}",
+                key=f"dir_{key}",
                 help="Ascending: first→smallest | Descending: first→largest"
             )
             config['direction'] = direction
@@ -254,7 +641,7 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
         treat_missing = st.checkbox(
             "Treat missing/blank as system-missing (leave blank)",
             value=config['treat_missing'],
-            key=f"missing_{col_name}"
+            key=f"missing_{key}"
         )
         config['treat_missing'] = treat_missing
         
@@ -263,23 +650,43 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
             st.markdown("**Reorder Options** (drag with ↑ ↓ buttons)")
             
             # Reordering UI
-            current_order = st.session_state.column_orders[col_name]
+            current_order = column_orders[col_name]
             
             for idx, value in enumerate(current_order):
                 col_left, col_mid, col_right = st.columns([1, 6, 1])
                 
+                # Callbacks run before the card re-executes, so one click is one rerun
                 with col_left:
-                    if st.button("↑", key=f"up_{col_name}_{idx}", disabled=idx==0):
-                        move_option_up(col_name, idx)
-                        st.rerun()
+                    st.button("↑", key=f"up_{key}_{idx}", disabled=idx==0,
+                              on_click=move_option_up, args=(sheet_name, col_name, idx))
                 
                 with col_mid:
                     st.text(f"{idx+1}. {value}")
                 
                 with col_right:
-                    if st.button("↓", key=f"down_{col_name}_{idx}", disabled=idx==len(current_order)-1):
-                        move_option_down(col_name, idx)
-                        st.rerun()
+                    st.button("↓", key=f"down_{key}_{idx}", disabled=idx==len(current_order)-1,
+                              on_click=move_option_down, args=(sheet_name, col_name, idx))
+            
+            # Bulk editor: paste a whole order and commit it in one update
+            with st.popover("📋 Edit whole order"):
+                with st.form(key=f"bulk_form_{key}", border=False):
+                    # Keyed on the order so the text follows ↑/↓ changes
+                    text_key = f"bulk_{key}_{hash(tuple(current_order))}"
+                    st.text_area(
+                        "One value per line, in the desired order",
+                        value='\n'.join(current_order),
+                        height=200,
+                        key=text_key,
+                        help="Values left out keep their order at the end"
+                    )
+                    st.form_submit_button(
+                        "Apply order",
+                        on_click=apply_pasted_order,
+                        args=(sheet_name, col_name, text_key)
+                    )
+                bulk_error = st.session_state.bulk_order_errors.get(key)
+                if bulk_error:
+                    st.error(bulk_error)
             
             # Show preview of mapping
             st.markdown("**Mapping Preview:**")
@@ -301,8 +708,20 @@ def render_column_card(col_name: str, col_info: Dict, sanitize_names: bool):
 def main():
     """Main application logic."""
     
+    # Page config (first Streamlit command of every run)
+    st.set_page_config(
+        page_title="SPSS Prep Tool",
+        page_icon="📊",
+        layout="wide"
+    )
+    init_session_state()
+    st.session_state.page_running = True
+    
+    # Expire idle session workspaces in the background (once per server process)
+    start_cleanup_thread()
+    
     # Render sidebar and get settings
-    include_save, write_same_folder, sanitize_names = render_sidebar()
+    include_save, sanitize_names, normalize_answers = render_sidebar()
     
     # Main content
     st.title("📊 SPSS Prep Tool")
@@ -312,45 +731,115 @@ def main():
     # Step 1: Upload
     st.header("Step 1: Upload Excel File")
     
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Upload your Google Forms export (.xlsx)",
         type=['xlsx'],
-        help="Upload an Excel file exported from Google Forms"
+        accept_multiple_files=True,
+        help="Upload an Excel file exported from Google Forms. Upload several exports "
+             "of the same form to merge them into one dataset with a shared codebook."
     )
     
-    if uploaded_file is not None:
-        st.session_state.uploaded_file = uploaded_file
-        
+    if uploaded_files or st.session_state.resumed:
         try:
-            # Read Excel
-            df = pd.read_excel(uploaded_file, dtype=object)
-            st.session_state.df = df
+            # Start over when a different set of files is uploaded
+            source = st.session_state.source
+            file_ids = [getattr(f, 'file_id', f.name) for f in uploaded_files or []]
+            if uploaded_files and (source is None or source['file_ids'] != file_ids):
+                source = spill_upload(uploaded_files, normalize_answers)
+            elif source['normalize_answers'] != normalize_answers:
+                # Changing how answers are normalized also means detecting again
+                source['normalize_answers'] = normalize_answers
+                reset_detection_state()
             
-            st.success(f"✅ Loaded {len(df)} rows × {len(df.columns)} columns")
+            # Sheets come from the memory governor, or are memory-mapped from the workspace
+            frames = get_default_governor().get_frames(st.session_state.workspace)
+            if frames is None:
+                # The workspace expired while the page was open
+                st.session_state.source = None
+                st.session_state.resumed = False
+                reset_detection_state()
+                st.rerun()
+            
+            merge_mode = source['merge_mode']
+            if merge_mode:
+                config_columns = {MERGED_SHEET: []}
+                for df in frames.values():
+                    config_columns[MERGED_SHEET].extend(
+                        col for col in df.columns if col not in config_columns[MERGED_SHEET]
+                    )
+            else:
+                config_columns = {name: list(df.columns) for name, df in frames.items()}
+            multi_sheet = len(frames) > 1
+            
+            if st.session_state.resumed and not uploaded_files:
+                st.info(f"🔁 Resumed your session with {', '.join(source['file_names'])} "
+                        "(no need to upload again)")
+            
+            if merge_mode:
+                st.success(f"✅ Loaded {len(frames)} files to merge: " + ", ".join(
+                    f"{name} ({len(df)} rows)" for name, df in frames.items()
+                ))
+                st.caption("Values are coded with one shared codebook across all files; "
+                           f"a '{MERGED_SHEET}' dataset with a source_file column is produced.")
+            elif multi_sheet:
+                st.success(f"✅ Loaded {len(frames)} sheets: " + ", ".join(
+                    f"{name} ({len(df)} rows × {len(df.columns)} columns)"
+                    for name, df in frames.items()
+                ))
+            else:
+                df = next(iter(frames.values()))
+                st.success(f"✅ Loaded {len(df)} rows × {len(df.columns)} columns")
             
             # Show preview
             st.subheader("Data Preview (first 5 rows)")
-            st.dataframe(df.head(), use_container_width=True)
+            for sheet_name, container in zip(frames, sheet_containers(frames)):
+                with container:
+                    st.dataframe(frames[sheet_name].head(), use_container_width=True)
             
-            # Detect columns
+            # Detect columns: sample first, then refine on the full data (sheets in parallel)
             if not st.session_state.column_info:
                 with st.spinner("Detecting columns..."):
-                    column_info = detect_columns(df)
-                    st.session_state.column_info = column_info
+                    if merge_mode:
+                        # Per-file counts in parallel, merged into one codebook
+                        codebook = build_shared_codebook(frames, sample=True, normalize=normalize_answers)
+                        st.session_state.column_info = {MERGED_SHEET: codebook}
+                        if any(info.get('is_sample') for info in codebook.values()):
+                            st.session_state.detection_future = _detection_executor.submit(
+                                detect_merged, frames, normalize_answers
+                            )
+                    else:
+                        sampled = detect_sheets(
+                            frames, partial(detect_columns_sample, normalize=normalize_answers)
+                        )
+                        st.session_state.column_info = {
+                            sheet_name: info for sheet_name, (info, _) in sampled.items()
+                        }
+                        if any(is_sample for _, is_sample in sampled.values()):
+                            st.session_state.detection_future = _detection_executor.submit(
+                                detect_sheets, frames, partial(detect_columns, normalize=normalize_answers)
+                            )
                     
                     # Generate unique variable names (handles Arabic and duplicates)
                     if sanitize_names:
-                        unique_names = generate_unique_var_names(list(df.columns))
-                        st.session_state.unique_var_names = unique_names
+                        st.session_state.unique_var_names = {
+                            sheet_name: generate_unique_var_names(columns)
+                            for sheet_name, columns in config_columns.items()
+                        }
+                save_column_info()
+            
+            apply_refined_detection()
             
             st.markdown("---")
             
             # Step 2: Configure columns
             st.header("Step 2: Configure Column Encodings")
+            watch_refinement()
             
-            for col_name in df.columns:
-                col_info = st.session_state.column_info[col_name]
-                render_column_card(col_name, col_info, sanitize_names)
+            for sheet_name, container in zip(config_columns, sheet_containers(config_columns)):
+                with container:
+                    sheet_info = st.session_state.column_info[sheet_name]
+                    for col_name in config_columns[sheet_name]:
+                        render_column_card(sheet_name, col_name, sheet_info[col_name], sanitize_names)
             
             st.markdown("---")
             
@@ -359,129 +848,135 @@ def main():
             
             # Check if at least one column is configured
             non_ignored = [
-                c for c, cfg in st.session_state.column_configs.items() 
+                c
+                for sheet_configs in st.session_state.column_configs.values()
+                for c, cfg in sheet_configs.items()
                 if cfg.get('encoding_type') != 'Ignore'
             ]
             
+            split_sheets = False
+            if multi_sheet and not merge_mode:
+                split_sheets = st.radio(
+                    "Output layout",
+                    options=["One workbook with all sheets", "One file per sheet"],
+                    horizontal=True
+                ) == "One file per sheet"
+            
+            recode_in_spss = False
+            if not merge_mode:
+                recode_in_spss = st.checkbox(
+                    "Recode in SPSS (no encoded copy of the data)",
+                    value=False,
+                    help="Skip writing an encoded Excel file: the .sps reads your original "
+                         f"{source['file_names'][0]} and turns answers into codes with RECODE. "
+                         "Fastest for very large files."
+                )
+            
+            job = st.session_state.encoding_job
+            job_running = job is not None and not job.finished
+            
             if st.button("🚀 Apply Encoding & Generate Files", 
                         type="primary", 
-                        disabled=len(non_ignored) == 0):
+                        disabled=len(non_ignored) == 0 or job_running):
+                
+                # Encoding needs the complete value lists from the full pass
+                if st.session_state.detection_future is not None:
+                    with st.spinner("Finishing column detection..."):
+                        st.session_state.detection_future.result()
+                    apply_refined_detection()
                 
-                with st.spinner("Encoding data and generating files..."):
-                    # Build ColumnConfig objects
-                    configs = {}
-                    for col_name, cfg in st.session_state.column_configs.items():
-                        configs[col_name] = ColumnConfig(
+                # Build ColumnConfig objects per sheet
+                sheet_configs = {}
+                for sheet_name, column_configs in st.session_state.column_configs.items():
+                    orders = st.session_state.column_orders[sheet_name]
+                    sheet_info = st.session_state.column_info[sheet_name]
+                    sheet_configs[sheet_name] = {
+                        col_name: ColumnConfig(
                             column_name=col_name,
-                            unique_values=st.session_state.column_orders[col_name],
+                            unique_values=orders[col_name],
                             encoding_type=cfg['encoding_type'],
                             start_value=cfg['start_value'],
                             direction=cfg['direction'],
                             treat_missing=cfg['treat_missing'],
-                            sanitized_name=cfg['sanitized_name']
+                            sanitized_name=cfg['sanitized_name'],
+                            value_map=sheet_info[col_name].get('value_map'),
+                            numbers=sheet_info[col_name].numeric_values()
                         )
-                    
-                    # Apply encoding
-                    encoded_df, mappings = apply_encoding(df, configs)
-                    st.session_state.encoded_df = encoded_df
-                    
-                    # Rename columns if sanitized
-                    if sanitize_names:
-                        rename_map = {
-                            col: configs[col].sanitized_name 
-                            for col in df.columns 
-                            if col in configs
-                        }
-                        encoded_df = encoded_df.rename(columns=rename_map)
-                        # Update mappings keys to sanitized names
-                        mappings = {
-                            configs[k].sanitized_name: v 
-                            for k, v in mappings.items()
-                        }
-                    
-                    # Save encoded Excel
-                    temp_dir = tempfile.gettempdir()
-                    encoded_path = os.path.join(temp_dir, 'encoded_data.xlsx')
-                    save_encoded_excel(encoded_df, encoded_path)
-                    st.session_state.encoded_path = encoded_path
-                    
-                    # Build original names mapping for VARIABLE LABELS
-                    original_names = {
-                        configs[col].sanitized_name: col 
-                        for col in df.columns 
-                        if col in configs
-                    }
-                    
-                    # Build measure types mapping for VARIABLE LEVEL
-                    measure_types = {
-                        configs[col].sanitized_name: configs[col].encoding_type
-                        for col in df.columns
-                        if col in configs
+                        for col_name, cfg in column_configs.items()
                     }
-                    
-                    # Generate SPSS syntax
-                    save_path = encoded_path.replace('.xlsx', '.sav') if include_save else None
-                    sps_syntax = generate_sps_syntax(
-                        excel_path=encoded_path,
-                        mappings=mappings,
-                        original_names=original_names,
-                        sheet_name='Sheet1',
+                
+                if merge_mode:
+                    st.session_state.encoding_job = submit_job(
+                        run_merge_pipeline,
+                        frames,
+                        sheet_configs[MERGED_SHEET],
                         include_save=include_save,
-                        save_path=save_path,
-                        use_relative_path=True,  # Use relative path for downloaded files
-                        measure_types=measure_types  # Set SPSS variable levels
+                        sanitize_names=sanitize_names,
+                        work_dir=st.session_state.workspace.path
                     )
-                    st.session_state.sps_syntax = sps_syntax
-                    
-                    # Save .sps file
-                    if write_same_folder:
-                        sps_path = encoded_path.replace('.xlsx', '.sps')
-                    else:
-                        sps_path = os.path.join(temp_dir, 'auto_import.sps')
-                    
-                    save_sps_file(sps_syntax, sps_path)
-                    st.session_state.sps_path = sps_path
-                    
-                st.success("✅ Files generated successfully!")
+                else:
+                    st.session_state.encoding_job = submit_job(
+                        run_cached_encoding_pipeline,
+                        frames,
+                        sheet_configs,
+                        input_hash=source['input_hash'],
+                        cache=get_default_cache(),
+                        analyses=get_default_governor().get_analyses(
+                            st.session_state.workspace.session_id, frames
+                        ),
+                        include_save=include_save,
+                        sanitize_names=sanitize_names,
+                        split_sheets=split_sheets,
+                        recode_in_spss=recode_in_spss,
+                        source_name=source['file_names'][0],
+                        column_info=st.session_state.column_info
+                    )
+                st.rerun()
+            
+            collect_encoding_job()
+            watch_encoding_job()
             
             # Step 4: Preview and Download
             if st.session_state.sps_syntax:
                 st.markdown("---")
                 st.header("Step 4: Preview & Download")
+                show_verification(st.session_state.verification)
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.subheader("📄 Encoded Data Preview")
-                    st.dataframe(st.session_state.encoded_df.head(), use_container_width=True)
-                    
-                    # Download encoded Excel
-                    with open(st.session_state.encoded_path, 'rb') as f:
-                        st.download_button(
-                            label="⬇️ Download Encoded Excel",
-                            data=f.read(),
-                            file_name="encoded_data.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
+                    encoded_frames = st.session_state.encoded_frames
+                    if not encoded_frames:
+                        st.info("🔁 No encoded copy: the script recodes your original file in SPSS. "
+                                "Put the .sps next to the uploaded workbook.")
+                    for sheet_name, container in zip(encoded_frames, sheet_containers(encoded_frames)):
+                        with container:
+                            st.dataframe(encoded_frames[sheet_name].head(), use_container_width=True)
                 
                 with col2:
                     st.subheader("📜 SPSS Syntax Preview")
                     st.code(st.session_state.sps_syntax, language='sql')
-                    
-                    # Download .sps file with UTF-8 BOM for Arabic text support
-                    sps_bytes = st.session_state.sps_syntax.encode('utf-8-sig')
+                
+                # One bundle with the encoded Excel and the .sps (UTF-8 BOM) side by side;
+                # it is read from the workspace only when the button is clicked
+                bundle_path = st.session_state.output_bundle
+                if bundle_path and os.path.exists(bundle_path):
                     st.download_button(
-                        label="⬇️ Download SPSS Syntax (.sps)",
-                        data=sps_bytes,
-                        file_name="auto_import.sps",
-                        mime="text/plain"
+                        label="⬇️ Download Files (.zip)",
+                        data=partial(read_bundle, bundle_path),
+                        file_name="spss_prep_output.zip",
+                        mime="application/zip",
+                        type="primary"
                     )
-                
-                st.success("📥 **Files ready for download!**")
+                    st.success("📥 **Files ready for download!**")
+                else:
+                    st.warning("⚠️ The generated files are no longer on the server. "
+                               "Click **Apply Encoding** again to recreate them.")
                 st.markdown("### 📋 Next Steps:")
                 st.markdown("""
-                1. **Download both files** using the buttons above
-                2. **Save them to the SAME folder** on your computer
+                1. **Download the zip** using the button above
+                2. **Extract it** - the Excel file and the .sps file must stay in the SAME folder
                 3. **Open the .sps file in a text editor** (Notepad, etc.)
                 4. **Edit the CD command** to point to your folder:
                    ```
@@ -503,6 +998,9 @@ def main():
     
     else:
         st.info("👆 Upload an Excel file to get started")
+    
+    save_session_state()
+    st.session_state.page_running = False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,387 @@
+"""
+Incremental append mode for response sheets that keep growing.
+
+The first run encodes the whole export into an output folder and records,
+per sheet, the frozen column configurations and a watermark: the number of
+processed rows and a fingerprint of the last one. Later runs check the
+watermark against the new export, read only the rows below it (openpyxl
+read-only), encode them with the frozen configurations and write them as a
+new part file. The .sps imports all parts and appends them in order, so a
+daily refresh costs time proportional to the new responses.
+
+Answers the frozen configurations do not know become system-missing and are
+reported, so codes of existing answers never change.
+"""
+
+import datetime
+import hashlib
+import json
+import math
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bookkeeping file kept next to the encoded parts
+STATE_FILE = 'append_state.json'
+STATE_VERSION = 1
+
+
+class AppendError(ValueError):
+    """Raised when an export cannot be appended to the existing output."""
+
+
+def cell_value(value: Any) -> Any:
+    """
+    Normalize a cell value the way pandas reads it (for fingerprints).
+
+    Args:
+        value: Cell value from openpyxl or pandas
+
+    Returns:
+        None for empty cells, int for whole numbers, ISO text for dates and
+        times, the value itself otherwise
+    """
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    try:
+        import pandas as pd
+
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def row_fingerprint(values: Sequence[Any]) -> str:
+    """
+    Fingerprint of one data row.
+
+    Args:
+        values: Cell values of the row
+
+    Returns:
+        Hex digest that is equal for rows pandas and openpyxl read the same
+    """
+    normalized = [cell_value(value) for value in values]
+    while normalized and normalized[-1] is None:
+        normalized.pop()
+    data = json.dumps(normalized, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def read_rows(
+    path: str,
+    sheet_name: str,
+    min_row: int,
+    n_columns: int,
+    max_row: Optional[int] = None
+) -> List[List[Any]]:
+    """
+    Read the rows of a sheet from a given row on, without keeping the rest.
+
+    Cells are converted like pandas.read_excel does (whole numbers become
+    int, error cells become empty); trailing empty rows are dropped.
+
+    Args:
+        path: Path of the .xlsx file
+        sheet_name: Sheet to read
+        min_row: First row to read (1-based; row 1 is the header)
+        n_columns: Number of columns to keep (rows are padded or cut)
+        max_row: Last row to read (None reads to the end)
+
+    Returns:
+        List of rows as lists of cell values
+    """
+    import openpyxl
+    from openpyxl.cell.cell import ERROR_CODES
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in workbook.sheetnames:
+            raise AppendError(f"Sheet '{sheet_name}' is missing from {os.path.basename(path)}")
+        rows = []
+        for row in workbook[sheet_name].iter_rows(
+            min_row=min_row, max_row=max_row, max_col=n_columns, values_only=True
+        ):
+            values = [
+                None if value in ERROR_CODES
+                else int(value) if isinstance(value, float) and value.is_integer()
+                else value
+                for value in row
+            ]
+            values += [None] * (n_columns - len(values))
+            rows.append(values)
+    finally:
+        workbook.close()
+
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def part_file_name(encoded_name: str, number: int) -> str:
+    """File name of an encoded part (the first part keeps encoded_name)."""
+    if number == 1:
+        return encoded_name
+    base, ext = os.path.splitext(encoded_name)
+    return f"{base}_{number:03d}{ext}"
+
+
+def load_state(output_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the append state of an output folder.
+
+    Args:
+        output_dir: Folder holding the encoded parts
+
+    Returns:
+        State dictionary, or None if the folder has not been used yet
+    """
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state: Dict[str, Any] = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise AppendError(f"{path} was written by another version; delete {output_dir} to start over")
+    return state
+
+
+def save_state(output_dir: str, state: Dict[str, Any]) -> None:
+    """Write the append state so readers see either the old or the new state."""
+    fd, staging = tempfile.mkstemp(dir=output_dir, prefix='.staging-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(staging, os.path.join(output_dir, STATE_FILE))
+    except OSError:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+
+
+def find_unseen(analysis: Any, configs: Dict[str, Any]) -> Dict[str, List[str]]:
+    """
+    Answers of categorical columns that the frozen configurations do not know.
+
+    Args:
+        analysis: DatasetAnalysis of the new rows
+        configs: Frozen column configurations
+
+    Returns:
+        Dictionary of column name -> unseen values (columns without any omitted)
+    """
+    unseen = {}
+    for col, config in configs.items():
+        if config.encoding_type not in ('Ordinal', 'Nominal') or col not in analysis.df.columns:
+            continue
+        column = analysis.column(col)
+        values = [
+            key for key, code in zip(column.keys, column.lookup(config)[:-1])
+            if math.isnan(code)
+        ]
+        if values:
+            unseen[col] = values
+    return unseen
+
+
+def _encode_sheet(df: Any, configs: Dict[str, Any], sanitize_names: bool) -> Dict[str, Any]:
+    """Encode rows of one sheet and collect its output metadata."""
+    from .analysis import DatasetAnalysis
+    from .encoder import apply_encoding
+    from .jobs import prepare_sheet_output
+
+    analysis = DatasetAnalysis(df)
+    encoded_df, mappings = apply_encoding(df, configs, analysis=analysis)
+    sheet = prepare_sheet_output(df, encoded_df, mappings, configs, sanitize_names, analysis)
+    sheet['unseen'] = find_unseen(analysis, configs)
+    return sheet
+
+
+def _merge_metadata(entry: Dict[str, Any], sheet: Dict[str, Any]) -> None:
+    """Widen text variables and date formats of a sheet entry to cover new rows."""
+    widths = entry.setdefault('string_widths', {})
+    for name, width in sheet['string_widths'].items():
+        widths[name] = max(widths.get(name, 1), width)
+    formats = entry.setdefault('variable_formats', {})
+    for name, spss_format in sheet['variable_formats'].items():
+        if formats.get(name) != 'DATETIME20':
+            formats[name] = spss_format
+    for col, values in sheet['unseen'].items():
+        known = entry.setdefault('unseen', {}).setdefault(col, [])
+        known.extend(value for value in values if value not in known)
+
+
+def _read_header(input_path: str, sheet_name: str, n_columns: int) -> List[Any]:
+    """Normalized header row of a sheet."""
+    header = read_rows(input_path, sheet_name, 1, n_columns, max_row=1)
+    return [cell_value(value) for value in (header[0] if header else [])]
+
+
+def _initial_state(
+    input_path: str,
+    sheet_configs: Optional[Dict[str, Dict[str, Any]]],
+    sanitize_names: bool,
+    normalize_answers: bool
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Read the whole export and build the first state (without parts) and the frames."""
+    from .analysis import analyze_frames
+    from .cli import build_default_configs
+    from .encoder import load_workbook
+
+    frames = load_workbook(input_path)
+    if sheet_configs is None:
+        sheet_configs = build_default_configs(frames, sanitize_names, normalize_answers, analyze_frames(frames))
+    missing = [sheet_name for sheet_name in frames if sheet_name not in sheet_configs]
+    if missing:
+        raise AppendError(f"No configuration for sheet(s): {', '.join(missing)}")
+
+    state: Dict[str, Any] = {'version': STATE_VERSION, 'sanitize_names': sanitize_names, 'parts': 0, 'sheets': {}}
+    for sheet_name, df in frames.items():
+        state['sheets'][sheet_name] = {
+            'header': _read_header(input_path, sheet_name, len(df.columns)),
+            'columns': list(df.columns),
+            'rows': 0,
+            'fingerprint': None,
+            'parts': [],
+            'configs': {col: cfg.to_dict() for col, cfg in sheet_configs[sheet_name].items()},
+        }
+    return state, frames
+
+
+def _new_rows(input_path: str, sheet_name: str, entry: Dict[str, Any]) -> Tuple[Any, Optional[str]]:
+    """Check the watermark of a sheet and read the rows below it (with the new watermark)."""
+    import pandas as pd
+
+    from .encoder import compact_text_columns
+
+    columns = entry['columns']
+    if _read_header(input_path, sheet_name, len(columns)) != entry['header']:
+        raise AppendError(f"The columns of sheet '{sheet_name}' changed since the last run")
+
+    # Start at the last processed row (the header if none) so it can be checked
+    rows = read_rows(input_path, sheet_name, entry['rows'] + 1, len(columns))
+    if entry['rows'] and (not rows or row_fingerprint(rows[0]) != entry['fingerprint']):
+        raise AppendError(
+            f"Row {entry['rows'] + 1} of sheet '{sheet_name}' changed since it was processed; "
+            "delete the output folder to start over"
+        )
+    df = compact_text_columns(pd.DataFrame(rows[1:], columns=columns, dtype=object))
+    return df, row_fingerprint(rows[-1]) if len(rows) > 1 else entry['fingerprint']
+
+
+def run_append(
+    input_path: str,
+    output_dir: str,
+    sheet_configs: Optional[Dict[str, Dict[str, Any]]] = None,
+    include_save: bool = False,
+    sanitize_names: bool = True,
+    normalize_answers: bool = False,
+    encoded_name: str = 'encoded_data.xlsx',
+    sps_name: str = 'auto_import.sps'
+) -> Dict[str, Any]:
+    """
+    Encode the rows added to an export since the last run.
+
+    The first run into an empty folder encodes every row and freezes the
+    configurations; later runs only read and encode new rows.
+
+    Args:
+        input_path: Path of the (re-)exported workbook
+        output_dir: Folder for the encoded parts, the .sps, the codebook and the state
+        sheet_configs: Configurations for the first run (detected if None;
+            ignored once the state exists)
+        include_save: Whether to include SAVE OUTFILE in the syntax
+        sanitize_names: Rename columns to their sanitized SPSS names (first run)
+        normalize_answers: Merge spelling variants when detecting (first run)
+        encoded_name: File name of the first encoded part
+        sps_name: File name of the .sps file
+
+    Returns:
+        Dictionary with new_rows and total_rows (sheet -> count), unseen
+        (sheet -> {column: values}), part (file written, or None) and sps_syntax
+
+    Raises:
+        AppendError: If the export does not continue the processed rows
+    """
+    from .codebook import CODEBOOK_NAME, codebook_bytes
+    from .encoder import ColumnConfig, save_encoded_workbook
+    from .sps_generator import generate_appended_sps_syntax, save_sps_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+    if state is None:
+        state, frames = _initial_state(input_path, sheet_configs, sanitize_names, normalize_answers)
+        # Fingerprint the last row as openpyxl reads it, like later runs do
+        fingerprints = {}
+        for sheet_name, df in frames.items():
+            last_row = read_rows(input_path, sheet_name, len(df) + 1, len(df.columns), max_row=len(df) + 1)
+            fingerprints[sheet_name] = row_fingerprint(last_row[0]) if len(df) and last_row else None
+    else:
+        frames, fingerprints = {}, {}
+        for sheet_name, entry in state['sheets'].items():
+            frames[sheet_name], fingerprints[sheet_name] = _new_rows(input_path, sheet_name, entry)
+
+    part_frames = {}
+    content_widths = {}
+    result: Dict[str, Any] = {'new_rows': {}, 'total_rows': {}, 'unseen': {}, 'part': None}
+    for sheet_name, df in frames.items():
+        entry = state['sheets'][sheet_name]
+        result['new_rows'][sheet_name] = len(df)
+        if len(df):
+            configs = {col: ColumnConfig.from_dict(cfg) for col, cfg in entry['configs'].items()}
+            sheet = _encode_sheet(df, configs, state['sanitize_names'])
+            for key in ('mappings', 'original_names', 'measure_types'):
+                entry[key] = sheet[key]
+            _merge_metadata(entry, sheet)
+            part_frames[sheet_name] = sheet['output_df']
+            content_widths[sheet_name] = sheet['content_widths']
+            entry['rows'] += len(df)
+            entry['fingerprint'] = fingerprints[sheet_name]
+            if sheet['unseen']:
+                result['unseen'][sheet_name] = sheet['unseen']
+        result['total_rows'][sheet_name] = entry['rows']
+
+    if part_frames or not state['parts']:
+        state['parts'] += 1
+        part = part_file_name(encoded_name, state['parts'])
+        save_encoded_workbook(part_frames or frames, os.path.join(output_dir, part), content_widths)
+        for sheet_name in part_frames or frames:
+            state['sheets'][sheet_name]['parts'].append(part)
+        result['part'] = part
+
+    datasets = [
+        {
+            'sheet_name': sheet_name,
+            'parts': entry['parts'],
+            'file': entry['parts'][0],
+            'mappings': entry.get('mappings', {}),
+            'original_names': entry.get('original_names', {}),
+            'measure_types': entry.get('measure_types'),
+            'variable_formats': entry.get('variable_formats'),
+            'string_widths': entry.get('string_widths'),
+        }
+        for sheet_name, entry in state['sheets'].items()
+        if entry['parts']
+    ]
+    sps_syntax = generate_appended_sps_syntax(datasets, include_save=include_save)
+    save_sps_file(sps_syntax, os.path.join(output_dir, sps_name))
+    with open(os.path.join(output_dir, CODEBOOK_NAME), 'wb') as f:
+        f.write(codebook_bytes(datasets))
+    save_state(output_dir, state)
+    result['sps_syntax'] = sps_syntax
+    logger.info(f"Appended {sum(result['new_rows'].values())} new row(s) to {output_dir}")
+    return result
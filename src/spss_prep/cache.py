@@ -0,0 +1,260 @@
+"""
+Content-addressed cache for generated outputs.
+Identical input files encoded with identical settings return the stored results
+instead of re-running the encoding pipeline.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+import pandas as pd
+
+from .encoder import ColumnConfig
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default on-disk location of the shared cache
+CACHE_ROOT = os.path.join(tempfile.gettempdir(), 'spss_prep_cache')
+
+# Default size limit of the on-disk store
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Part of every key; bump it when the pipeline output changes so results
+# written by an older version are not served (2: Scale columns pass through,
+# 3: bundles carry codebook.json, 4: results carry the round-trip check,
+# 5: the check counts the raw input, 6: entries store the mappings)
+OUTPUT_VERSION = 6
+
+_BUNDLE_FILE = 'bundle.zip'
+_META_FILE = 'meta.json'
+
+
+def hash_bytes(data: bytes) -> str:
+    """SHA-256 hex digest of raw input bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    """Convert configs (possibly nested per sheet) into sorted plain data."""
+    if isinstance(value, ColumnConfig):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return [[str(key), _canonical(value[key])] for key in sorted(value, key=str)]
+    return value
+
+
+def config_fingerprint(configs: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """
+    Canonical hash of all column configurations and generator options.
+
+    Args:
+        configs: Dictionary mapping column names to ColumnConfig objects, or
+            sheet names to such dictionaries
+        options: Generator options (e.g. include_save, sanitize_names)
+
+    Returns:
+        SHA-256 hex digest that only depends on the configuration content
+    """
+    canonical = {
+        'configs': _canonical(configs),
+        'options': options,
+    }
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_key(input_hash: str, configs: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """
+    Build the cache key for an input file and its encoding settings.
+
+    Args:
+        input_hash: Hash of the uploaded file bytes (see hash_bytes)
+        configs: Column configurations (flat or per sheet)
+        options: Generator options
+
+    Returns:
+        Cache key string
+    """
+    combined = f"{OUTPUT_VERSION}:{input_hash}:{config_fingerprint(configs, options)}"
+    return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Bounded on-disk LRU store of pipeline results.
+
+    Each entry is a directory named after its key holding the zip bundle and
+    a small JSON file with the syntax text, the verification report and an
+    encoded-data preview.
+    Recency is tracked through the entry directory's mtime.
+    """
+
+    def __init__(self, root: str = CACHE_ROOT, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Cache key (see cache_key)
+
+        Returns:
+            Dictionary with bundle, sps_syntax, mappings, verification,
+            encoded_frames and encoded_df (preview rows only), or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            with open(os.path.join(path, _META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(os.path.join(path, _BUNDLE_FILE), 'rb') as f:
+                bundle = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        logger.info(f"Cache hit for {key[:12]}")
+        encoded_frames = {
+            sheet_name: pd.DataFrame(**preview)
+            for sheet_name, preview in meta['previews']
+        }
+        return {
+            'bundle': bundle,
+            'sps_syntax': meta['sps_syntax'],
+            'mappings': meta.get('mappings', {}),
+            'verification': meta.get('verification', {}),
+            'encoded_frames': encoded_frames,
+            'encoded_df': next(iter(encoded_frames.values()), None),
+            'cached': True,
+        }
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a pipeline result and evict old entries if over the size limit.
+
+        Args:
+            key: Cache key (see cache_key)
+            result: Pipeline result with bundle, sps_syntax, encoded_frames and
+                (optionally) mappings and verification
+        """
+        encoded_frames = result.get('encoded_frames')
+        if encoded_frames is None:
+            encoded_frames = {'Sheet1': result['encoded_df']}
+        meta = {
+            'sps_syntax': result['sps_syntax'],
+            'mappings': result.get('mappings', {}),
+            'verification': result.get('verification', {}),
+            'previews': [
+                [sheet_name, json.loads(
+                    df.head().to_json(orient='split', index=False, force_ascii=False)
+                )]
+                for sheet_name, df in encoded_frames.items()
+            ],
+            'created': time.time(),
+        }
+        # Write into a temporary directory first so readers never see half an entry
+        staging = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+        try:
+            with open(os.path.join(staging, _BUNDLE_FILE), 'wb') as f:
+                f.write(result['bundle'])
+            with open(os.path.join(staging, _META_FILE), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            path = self._entry_path(key)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(staging, path)
+        except OSError as e:
+            # Entries are content-addressed, so a concurrent writer stored the same result
+            shutil.rmtree(staging, ignore_errors=True)
+            logger.warning(f"Could not store cache entry {key[:12]}: {str(e)}")
+            return
+        self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """List (mtime, size, path) of all complete entries."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._entry_path(name)
+            if name.startswith('.'):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+                )
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                # Entry removed concurrently
+                continue
+        return entries
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the store fits max_bytes.
+
+        Returns:
+            Number of removed entries
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics.
+
+        Returns:
+            Dictionary with hits, misses, hit_rate, entries and bytes
+        """
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries),
+            }
+
+
+_default_cache: Optional[ArtifactCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ArtifactCache:
+    """Process-wide shared cache instance."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ArtifactCache()
+        return _default_cache
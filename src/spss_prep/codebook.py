@@ -0,0 +1,304 @@
+"""
+Machine-readable codebook of a run, and a decoder that turns encoded files
+back into labelled data.
+
+Every bundle carries ``codebook.json`` next to the .sps: per sheet, the file
+that holds it and, per variable, its original column name, measure type and
+value labels (code -> answer). It records exactly what the .sps labels, so
+encoded files that come back from SPSS users can be labelled again without
+parsing syntax.
+
+Usage:
+    python -m spss_prep.codebook encoded_data.xlsx --codebook survey_spss.zip [-o labelled.xlsx]
+
+Decoding works on whole columns: the codes of a column are matched against
+the sorted codes of its labels with one ``searchsorted`` and become a
+categorical column, so no Python code runs per cell.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+import logging
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# File name of the codebook inside bundles
+CODEBOOK_NAME = 'codebook.json'
+CODEBOOK_VERSION = 1
+
+
+def build_codebook(datasets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the codebook of a run from the metadata its .sps is generated from.
+
+    Args:
+        datasets: One dictionary per sheet with keys sheet_name, file (data
+            file holding the sheet, or None), mappings (variable -> {answer:
+            code}), original_names (variable -> column name) and measure_types
+
+    Returns:
+        JSON-compatible dictionary {"version": 1, "sheets": {sheet: {"file": ...,
+        "variables": {name: {"label", "measure", "values"}}}}}
+    """
+    sheets = {}
+    for dataset in datasets:
+        mappings = dataset['mappings']
+        original_names = dataset['original_names']
+        measure_types = dataset.get('measure_types') or {}
+        variables = {}
+        for name in list(original_names) + [name for name in mappings if name not in original_names]:
+            variable = {
+                'label': original_names.get(name, name),
+                'measure': measure_types.get(name, 'Nominal' if name in mappings else None),
+            }
+            if name in mappings:
+                variable['values'] = {
+                    str(code): str(answer)
+                    for answer, code in sorted(mappings[name].items(), key=lambda item: item[1])
+                }
+            variables[name] = variable
+        sheets[dataset['sheet_name']] = {'file': dataset.get('file'), 'variables': variables}
+    return {'version': CODEBOOK_VERSION, 'sheets': sheets}
+
+
+def codebook_bytes(datasets: List[Dict[str, Any]]) -> bytes:
+    """Codebook of a run as UTF-8 JSON, ready for a bundle (see build_codebook)."""
+    return json.dumps(build_codebook(datasets), ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def load_codebook(path: str) -> Dict[str, Any]:
+    """
+    Read a codebook from codebook.json or from a bundle that contains it.
+
+    Args:
+        path: Path of a .json file or an output .zip bundle
+
+    Returns:
+        Codebook dictionary
+
+    Raises:
+        ValueError: If the file holds no codebook of a known version
+    """
+    if path.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as bundle:
+            if CODEBOOK_NAME not in bundle.namelist():
+                raise ValueError(f"{os.path.basename(path)} contains no {CODEBOOK_NAME}")
+            codebook = json.loads(bundle.read(CODEBOOK_NAME).decode('utf-8'))
+    else:
+        with open(path, encoding='utf-8') as f:
+            codebook = json.load(f)
+    if not isinstance(codebook, dict) or codebook.get('version') != CODEBOOK_VERSION:
+        raise ValueError(f"{os.path.basename(path)} is not a version {CODEBOOK_VERSION} codebook")
+    return codebook
+
+
+def decode_column(values: pd.Series, labels: Dict[str, str], ordered: bool = False) -> Tuple[pd.Series, int]:
+    """
+    Replace the codes of one column by their labels.
+
+    Args:
+        values: Encoded column (numbers, or numbers as text)
+        labels: Dictionary of code (as text) -> label, from the codebook
+        ordered: Make the categories ordered (Ordinal variables)
+
+    Returns:
+        Tuple of (categorical column with the labels in code order, number of
+        non-empty cells whose code has no label; those become missing)
+    """
+    import numpy as np
+    import pandas as pd
+
+    order = sorted(labels, key=float)
+    codes = np.array([float(code) for code in order])
+    numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    positions = np.minimum(np.searchsorted(codes, numbers), max(len(codes) - 1, 0))
+    found = codes[positions] == numbers if len(codes) else np.zeros(len(numbers), dtype=bool)
+    categories = pd.Categorical.from_codes(
+        np.where(found, positions, -1),
+        categories=[labels[code] for code in order],
+        ordered=ordered
+    )
+    unknown = int(values.notna().sum()) - int(found.sum())
+    return pd.Series(categories, index=values.index, name=values.name), unknown
+
+
+def decode_frame(
+    df: pd.DataFrame,
+    sheet: Dict[str, Any],
+    restore_names: bool = True
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Label every coded column of an encoded sheet.
+
+    Columns are matched to codebook variables by name (case-insensitively, as
+    SPSS treats names); other columns are kept as they are.
+
+    Args:
+        df: Encoded sheet, e.g. read back from the encoded workbook or an SPSS export
+        sheet: Sheet entry of the codebook
+        restore_names: Rename variables back to their original column names
+
+    Returns:
+        Tuple of (decoded dataframe, column -> number of cells with unknown codes)
+    """
+    import pandas as pd
+
+    variables = sheet['variables']
+    by_lower = {name.lower(): name for name in variables}
+    columns = {}
+    unknown = {}
+    for col in df.columns:
+        name = col if col in variables else by_lower.get(str(col).lower())
+        variable = variables.get(name) if name is not None else None
+        values = df[col]
+        if variable is not None and variable.get('values'):
+            values, count = decode_column(values, variable['values'], variable.get('measure') == 'Ordinal')
+            if count:
+                unknown[col] = count
+        label = variable['label'] if variable is not None and restore_names else col
+        columns[label] = values
+    return pd.DataFrame(columns, index=df.index), unknown
+
+
+def codebook_sheet(codebook: Dict[str, Any], sheet_name: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Codebook entry for a sheet of an encoded file.
+
+    Args:
+        codebook: Codebook dictionary
+        sheet_name: Sheet name in the encoded file (None for CSV files)
+
+    Returns:
+        The sheet with that name, the only sheet of a single-sheet codebook,
+        or None
+    """
+    sheets: Dict[str, Dict[str, Any]] = codebook['sheets']
+    if sheet_name in sheets:
+        return sheets[sheet_name]
+    if len(sheets) == 1:
+        return next(iter(sheets.values()))
+    return None
+
+
+def decode_file(
+    path: str,
+    codebook: Dict[str, Any],
+    restore_names: bool = True
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Dict[str, int]]]:
+    """
+    Read an encoded .xlsx or .csv file and label every sheet the codebook describes.
+
+    Args:
+        path: Encoded file
+        codebook: Codebook dictionary (see load_codebook)
+        restore_names: Rename variables back to their original column names
+
+    Returns:
+        Tuple of (sheet name -> decoded dataframe, sheet name -> unknown code
+        counts per column)
+    """
+    import pandas as pd
+
+    if path.lower().endswith('.csv'):
+        frames = {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path)}
+        entries = {name: codebook_sheet(codebook, None) for name in frames}
+    else:
+        frames = pd.read_excel(path, sheet_name=None)
+        entries = {name: codebook_sheet(codebook, name) for name in frames}
+
+    decoded = {}
+    unknown = {}
+    for sheet_name, df in frames.items():
+        entry = entries[sheet_name]
+        if entry is None:
+            logger.warning(f"Sheet '{sheet_name}' is not in the codebook; copied as is")
+            decoded[sheet_name] = df
+            continue
+        decoded[sheet_name], counts = decode_frame(df, entry, restore_names)
+        if counts:
+            unknown[sheet_name] = counts
+    return decoded, unknown
+
+
+def save_decoded(frames: Dict[str, pd.DataFrame], output_path: str) -> List[str]:
+    """
+    Write decoded sheets as one workbook, or as CSV files (one per sheet).
+
+    Args:
+        frames: Dictionary of sheet name -> decoded dataframe
+        output_path: .xlsx or .csv path (with several sheets, CSV names get
+            the sheet name appended)
+
+    Returns:
+        Paths written
+    """
+    import pandas as pd
+
+    from .encoder import save_encoded_workbook
+    from .utils import sanitize_variable_name
+
+    if output_path.lower().endswith('.csv'):
+        base, ext = os.path.splitext(output_path)
+        paths = []
+        for sheet_name, df in frames.items():
+            path = output_path if len(frames) == 1 else f"{base}_{sanitize_variable_name(sheet_name)}{ext}"
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+            paths.append(path)
+        return paths
+
+    # Labels of categorical columns are measured from the categories
+    content_widths = {
+        sheet_name: [
+            max((len(str(label)) for label in df[col].cat.categories), default=0)
+            if isinstance(df[col].dtype, pd.CategoricalDtype)
+            else int(df[col].astype(str).str.len().max() or 0)
+            for col in df.columns
+        ]
+        for sheet_name, df in frames.items()
+    }
+    save_encoded_workbook(frames, output_path, content_widths)
+    return [output_path]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Decode an encoded file from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m spss_prep.codebook',
+        description='Turn an encoded .xlsx/.csv file back into labelled data using codebook.json.'
+    )
+    parser.add_argument('input', help='Encoded .xlsx or .csv file')
+    parser.add_argument('--codebook', required=True, help='codebook.json or the output .zip bundle')
+    parser.add_argument('-o', '--output', help='Output .xlsx or .csv (default: <input>_labelled.xlsx)')
+    parser.add_argument('--keep-names', action='store_true', help='Keep the SPSS variable names')
+    args = parser.parse_args(argv)
+
+    try:
+        codebook = load_codebook(args.codebook)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    frames, unknown = decode_file(args.input, codebook, restore_names=not args.keep_names)
+    output = args.output or f"{os.path.splitext(args.input)[0]}_labelled.xlsx"
+    for sheet_name, df in frames.items():
+        print(f"{sheet_name}: {len(df)} rows")
+        for col, count in unknown.get(sheet_name, {}).items():
+            print(f"  warning: {col}: {count} cell(s) with codes missing from the codebook left empty")
+    for path in save_decoded(frames, output):
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
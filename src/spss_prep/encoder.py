@@ -1,20 +1,95 @@
 """
 Encoding functions for converting categorical data to numeric codes.
 Handles detection, mapping creation, and application of encodings.
+
+pandas and numpy are imported inside the functions that need them, so that
+ColumnConfig and the constants can be used without paying their import cost.
 """
 
-import pandas as pd
-import numpy as np
-from typing import Dict, List, Tuple, Any, Optional
-from collections import Counter
+from __future__ import annotations
+
+from array import array
+from collections.abc import MutableMapping
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+from functools import lru_cache
 import logging
+import warnings
+
+from .likert import infer_likert_order
+from .normalize import canonical_value_map
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .analysis import DatasetAnalysis
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of rows scanned for the fast first pass of column detection
+DETECTION_SAMPLE_ROWS = 1000
+
+# Share of non-missing values that must parse as dates for a date/time column
+DATETIME_MIN_RATIO = 0.8
+
+# Text that starts like a date (2024-01-31, 31/01/2024, 1.31.24 10:15, ...)
+_DATE_LIKE_PATTERN = r'\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}'
+
+# Free-text guard: columns with many distinct answers are kept as SPSS strings
+TEXT_MIN_UNIQUE = 30
+TEXT_UNIQUE_RATIO = 0.5
+MAX_CATEGORIES = 200
+
+# Number of most frequent answers kept for the summary of a free-text column
+TEXT_TOP_VALUES = 10
+
+# Longest string SPSS can store (bytes)
+SPSS_MAX_STRING_WIDTH = 32767
+
+# SPSS display formats for date/time variables
+SPSS_DATETIME_FORMAT = 'DATETIME20'
+SPSS_DATE_FORMAT = 'DATE11'
+
+# Seconds from the SPSS date origin (1582-10-14) to the Unix epoch
+SPSS_EPOCH_OFFSET_SECONDS = 12219292800
+
+# Arrow storage for text columns: one contiguous buffer instead of a Python
+# object per cell. Columns of repeated answers are dictionary-encoded.
+ARROW_STRING_DTYPE = 'string[pyarrow]'
+
 
 class ColumnConfig:
-    """Configuration for encoding a single column."""
+    """
+    Configuration for encoding a single column.
+    
+    Instances are immutable and hashable (equal settings compare and hash
+    equal), so they can be used as cache keys. The mapping and code array
+    are computed on first use and kept. Use replace() to derive a changed
+    configuration.
+    
+    Scale columns pass through as numbers. ``numbers`` seeds the value ->
+    number table with the conversion detection already did; it is derived
+    data, so it is neither compared nor serialized.
+    """
+    
+    __slots__ = (
+        'column_name', 'unique_values', 'encoding_type', 'start_value', 'direction',
+        'treat_missing', 'sanitized_name', 'value_map', '_hash', '_mapping', '_codes', '_numbers'
+    )
+    
+    column_name: str
+    unique_values: Tuple[str, ...]
+    encoding_type: str
+    start_value: int
+    direction: str
+    treat_missing: bool
+    sanitized_name: str
+    value_map: Mapping[str, str]
+    _hash: Optional[int]
+    _mapping: Optional[Dict[str, int]]
+    _codes: Any
+    _numbers: Optional[Dict[str, float]]
     
     def __init__(
         self,
@@ -24,94 +99,716 @@ class ColumnConfig:
         start_value: int = 1,
         direction: str = 'Ascending',
         treat_missing: bool = True,
-        sanitized_name: Optional[str] = None
+        sanitized_name: Optional[str] = None,
+        value_map: Optional[Dict[str, str]] = None,
+        numbers: Optional[Dict[str, float]] = None
     ):
-        self.column_name = column_name
-        self.unique_values = unique_values  # Ordered list
-        self.encoding_type = encoding_type  # 'Ordinal', 'Nominal', 'Scale', 'Ignore'
-        self.start_value = start_value
-        self.direction = direction  # 'Ascending' or 'Descending'
-        self.treat_missing = treat_missing
-        self.sanitized_name = sanitized_name or column_name
+        init = object.__setattr__
+        init(self, 'column_name', column_name)
+        init(self, 'unique_values', tuple(unique_values))  # Ordered values
+        init(self, 'encoding_type', encoding_type)  # 'Ordinal', 'Nominal', 'Scale', 'Date', 'String', 'Ignore'
+        init(self, 'start_value', start_value)
+        init(self, 'direction', direction)  # 'Ascending' or 'Descending'
+        init(self, 'treat_missing', treat_missing)
+        init(self, 'sanitized_name', sanitized_name or column_name)
+        init(self, 'value_map', MappingProxyType(dict(value_map or {})))  # Raw spelling -> canonical value
+        init(self, '_hash', None)
+        init(self, '_mapping', None)
+        init(self, '_codes', None)
+        init(self, '_numbers', numbers)  # Value -> number, from detection
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ColumnConfig is immutable; use replace() to change a setting")
+    
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ColumnConfig is immutable")
+    
+    def _key(self) -> Tuple[Any, ...]:
+        return (
+            self.column_name, self.unique_values, self.encoding_type, self.start_value,
+            self.direction, self.treat_missing, self.sanitized_name,
+            tuple(sorted(self.value_map.items()))
+        )
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ColumnConfig):
+            return NotImplemented
+        return self._key() == other._key()
+    
+    def __hash__(self) -> int:
+        value = self._hash
+        if value is None:
+            value = hash(self._key())
+            object.__setattr__(self, '_hash', value)
+        return value
+    
+    def __repr__(self) -> str:
+        return (
+            f"ColumnConfig({self.column_name!r}, {list(self.unique_values)!r}, "
+            f"{self.encoding_type!r}, start_value={self.start_value}, direction={self.direction!r})"
+        )
+    
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (_column_config_from_dict, (self.to_dict(),))
+    
+    def replace(self, **changes: Any) -> 'ColumnConfig':
+        """
+        Create a copy with some settings changed.
+        
+        Args:
+            **changes: Constructor arguments to override
+            
+        Returns:
+            New ColumnConfig
+        """
+        return ColumnConfig(**{**self.to_dict(), **changes})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the configuration to a plain, JSON-compatible dictionary.
+        
+        Returns:
+            Dictionary of constructor arguments
+        """
+        return {
+            'column_name': self.column_name,
+            'unique_values': list(self.unique_values),
+            'encoding_type': self.encoding_type,
+            'start_value': self.start_value,
+            'direction': self.direction,
+            'treat_missing': self.treat_missing,
+            'sanitized_name': self.sanitized_name,
+            'value_map': dict(self.value_map)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ColumnConfig':
+        """Create a configuration from a dictionary produced by to_dict()."""
+        return cls(**data)
+    
+    def get_codes(self) -> Any:
+        """
+        Numeric codes of the ordered values (computed once).
+        
+        Returns:
+            Read-only int64 numpy array aligned with unique_values (empty for
+            types that are not encoded)
+        """
+        if self._codes is None:
+            import numpy as np
+            
+            # Scale variables (continuous numeric), dates and free text don't need encoding
+            if self.encoding_type in ('Ignore', 'Scale', 'Date', 'String'):
+                codes = np.empty(0, dtype=np.int64)
+            elif self.direction == 'Ascending':
+                # First item gets smallest number
+                codes = self.start_value + np.arange(len(self.unique_values), dtype=np.int64)
+            else:  # Descending
+                # First item gets largest number
+                codes = self.start_value + np.arange(len(self.unique_values) - 1, -1, -1, dtype=np.int64)
+            codes.flags.writeable = False
+            object.__setattr__(self, '_codes', codes)
+        return self._codes
         
     def get_mapping(self) -> Dict[str, int]:
         """
-        Generate the encoding mapping based on configuration.
+        Generate the encoding mapping based on configuration (computed once).
         
         Returns:
-            Dictionary mapping original values to numeric codes
+            Dictionary mapping original values to numeric codes. The same
+            dictionary is returned on every call; treat it as read-only.
+        """
+        mapping = self._mapping
+        if mapping is None:
+            codes = self.get_codes()
+            mapping = dict(zip(self.unique_values, codes.tolist())) if len(codes) else {}
+            object.__setattr__(self, '_mapping', mapping)
+        return mapping
+    
+    def get_numbers(self) -> Dict[str, float]:
         """
-        if self.encoding_type == 'Ignore':
-            return {}
+        Numeric value of each listed value, for Scale passthrough (computed once).
         
-        # Scale variables (continuous numeric) don't need encoding
-        if self.encoding_type == 'Scale':
-            return {}
+        Returns:
+            Dictionary of value -> number (NaN where not numeric). Reuses the
+            numbers from detection when they were given.
+        """
+        numbers = self._numbers
+        if numbers is None:
+            numbers = dict(zip(self.unique_values, parse_numbers(self.unique_values).tolist()))
+            object.__setattr__(self, '_numbers', numbers)
+        return numbers
+
+
+def _column_config_from_dict(data: Dict[str, Any]) -> ColumnConfig:
+    """Unpickle helper (pickle cannot assign to an immutable instance)."""
+    return ColumnConfig.from_dict(data)
+
+
+class ColumnInfo(MutableMapping):
+    """
+    Detection results of one column.
+    
+    Distinct values and their counts are kept once, as parallel arrays (a
+    tuple of strings and a 32-bit count array). The record reads like the
+    dictionaries detect_columns used to return: 'unique_values' and
+    'value_counts' are built from the arrays on access, and optional facts
+    (spss_format, min/max, max_width, value_map, numbers, is_sample) live in
+    a small dictionary of extras. 'numbers' is a float array aligned with the
+    values of numeric columns.
+    """
+    
+    __slots__ = (
+        'distinct_values', 'counts', 'n_unique', 'n_missing', 'is_numeric', 'is_datetime',
+        'is_text', 'has_multi_response', 'extras'
+    )
+    
+    distinct_values: Tuple[str, ...]
+    counts: array
+    n_unique: Optional[int]
+    n_missing: int
+    is_numeric: bool
+    is_datetime: bool
+    is_text: bool
+    has_multi_response: bool
+    extras: Dict[str, Any]
+    
+    _FIELDS = ('n_unique', 'n_missing', 'is_numeric', 'is_datetime', 'is_text', 'has_multi_response')
+    _DERIVED = ('unique_values', 'value_counts')
+    
+    def __init__(
+        self,
+        values: Iterable[str] = (),
+        counts: Iterable[int] = (),
+        n_unique: Optional[int] = None,
+        n_missing: int = 0,
+        is_numeric: bool = False,
+        is_datetime: bool = False,
+        is_text: bool = False,
+        has_multi_response: bool = False,
+        **extras: Any
+    ):
+        self.distinct_values = tuple(str(value) for value in values)
+        self.counts = array('I', counts)
+        self.n_unique = len(self.distinct_values) if n_unique is None and not (is_text or is_datetime) else n_unique
+        self.n_missing = int(n_missing)
+        self.is_numeric = bool(is_numeric)
+        self.is_datetime = bool(is_datetime)
+        self.is_text = bool(is_text)
+        self.has_multi_response = bool(has_multi_response)
+        self.extras = extras
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == 'unique_values':
+            # Free text and dates only keep a summary, not a list of categories
+            return [] if self.is_text or self.is_datetime else list(self.distinct_values)
+        if key == 'value_counts':
+            return dict(zip(self.distinct_values, self.counts))
+        if key in self._FIELDS:
+            return getattr(self, key)
+        return self.extras[key]
+    
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._DERIVED:
+            raise KeyError(f"'{key}' is derived from the value arrays")
+        if key in self._FIELDS:
+            setattr(self, key, value)
+        else:
+            self.extras[key] = value
+    
+    def __delitem__(self, key: str) -> None:
+        del self.extras[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from self._DERIVED
+        yield from self._FIELDS
+        yield from self.extras
+    
+    def __len__(self) -> int:
+        return len(self._DERIVED) + len(self._FIELDS) + len(self.extras)
+    
+    def __repr__(self) -> str:
+        return f"ColumnInfo({dict(self)!r})"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dictionary in the detect_columns() layout."""
+        return dict(self)
+    
+    def numeric_values(self) -> Optional[Dict[str, float]]:
+        """
+        Parsed number of each value of a numeric column.
         
-        mapping = {}
-        n_values = len(self.unique_values)
+        Returns:
+            Dictionary of value -> number (NaN if not numeric), or None if
+            the column was not detected as numeric
+        """
+        numbers = self.extras.get('numbers')
+        if numbers is None:
+            return None
+        return dict(zip(self.distinct_values, numbers))
+
+
+def default_column_config(
+    column_name: str,
+    col_info: Dict[str, Any],
+    sanitized_name: Optional[str] = None
+) -> ColumnConfig:
+    """
+    Suggest a configuration for a column from its detection results.
+    
+    Dates and free text keep their own types, numeric columns become Scale,
+    recognized rating scales become Ordinal in their natural order and
+    everything else is Nominal in frequency order.
+    
+    Args:
+        column_name: Original column name
+        col_info: Column metadata from detect_columns()
+        sanitized_name: SPSS variable name (defaults to column_name)
         
-        if self.direction == 'Ascending':
-            # First item gets smallest number
-            for idx, value in enumerate(self.unique_values):
-                mapping[value] = self.start_value + idx
-        else:  # Descending
-            # First item gets largest number
-            for idx, value in enumerate(self.unique_values):
-                mapping[value] = self.start_value + (n_values - 1 - idx)
+    Returns:
+        Suggested ColumnConfig
+    """
+    is_likert, order = infer_likert_order(col_info['unique_values'])
+    if col_info.get('is_datetime'):
+        encoding_type = 'Date'
+    elif col_info.get('is_text'):
+        encoding_type = 'String'
+    elif col_info['is_numeric']:
+        encoding_type = 'Scale'
+    elif is_likert:
+        encoding_type = 'Ordinal'
+    else:
+        encoding_type = 'Nominal'
+    return ColumnConfig(
+        column_name=column_name,
+        unique_values=order,
+        encoding_type=encoding_type,
+        sanitized_name=sanitized_name,
+        value_map=col_info.get('value_map'),
+        numbers=col_info.numeric_values() if isinstance(col_info, ColumnInfo) else None
+    )
+
+
+def load_workbook(source: Union[str, BinaryIO]) -> Dict[str, pd.DataFrame]:
+    """
+    Read every sheet of an Excel workbook.
+    
+    Args:
+        source: Path or binary stream of an .xlsx file
         
-        return mapping
+    Returns:
+        Dictionary of sheet name -> dataframe, in workbook order
+    """
+    import pandas as pd
+    
+    frames = pd.read_excel(source, sheet_name=None, dtype=object)
+    return {sheet_name: compact_text_columns(df) for sheet_name, df in frames.items()}
+
+
+@lru_cache(maxsize=1)
+def arrow_strings_available() -> bool:
+    """Whether pyarrow is installed (text columns stay object columns otherwise)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.info("pyarrow is not installed; text columns are kept as Python objects")
+        return False
+    return True
+
+
+def is_text_dtype(dtype: Any) -> bool:
+    """
+    Check for the Arrow-backed text dtypes used by compact_text_columns.
+    
+    Args:
+        dtype: Column dtype
+        
+    Returns:
+        True for pandas string dtypes and dictionary-encoded Arrow strings
+    """
+    import pandas as pd
+    
+    if isinstance(dtype, pd.StringDtype):
+        return True
+    if isinstance(dtype, pd.ArrowDtype):
+        import pyarrow as pa
+        arrow_type = dtype.pyarrow_dtype
+        return bool(pa.types.is_dictionary(arrow_type) and pa.types.is_string(arrow_type.value_type))
+    return False
+
+
+def compact_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store text columns in Arrow memory instead of Python string objects.
+    
+    Columns whose values are all strings become Arrow strings. Columns of
+    repeated answers (everything that is not free text) are additionally
+    dictionary-encoded, so each distinct answer is stored once. Columns
+    mixing numbers, dates and text are left unchanged. Without pyarrow the
+    dataframe is returned as is.
+    
+    Args:
+        df: Dataframe read with dtype=object
+        
+    Returns:
+        Dataframe with the same values and compact text columns
+    """
+    import pandas as pd
+    
+    if not arrow_strings_available():
+        return df
+    import pyarrow as pa
+    
+    dictionary_dtype = pd.ArrowDtype(pa.dictionary(pa.int32(), pa.string()))
+    compact = df.copy(deep=False)
+    for col in df.columns:
+        values = df[col]
+        if values.dtype != object or pd.api.types.infer_dtype(values, skipna=True) != 'string':
+            continue
+        strings = values.astype(ARROW_STRING_DTYPE)
+        if not is_free_text(strings.nunique(), int(strings.notna().sum())):
+            strings = strings.astype(dictionary_dtype)
+        compact[col] = strings
+    return compact
+
+
+def parse_datetime_column(values: pd.Series) -> pd.Series:
+    """
+    Convert a column to datetimes in one vectorized pass.
+    
+    Cells Excel already stores as dates are converted directly. Text is only
+    handed to the date parser when it starts like a date, so free text and
+    category labels never go through per-value parsing.
+    
+    Args:
+        values: Column values (any dtype)
+        
+    Returns:
+        Timezone-naive datetime series aligned with values (NaT where the
+        value is not a date)
+    """
+    import pandas as pd
+    
+    kind = 'string' if is_text_dtype(values.dtype) else pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ('datetime64', 'datetime', 'date'):
+        candidates = values
+    elif kind in ('string', 'mixed'):
+        date_like = values.astype(str).str.match(_DATE_LIKE_PATTERN, na=False)
+        candidates = values[date_like]
+    else:
+        candidates = values.iloc[:0]
+    
+    try:
+        with warnings.catch_warnings():
+            # Unrecognized layouts fall back to per-value parsing; that is fine here
+            warnings.simplefilter('ignore', UserWarning)
+            parsed = pd.to_datetime(candidates, errors='coerce')
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            # Mixed time zones, nothing that could be converted
+            raise TypeError
+    except (TypeError, ValueError, OverflowError):
+        return pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed.reindex(values.index)
+
+
+def spss_date_format(dates: pd.Series) -> str:
+    """
+    Pick the SPSS display format for a parsed date/time column.
+    
+    Args:
+        dates: Datetime series (see parse_datetime_column)
+        
+    Returns:
+        DATETIME20 if any value has a time of day, DATE11 otherwise
+    """
+    dates = dates.dropna()
+    if (dates != dates.dt.normalize()).any():
+        return SPSS_DATETIME_FORMAT
+    return SPSS_DATE_FORMAT
+
+
+def spss_date_values(dates: pd.Series) -> pd.Series:
+    """
+    Convert parsed dates to SPSS date values (seconds since 1582-10-14).
+    
+    Args:
+        dates: Datetime series (see parse_datetime_column)
+        
+    Returns:
+        float series aligned with dates (NaN where there is no date)
+    """
+    import pandas as pd
+    
+    return (dates - pd.Timestamp(0)).dt.total_seconds() + SPSS_EPOCH_OFFSET_SECONDS
+
+
+def spss_string_width(values: pd.Series) -> int:
+    """
+    Measure the SPSS string width (A format) needed for a text column.
+    
+    SPSS counts string widths in bytes, so the UTF-8 length is used
+    (Arabic letters take two bytes each).
+    
+    Args:
+        values: Column values
+        
+    Returns:
+        Width between 1 and SPSS_MAX_STRING_WIDTH
+    """
+    lengths = values.dropna().astype(str).str.encode('utf-8').str.len()
+    width = int(lengths.max()) if len(lengths) else 1
+    return min(max(width, 1), SPSS_MAX_STRING_WIDTH)
+
+
+def parse_numbers(values: Iterable[Any]) -> Any:
+    """
+    Parse distinct cell values as numbers.
+    
+    Args:
+        values: Distinct raw values (numbers, numeric strings, anything else)
+        
+    Returns:
+        float64 numpy array aligned with values (NaN where not numeric)
+    """
+    import numpy as np
+    import pandas as pd
+    
+    parsed = pd.to_numeric(pd.Series(np.asarray(values, dtype=object), dtype=object), errors='coerce')
+    return parsed.to_numpy(dtype=float, na_value=np.nan)
 
 
-def detect_columns(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+def is_free_text(n_unique: int, n_values: int) -> bool:
+    """
+    Decide whether a column holds free text rather than categories.
+    
+    Args:
+        n_unique: Number of distinct answers
+        n_values: Number of non-missing answers
+        
+    Returns:
+        True if there are too many distinct answers to label them
+    """
+    if n_unique > MAX_CATEGORIES:
+        return True
+    return n_unique >= TEXT_MIN_UNIQUE and n_unique / n_values >= TEXT_UNIQUE_RATIO
+
+
+def detect_columns(df: pd.DataFrame, normalize: bool = False) -> Dict[str, ColumnInfo]:
     """
     Detect unique values and metadata for each column in the dataframe.
     
     Args:
         df: Input dataframe
+        normalize: Collapse spellings of the same answer (case, spaces,
+            Arabic letter variants) into one value, see normalize.py
         
     Returns:
-        Dictionary with column metadata including unique values, counts, etc.
+        Dictionary of column name -> ColumnInfo (unique values, counts, etc.).
+        Categorical columns carry a value_map of raw -> canonical values.
     """
+    import numpy as np
+    import pandas as pd
+    
     column_info = {}
     
     for col in df.columns:
         # Get non-null values
         values = df[col].dropna()
+        value_counts = values.value_counts(sort=False)
         
         # Check if already numeric
         numeric_ratio = 0
+        numbers = None
         try:
-            numeric_converted = pd.to_numeric(values, errors='coerce')
-            numeric_ratio = numeric_converted.notna().sum() / len(values) if len(values) > 0 else 0
+            # Parse each distinct value once, then weight by how often it occurs.
+            # The parsed numbers are kept so Scale columns are not converted again.
+            numbers = parse_numbers(value_counts.index)
+            parsed_counts = value_counts.to_numpy()[~np.isnan(numbers)].sum()
+            numeric_ratio = parsed_counts / len(values) if len(values) > 0 else 0
         except:
             numeric_ratio = 0
         
-        # Get unique values sorted by frequency
-        value_counts = Counter(values)
-        unique_values = [str(val) for val, _ in value_counts.most_common()]
+        # Timestamps are unique per response: keep summary facts, not a value list
+        if numeric_ratio <= 0.8 and len(values) > 0:
+            dates = parse_datetime_column(values)
+            if dates.notna().sum() / len(values) >= DATETIME_MIN_RATIO:
+                column_info[col] = ColumnInfo(
+                    n_unique=int(dates.nunique()),
+                    n_missing=df[col].isna().sum(),
+                    is_datetime=True,
+                    spss_format=spss_date_format(dates),
+                    min=dates.min(),
+                    max=dates.max()
+                )
+                continue
+        
+        # Unique values sorted by frequency (ties keep first-seen order)
+        raw_values = value_counts.index
+        value_map = canonical_value_map(value_counts) if normalize else {}
+        if value_map:
+            canonical = [value_map.get(value, value) for value in value_counts.index]
+            value_counts = value_counts.groupby(canonical, sort=False).sum()
+        value_counts = value_counts.sort_values(ascending=False, kind='stable')
+        
+        # Open-ended answers: keep a short summary, the data passes through as text
+        if numeric_ratio <= 0.8 and is_free_text(len(value_counts), len(values)):
+            top_values = value_counts.head(TEXT_TOP_VALUES)
+            column_info[col] = ColumnInfo(
+                top_values.index,
+                top_values.to_numpy(),
+                n_unique=len(value_counts),
+                n_missing=df[col].isna().sum(),
+                is_text=True,
+                max_width=spss_string_width(values)
+            )
+            continue
+        
+        unique_values = [str(val) for val in value_counts.index]
         
         # Check for multi-response indicators
         has_multi_response = any(
-            ',' in str(val) or ';' in str(val) 
+            ',' in val or ';' in val
             for val in unique_values
         )
         
-        column_info[col] = {
-            'unique_values': unique_values,
-            'n_unique': len(unique_values),
-            'n_missing': df[col].isna().sum(),
-            'is_numeric': numeric_ratio > 0.8,
-            'has_multi_response': has_multi_response,
-            'value_counts': dict(value_counts)
-        }
+        extras: Dict[str, Any] = {}
+        if numeric_ratio > 0.8 and not value_map:
+            # Parsed number of each listed value, for Scale passthrough
+            extras['numbers'] = array('d', pd.Series(numbers, index=raw_values).reindex(value_counts.index))
+        
+        column_info[col] = ColumnInfo(
+            unique_values,
+            value_counts.to_numpy(),
+            n_missing=df[col].isna().sum(),
+            is_numeric=numeric_ratio > 0.8,
+            has_multi_response=has_multi_response,
+            value_map=value_map,
+            **extras
+        )
         
     return column_info
 
 
+def detect_columns_sample(
+    df: pd.DataFrame,
+    n_rows: int = DETECTION_SAMPLE_ROWS,
+    normalize: bool = False
+) -> Tuple[Dict[str, ColumnInfo], bool]:
+    """
+    Run column detection on a row sample for a fast first pass.
+    
+    The sample is drawn at random (with a fixed seed) so rare values spread
+    across the sheet have a chance to show up. Counts and missing totals in
+    the result describe the sample only.
+    
+    Args:
+        df: Input dataframe
+        n_rows: Maximum number of rows to scan
+        normalize: Collapse spellings of the same answer (see detect_columns)
+        
+    Returns:
+        Tuple of (column_info, is_sample). is_sample is False when the
+        dataframe is small enough to be scanned completely.
+    """
+    if len(df) <= n_rows:
+        return detect_columns(df, normalize), False
+    
+    sample = df.sample(n=n_rows, random_state=0)
+    column_info = detect_columns(sample, normalize)
+    for info in column_info.values():
+        info['is_sample'] = True
+    return column_info, True
+
+
+def detect_sheets(
+    frames: Dict[str, pd.DataFrame],
+    detector: Callable[[pd.DataFrame], Any] = detect_columns,
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Run column detection for several sheets in parallel.
+    
+    Args:
+        frames: Dictionary of sheet name -> dataframe
+        detector: Detection function applied to each sheet
+            (detect_columns or detect_columns_sample)
+        max_workers: Maximum number of worker threads (default: one per sheet)
+        
+    Returns:
+        Dictionary of sheet name -> detector result, in the order of frames
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if len(frames) <= 1:
+        return {name: detector(df) for name, df in frames.items()}
+    
+    with ThreadPoolExecutor(
+        max_workers=max_workers or len(frames), thread_name_prefix="detect-sheet"
+    ) as pool:
+        futures = {name: pool.submit(detector, df) for name, df in frames.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def merge_column_order(current_order: List[str], unique_values: List[str]) -> List[str]:
+    """
+    Merge values found by a full detection pass into an existing order.
+    
+    The existing order (possibly rearranged by the user) is kept as is and
+    values that were not seen before are appended in frequency order.
+    
+    Args:
+        current_order: Current ordered list of values
+        unique_values: Unique values from the full detection pass
+        
+    Returns:
+        Merged ordered list of values
+    """
+    seen = set(current_order)
+    return current_order + [value for value in unique_values if value not in seen]
+
+
+def apply_bulk_order(current_order: List[str], requested_order: List[str]) -> List[str]:
+    """
+    Reorder values in one step from a pasted or edited list.
+    
+    Requested values come first, in the requested order. Values left out
+    keep their relative order at the end, so a partial list (e.g. only the
+    first few) is enough. Blank lines and repeats are ignored.
+    
+    Args:
+        current_order: Current ordered list of values
+        requested_order: Values in the desired order
+        
+    Returns:
+        New ordered list containing exactly the values of current_order
+        
+    Raises:
+        ValueError: If a requested value is not one of the column's values
+    """
+    # Match ignoring surrounding whitespace, which is easily lost when pasting
+    known = {value.strip(): value for value in current_order}
+    requested = []
+    for line in requested_order:
+        line = line.strip()
+        if not line:
+            continue
+        if line not in known:
+            raise ValueError(f"Unknown value: '{line}'")
+        if known[line] not in requested:
+            requested.append(known[line])
+    
+    seen = set(requested)
+    return requested + [value for value in current_order if value not in seen]
+
+
 def apply_encoding(
     df: pd.DataFrame,
-    configs: Dict[str, ColumnConfig]
+    configs: Dict[str, ColumnConfig],
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    analysis: Optional[DatasetAnalysis] = None
 ) -> Tuple[pd.DataFrame, Dict[str, Dict[str, int]]]:
     """
     Apply encoding configurations to the dataframe.
@@ -119,55 +816,113 @@ def apply_encoding(
     Args:
         df: Input dataframe
         configs: Dictionary mapping column names to ColumnConfig objects
+        progress_callback: Optional callable receiving (done, total, column_name)
+            before each column is encoded. It may raise to abort encoding.
+        analysis: Shared DatasetAnalysis of df (see analysis.py); columns are
+            factorized here when it is not given
         
     Returns:
         Tuple of (encoded_dataframe, mappings_dict)
     """
+    from .analysis import analysis_for
+    
+    analysis = analysis_for(df, analysis)
     encoded_df = df.copy()
     all_mappings = {}
+    total = len(configs)
     
-    for col_name, config in configs.items():
+    for done, (col_name, config) in enumerate(configs.items()):
+        if progress_callback is not None:
+            progress_callback(done, total, col_name)
+        
         if config.encoding_type == 'Ignore':
             continue
+        
+        # Free text is passed through unchanged
+        if config.encoding_type == 'String':
+            continue
+        
+        # Dates are written as native date cells, without value labels
+        if config.encoding_type == 'Date':
+            encoded_df[col_name] = parse_datetime_column(df[col_name])
+            logger.info(f"Converted column '{col_name}' to dates")
+            continue
+        
+        # Numbers pass through as a numeric column, without value labels
+        if config.encoding_type == 'Scale':
+            encoded_df[col_name] = analysis.column(col_name).encode(config, df.index)
+            logger.info(f"Passed column '{col_name}' through as numbers")
+            continue
             
         mapping = config.get_mapping()
         all_mappings[col_name] = mapping
         
-        # Apply mapping
-        encoded_df[col_name] = df[col_name].map(lambda x: mapping.get(str(x), np.nan) if pd.notna(x) else np.nan)
+        # Look up each distinct value once (through the spelling normalization
+        # recorded at detection), then broadcast the codes to all rows
+        encoded_df[col_name] = analysis.column(col_name).encode(config, df.index)
         
         logger.info(f"Encoded column '{col_name}' with {len(mapping)} mappings")
     
     return encoded_df, all_mappings
 
 
-def save_encoded_excel(df: pd.DataFrame, output_path: str, sheet_name: str = 'Sheet1') -> None:
+def save_encoded_excel(
+    df: pd.DataFrame,
+    output_path: Union[str, BinaryIO],
+    sheet_name: str = 'Sheet1'
+) -> None:
     """
     Save encoded dataframe to Excel file in a format compatible with SPSS.
     Uses xlsxwriter engine for better SPSS compatibility.
     
     Args:
         df: Encoded dataframe
-        output_path: Path to output Excel file
+        output_path: Path to output Excel file, or a writable binary stream
         sheet_name: Name of sheet to create
     """
+    save_encoded_workbook({sheet_name: df}, output_path)
+
+
+def save_encoded_workbook(
+    frames: Dict[str, pd.DataFrame],
+    output_path: Union[str, BinaryIO],
+    content_widths: Optional[Dict[str, List[int]]] = None
+) -> None:
+    """
+    Save several encoded dataframes as sheets of one SPSS-compatible workbook.
+    
+    Args:
+        frames: Dictionary of sheet name -> encoded dataframe
+        output_path: Path to output Excel file, or a writable binary stream
+        content_widths: Optional sheet name -> widest cell text per column
+            (see DatasetAnalysis.content_widths); sheets without it are measured
+    """
+    import pandas as pd
+    
     # Use xlsxwriter for better SPSS compatibility
     # Write with proper formatting to ensure SPSS can read it
-    with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
-        
-        # Get workbook and worksheet objects
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-        
-        # Set column widths for readability
-        for idx, col in enumerate(df.columns):
-            max_len = max(
-                df[col].astype(str).apply(len).max(),
-                len(str(col))
-            )
-            worksheet.set_column(idx, idx, min(max_len + 2, 50))
+    # Dates are stored as Excel date cells so SPSS reads them as date variables
+    with pd.ExcelWriter(
+        output_path,
+        engine='xlsxwriter',
+        datetime_format='yyyy-mm-dd hh:mm:ss',
+        date_format='yyyy-mm-dd'
+    ) as writer:
+        for sheet_name, df in frames.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            worksheet = writer.sheets[sheet_name]
+            
+            # Set column widths for readability
+            widths = (content_widths or {}).get(sheet_name)
+            for idx, col in enumerate(df.columns):
+                if widths is not None:
+                    content_len = widths[idx]
+                else:
+                    content_len = df[col].fillna('').astype(str).str.len().max()
+                max_len = max(content_len, len(str(col)))
+                worksheet.set_column(idx, idx, min(max_len + 2, 50))
     
-    logger.info(f"Saved encoded Excel to: {output_path}")
-
-
+    if isinstance(output_path, str):
+        logger.info(f"Saved encoded Excel to: {output_path}")
+    else:
+        logger.info("Saved encoded Excel to stream")
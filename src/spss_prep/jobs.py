@@ -0,0 +1,673 @@
+"""
+Background job execution for the encoding pipeline.
+Runs encoding and file generation off the UI thread with progress and cancellation.
+"""
+
+import io
+import math
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import pandas as pd
+
+from .analysis import ColumnAnalysis, DatasetAnalysis, analysis_for
+from .cache import ArtifactCache, cache_key
+from .codebook import CODEBOOK_NAME, codebook_bytes
+from .encoder import (
+    ColumnConfig, apply_encoding, parse_datetime_column, save_encoded_workbook, spss_date_format,
+    spss_date_values
+)
+from .sps_generator import (
+    generate_recode_sps_syntax, generate_sps_syntax, generate_workbook_sps_syntax, save_sps_file
+)
+from .utils import sanitize_variable_name
+from .verify import verify_encoding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Shared worker pool for encoding jobs
+_job_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="encode-job")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested."""
+
+
+class Job:
+    """
+    Handle for a pipeline function running on a worker thread.
+
+    The function receives a ``progress_callback(done, total, message)`` keyword
+    argument. Calling it updates the job progress and raises JobCancelled when
+    the job has been cancelled, so work stops at the next checkpoint.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._future: Optional[Future] = None
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> 'Job':
+        """Submit the job to the shared worker pool."""
+        self._future = _job_executor.submit(self._run)
+        return self
+
+    def cancel(self) -> None:
+        """Request cancellation; the job stops at its next progress checkpoint."""
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the job finishes and return its result."""
+        if self._future is not None:
+            self._future.result(timeout=timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def report_progress(self, done: int, total: int, message: str = "") -> None:
+        """Progress callback handed to the pipeline function."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.progress = done / total if total else 0.0
+            self.message = message
+
+    def _run(self) -> None:
+        with self._lock:
+            self.status = RUNNING
+            self.started_at = time.monotonic()
+        try:
+            result = self._fn(*self._args, progress_callback=self.report_progress, **self._kwargs)
+        except JobCancelled:
+            with self._lock:
+                self.status = CANCELLED
+                self.message = "Cancelled"
+            logger.info("Encoding job cancelled")
+        except Exception as e:
+            with self._lock:
+                self.status = FAILED
+                self.error = e
+                self.message = str(e)
+            logger.error(f"Encoding job failed: {str(e)}", exc_info=True)
+        else:
+            with self._lock:
+                self.result = result
+                self.status = DONE
+                self.progress = 1.0
+                self.message = "Done"
+        finally:
+            self.finished_at = time.monotonic()
+
+
+def submit_job(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Job:
+    """
+    Start a pipeline function in the background.
+
+    Args:
+        fn: Function accepting a ``progress_callback`` keyword argument
+        *args, **kwargs: Arguments passed through to fn
+
+    Returns:
+        Running Job handle
+    """
+    return Job(fn, *args, **kwargs).start()
+
+
+def build_output_bundle(files: Dict[str, bytes], paths: Optional[Dict[str, str]] = None) -> bytes:
+    """
+    Pack output artifacts into a single zip archive.
+
+    Already-compressed formats (.xlsx, .zip) are stored as is; text files
+    are deflated.
+
+    Args:
+        files: Dictionary of file name -> file content
+        paths: Optional files on disk (name -> path), streamed into the
+            archive without reading them into memory first
+
+    Returns:
+        Zip archive bytes
+    """
+    def compress_type(name: str) -> int:
+        return zipfile.ZIP_STORED if name.endswith(('.xlsx', '.zip')) else zipfile.ZIP_DEFLATED
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as bundle:
+        for name, path in (paths or {}).items():
+            bundle.write(path, arcname=name, compress_type=compress_type(name))
+        for name, data in files.items():
+            bundle.writestr(name, data, compress_type=compress_type(name))
+    return buffer.getvalue()
+
+
+def run_encoding_pipeline(
+    df: pd.DataFrame,
+    configs: Dict[str, ColumnConfig],
+    encoded_name: str = 'encoded_data.xlsx',
+    sps_name: str = 'auto_import.sps',
+    include_save: bool = False,
+    sanitize_names: bool = True,
+    extra_files: Optional[Dict[str, bytes]] = None,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Encode a dataframe and produce the encoded Excel file and .sps syntax
+    as one in-memory zip bundle.
+
+    Single-sheet form of run_workbook_pipeline; the output sheet is 'Sheet1'.
+
+    Args:
+        df: Input dataframe
+        configs: Dictionary mapping column names to ColumnConfig objects
+        encoded_name: File name of the encoded Excel file inside the bundle
+        sps_name: File name of the .sps file inside the bundle
+        include_save: Whether to include SAVE OUTFILE in the syntax
+        sanitize_names: Rename columns to their sanitized SPSS names
+        extra_files: Optional additional files (name -> bytes) for the bundle
+        progress_callback: Optional callable receiving (done, total, message)
+
+    Returns:
+        Dictionary with encoded_df, mappings, sps_syntax and bundle (zip bytes)
+    """
+    return run_workbook_pipeline(
+        {'Sheet1': df},
+        {'Sheet1': configs},
+        encoded_name=encoded_name,
+        sps_name=sps_name,
+        include_save=include_save,
+        sanitize_names=sanitize_names,
+        extra_files=extra_files,
+        progress_callback=progress_callback
+    )
+
+
+def prepare_sheet_output(
+    df: pd.DataFrame,
+    encoded_df: pd.DataFrame,
+    mappings: Dict[str, Dict[str, int]],
+    configs: Dict[str, ColumnConfig],
+    sanitize_names: bool,
+    analysis: DatasetAnalysis
+) -> Dict[str, Any]:
+    """
+    Rename an encoded sheet and collect the metadata its syntax and writer need.
+
+    Shared by the workbook pipeline and the append mode.
+
+    Args:
+        df: Input sheet
+        encoded_df: Encoded sheet, before renaming
+        mappings: Dictionary of column name -> {answer: code}, as returned by apply_encoding
+        configs: Column configurations used for encoding
+        sanitize_names: Whether to rename columns to their SPSS variable names
+        analysis: Analysis of the input sheet (for string and cell widths)
+
+    Returns:
+        Dictionary with output_df, mappings, original_names, measure_types,
+        variable_formats, string_widths and content_widths
+    """
+    output_df = encoded_df
+    if sanitize_names:
+        rename_map = {
+            col: configs[col].sanitized_name
+            for col in df.columns
+            if col in configs
+        }
+        output_df = encoded_df.rename(columns=rename_map)
+        mappings = {
+            configs[k].sanitized_name: v
+            for k, v in mappings.items()
+        }
+
+    # Build original names mapping for VARIABLE LABELS
+    original_names = {
+        configs[col].sanitized_name: col
+        for col in df.columns
+        if col in configs
+    }
+
+    # Build measure types mapping for VARIABLE LEVEL
+    measure_types = {
+        configs[col].sanitized_name: configs[col].encoding_type
+        for col in df.columns
+        if col in configs
+    }
+
+    # Date/time display formats for FORMATS
+    variable_formats = {
+        configs[col].sanitized_name: spss_date_format(encoded_df[col])
+        for col in df.columns
+        if col in configs and configs[col].encoding_type == 'Date'
+    }
+
+    # Widths of free-text variables for ALTER TYPE
+    string_widths = {
+        configs[col].sanitized_name: analysis.column(col).spss_string_width()
+        for col in df.columns
+        if col in configs and configs[col].encoding_type == 'String'
+    }
+
+    # Cell widths for the Excel writer, from the distinct values
+    content_widths = analysis.content_widths(configs)
+
+    return {
+        'output_df': output_df,
+        'mappings': mappings,
+        'original_names': original_names,
+        'measure_types': measure_types,
+        'variable_formats': variable_formats,
+        'string_widths': string_widths,
+        'content_widths': content_widths,
+    }
+
+
+def run_workbook_pipeline(
+    frames: Dict[str, pd.DataFrame],
+    sheet_configs: Dict[str, Dict[str, ColumnConfig]],
+    encoded_name: str = 'encoded_data.xlsx',
+    sps_name: str = 'auto_import.sps',
+    include_save: bool = False,
+    sanitize_names: bool = True,
+    split_sheets: bool = False,
+    extra_files: Optional[Dict[str, bytes]] = None,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    analyses: Optional[Dict[str, DatasetAnalysis]] = None,
+    recode_in_spss: bool = False,
+    source_name: Optional[str] = None,
+    column_info: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Encode every sheet of a workbook and produce the outputs as one in-memory
+    zip bundle.
+
+    Sheets are encoded in parallel (progress is reported per column across
+    all sheets); the independent output artifacts are then written
+    concurrently into memory buffers. Nothing is written to disk.
+
+    With several sheets the .sps imports each one as a named dataset. The
+    encoded sheets go into one workbook, or into one file per sheet when
+    split_sheets is set.
+
+    Args:
+        frames: Dictionary of sheet name -> input dataframe
+        sheet_configs: Dictionary of sheet name -> {column name: ColumnConfig}
+        encoded_name: File name of the encoded Excel file inside the bundle
+            (with split_sheets, the base for the per-sheet file names)
+        sps_name: File name of the .sps file inside the bundle
+        include_save: Whether to include SAVE OUTFILE in the syntax
+        sanitize_names: Rename columns to their sanitized SPSS names
+        split_sheets: Write one Excel file per sheet instead of one workbook
+        extra_files: Optional additional files (name -> bytes) for the bundle
+        progress_callback: Optional callable receiving (done, total, message)
+        analyses: Optional sheet name -> DatasetAnalysis created once per
+            upload (see analysis.analyze_frames); sheets without one are
+            analyzed here. Encoding, string widths and Excel column widths
+            all work from it.
+        recode_in_spss: Skip encoding and let the syntax recode the original
+            upload (see run_recode_pipeline)
+        source_name: File name of the original upload (recode_in_spss only)
+        column_info: Optional sheet name -> detection results; the encoded
+            counts per code are verified against them (see verify.py)
+
+    Returns:
+        Dictionary with encoded_frames (sheet -> encoded dataframe), encoded_df
+        (first sheet), mappings (sheet -> mappings), verification (sheet ->
+        report per column), sps_syntax and bundle
+    """
+    if recode_in_spss:
+        return run_recode_pipeline(
+            frames, sheet_configs, source_name or encoded_name,
+            sps_name=sps_name,
+            include_save=include_save,
+            extra_files=extra_files,
+            progress_callback=progress_callback,
+            analyses=analyses
+        )
+
+    report = progress_callback or (lambda done, total, message: None)
+    # One step per column plus the artifact stage
+    total = sum(len(configs) for configs in sheet_configs.values()) + 1
+    done_count = [0]
+    progress_lock = threading.Lock()
+
+    def column_progress(sheet_name: str) -> Callable[[int, int, str], None]:
+        def callback(_done: int, _total: int, col: str) -> None:
+            with progress_lock:
+                done = done_count[0]
+                done_count[0] += 1
+            label = f"'{col}'" if len(frames) == 1 else f"'{sheet_name}' / '{col}'"
+            report(done, total, f"Encoding {label}")
+        return callback
+
+    analyses = {
+        sheet_name: analysis_for(df, (analyses or {}).get(sheet_name))
+        for sheet_name, df in frames.items()
+    }
+
+    # Sheets are independent, so encode them in parallel
+    with ThreadPoolExecutor(max_workers=max(len(frames), 1), thread_name_prefix="encode-sheet") as pool:
+        futures = {
+            sheet_name: pool.submit(
+                apply_encoding, df, sheet_configs.get(sheet_name, {}),
+                progress_callback=column_progress(sheet_name),
+                analysis=analyses[sheet_name]
+            )
+            for sheet_name, df in frames.items()
+        }
+        encoded = {sheet_name: future.result() for sheet_name, future in futures.items()}
+
+    # Check the encoded columns against the input (whole-column operations only)
+    verify_start = time.perf_counter()
+    verification = {
+        sheet_name: verify_encoding(
+            frames[sheet_name], encoded_df, sheet_configs.get(sheet_name, {}),
+            (column_info or {}).get(sheet_name), analyses[sheet_name]
+        )
+        for sheet_name, (encoded_df, _) in encoded.items()
+    }
+    logger.info(f"Verified encoded output in {time.perf_counter() - verify_start:.3f}s")
+    report(total - 1, total, "Writing files")
+
+    sheets = {
+        sheet_name: prepare_sheet_output(
+            frames[sheet_name], encoded_df, mappings,
+            sheet_configs.get(sheet_name, {}), sanitize_names, analyses[sheet_name]
+        )
+        for sheet_name, (encoded_df, mappings) in encoded.items()
+    }
+
+    # Decide which file holds which sheet
+    base, ext = os.path.splitext(encoded_name)
+    if split_sheets and len(frames) > 1:
+        sheet_files = {
+            sheet_name: f"{base}_{sanitize_variable_name(sheet_name)}{ext}"
+            for sheet_name in frames
+        }
+    else:
+        sheet_files = {sheet_name: encoded_name for sheet_name in frames}
+
+    if len(sheets) == 1:
+        sheet_name, sheet = next(iter(sheets.items()))
+        save_path = encoded_name.replace('.xlsx', '.sav') if include_save else None
+        sps_syntax = generate_sps_syntax(
+            excel_path=encoded_name,
+            mappings=sheet['mappings'],
+            original_names=sheet['original_names'],
+            sheet_name=sheet_name,
+            include_save=include_save,
+            save_path=save_path,
+            use_relative_path=True,
+            measure_types=sheet['measure_types'],
+            variable_formats=sheet['variable_formats'],
+            string_widths=sheet['string_widths']
+        )
+    else:
+        sps_syntax = generate_workbook_sps_syntax(
+            [
+                {
+                    'excel_path': sheet_files[sheet_name],
+                    'sheet_name': sheet_name,
+                    'dataset_name': sheet_name,
+                    'mappings': sheet['mappings'],
+                    'original_names': sheet['original_names'],
+                    'measure_types': sheet['measure_types'],
+                    'variable_formats': sheet['variable_formats'],
+                    'string_widths': sheet['string_widths'],
+                }
+                for sheet_name, sheet in sheets.items()
+            ],
+            include_save=include_save,
+            use_relative_path=True
+        )
+
+    # Group sheets per output file
+    workbooks: Dict[str, Dict[str, pd.DataFrame]] = {}
+    for sheet_name, file_name in sheet_files.items():
+        workbooks.setdefault(file_name, {})[sheet_name] = sheets[sheet_name]['output_df']
+    content_widths = {sheet_name: sheet['content_widths'] for sheet_name, sheet in sheets.items()}
+
+    # Artifacts do not depend on each other, so write them concurrently
+    buffers = {name: io.BytesIO() for name in list(workbooks) + [sps_name]}
+    writers: List[Tuple[Callable[..., None], Tuple[Any, ...]]] = [
+        (save_encoded_workbook, (workbook, buffers[file_name], content_widths))
+        for file_name, workbook in workbooks.items()
+    ]
+    writers.append((save_sps_file, (sps_syntax, buffers[sps_name])))
+    with ThreadPoolExecutor(max_workers=len(writers), thread_name_prefix="artifact") as pool:
+        futures_list = [pool.submit(writer, *args) for writer, args in writers]
+        for future in futures_list:
+            future.result()
+
+    files = {name: buffer.getvalue() for name, buffer in buffers.items()}
+    buffers.clear()
+    files[CODEBOOK_NAME] = codebook_bytes([
+        {'sheet_name': sheet_name, 'file': sheet_files[sheet_name], **sheet}
+        for sheet_name, sheet in sheets.items()
+    ])
+    files.update(extra_files or {})
+    bundle = build_output_bundle(files)
+
+    report(total, total, "Done")
+    encoded_frames = {sheet_name: encoded_df for sheet_name, (encoded_df, _) in encoded.items()}
+    return {
+        'encoded_frames': encoded_frames,
+        'encoded_df': next(iter(encoded_frames.values())),
+        'mappings': {sheet_name: sheet['mappings'] for sheet_name, sheet in sheets.items()},
+        'verification': verification,
+        'sps_syntax': sps_syntax,
+        'bundle': bundle,
+    }
+
+
+def _recode_values(column: ColumnAnalysis) -> List[Any]:
+    """Distinct raw values of a column as SPSS reads them (text, number or date value)."""
+    kind = column.source_kind()
+    if kind == 'text':
+        return column.keys
+    if kind == 'date':
+        return list(spss_date_values(pd.Series(column.uniques, dtype='datetime64[ns]')))
+    return list(column.uniques)
+
+
+def _prepare_recode_sheet(
+    df: pd.DataFrame,
+    configs: Dict[str, ColumnConfig],
+    analysis: DatasetAnalysis
+) -> Dict[str, Any]:
+    """Build the RECODE specification and syntax metadata of one sheet from its distinct values."""
+    columns: List[Dict[str, Any]] = []
+    mappings = {}
+    original_names = {}
+    measure_types = {}
+    variable_formats = {}
+    string_widths = {}
+    for col in df.columns:
+        config = configs.get(col)
+        if config is None:
+            columns.append({'name': analysis.var_names[col], 'recode': None})
+            continue
+        name = config.sanitized_name
+        encoding_type = config.encoding_type
+        original_names[name] = col
+        measure_types[name] = encoding_type
+        recode: Any = None
+
+        if encoding_type in ('Ordinal', 'Nominal'):
+            column = analysis.column(col)
+            mappings[name] = config.get_mapping()
+            codes = column.lookup(config)[:-1]
+            recode = [
+                (value, code)
+                for value, code in zip(_recode_values(column), codes)
+                if not math.isnan(code)
+            ]
+        elif encoding_type == 'Scale':
+            if analysis.column(col).source_kind() == 'text':
+                recode = 'convert'
+        elif encoding_type == 'Date':
+            column = analysis.column(col)
+            dates = parse_datetime_column(pd.Series(column.uniques, dtype=object))
+            variable_formats[name] = spss_date_format(dates)
+            if column.source_kind() != 'date':
+                # Dates stored as text are recoded to SPSS date values
+                recode = [
+                    (value, seconds)
+                    for value, seconds in zip(_recode_values(column), spss_date_values(dates))
+                    if not math.isnan(seconds)
+                ]
+        elif encoding_type == 'String':
+            string_widths[name] = analysis.column(col).spss_string_width()
+
+        columns.append({'name': name, 'recode': recode})
+
+    return {
+        'n_rows': len(df),
+        'columns': columns,
+        'mappings': mappings,
+        'original_names': original_names,
+        'measure_types': measure_types,
+        'variable_formats': variable_formats,
+        'string_widths': string_widths,
+    }
+
+
+def run_recode_pipeline(
+    frames: Dict[str, pd.DataFrame],
+    sheet_configs: Dict[str, Dict[str, ColumnConfig]],
+    source_name: str,
+    sps_name: str = 'auto_import.sps',
+    include_save: bool = False,
+    extra_files: Optional[Dict[str, bytes]] = None,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    analyses: Optional[Dict[str, DatasetAnalysis]] = None
+) -> Dict[str, Any]:
+    """
+    Produce syntax that recodes the original upload in SPSS ("Recode in SPSS").
+
+    No cell is rewritten and no encoded workbook is written: the .sps reads
+    the uploaded file itself and maps answers to codes with RECODE ... INTO,
+    so the work here only depends on the distinct values of each column.
+
+    Args:
+        frames: Dictionary of sheet name -> input dataframe (as read from the upload)
+        sheet_configs: Dictionary of sheet name -> {column name: ColumnConfig}
+        source_name: File name of the original upload, referenced by GET DATA
+        sps_name: File name of the .sps file inside the bundle
+        include_save: Whether to include SAVE OUTFILE in the syntax
+        extra_files: Optional additional files (name -> bytes) for the bundle
+        progress_callback: Optional callable receiving (done, total, message)
+        analyses: Optional shared analyses of the sheets
+
+    Returns:
+        Dictionary with encoded_frames (empty), encoded_df (None), mappings
+        (sheet -> mappings), verification (unmapped answers only), sps_syntax
+        and bundle (the .sps and the codebook)
+    """
+    report = progress_callback or (lambda done, total, message: None)
+    total = len(frames) + 1
+    datasets = []
+    verification = {}
+    for done, (sheet_name, df) in enumerate(frames.items()):
+        report(done, total, f"Building recodes for '{sheet_name}'")
+        analysis = analysis_for(df, (analyses or {}).get(sheet_name))
+        sheet = _prepare_recode_sheet(df, sheet_configs.get(sheet_name, {}), analysis)
+        datasets.append({'sheet_name': sheet_name, **sheet})
+        # Nothing is encoded here, so only answers without a code can be reported
+        verification[sheet_name] = verify_encoding(df, None, sheet_configs.get(sheet_name, {}), analysis=analysis)
+    report(total - 1, total, "Writing files")
+
+    sps_syntax = generate_recode_sps_syntax(
+        source_name, datasets, include_save=include_save, use_relative_path=True
+    )
+    buffer = io.BytesIO()
+    save_sps_file(sps_syntax, buffer)
+    files = {
+        sps_name: buffer.getvalue(),
+        CODEBOOK_NAME: codebook_bytes([{'file': source_name, **dataset} for dataset in datasets]),
+    }
+    files.update(extra_files or {})
+
+    report(total, total, "Done")
+    return {
+        'encoded_frames': {},
+        'encoded_df': None,
+        'mappings': {dataset['sheet_name']: dataset['mappings'] for dataset in datasets},
+        'verification': verification,
+        'sps_syntax': sps_syntax,
+        'bundle': build_output_bundle(files),
+    }
+
+
+def run_cached_encoding_pipeline(
+    frames: Dict[str, pd.DataFrame],
+    sheet_configs: Dict[str, Dict[str, ColumnConfig]],
+    input_hash: str,
+    cache: ArtifactCache,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    analyses: Optional[Dict[str, DatasetAnalysis]] = None,
+    column_info: Optional[Dict[str, Dict[str, Any]]] = None,
+    **options: Any
+) -> Dict[str, Any]:
+    """
+    Run the workbook pipeline through the content-addressed result cache.
+
+    On a hit the stored bundle and syntax are returned without encoding;
+    encoded_frames then only hold the preview rows. On a miss the pipeline
+    runs and its result is stored. Both return the same keys.
+
+    Args:
+        frames: Dictionary of sheet name -> input dataframe
+        sheet_configs: Dictionary of sheet name -> {column name: ColumnConfig}
+        input_hash: Hash of the uploaded file bytes
+        cache: Cache to read from and write to
+        progress_callback: Optional callable receiving (done, total, message)
+        analyses: Optional shared analyses of the sheets (not part of the key)
+        column_info: Optional detection results for verification (not part of the key)
+        **options: Options passed to run_workbook_pipeline (part of the key)
+
+    Returns:
+        Pipeline result dictionary ('cached' tells whether it is a hit)
+    """
+    key = cache_key(input_hash, sheet_configs, options)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = run_workbook_pipeline(
+        frames, sheet_configs, progress_callback=progress_callback, analyses=analyses,
+        column_info=column_info, **options
+    )
+    cache.put(key, result)
+    result['cached'] = False
+    return result
@@ -0,0 +1,172 @@
+"""
+Likert scale dictionary for English and Arabic answer labels.
+Recognizes common rating scales and suggests their natural order (lowest first).
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Ordered rating scales, lowest to highest. Each step lists the spellings
+# (English and Arabic) that mean the same rank.
+LIKERT_SCALES: Dict[str, List[List[str]]] = {
+    'agreement': [
+        ['strongly disagree', 'أعارض بشدة', 'غير موافق بشدة', 'لا أوافق بشدة', 'أرفض بشدة'],
+        ['disagree', 'أعارض', 'غير موافق', 'لا أوافق', 'أرفض'],
+        ['neutral', 'neither agree nor disagree', 'undecided', 'محايد', 'لا أعلم', 'غير متأكد'],
+        ['agree', 'أوافق', 'موافق'],
+        ['strongly agree', 'أوافق بشدة', 'موافق بشدة'],
+    ],
+    'frequency': [
+        ['never', 'أبدا', 'أبداً', 'لا أبدا', 'مطلقا'],
+        ['rarely', 'seldom', 'نادرا', 'نادراً'],
+        ['sometimes', 'occasionally', 'أحيانا', 'أحياناً'],
+        ['often', 'usually', 'frequently', 'غالبا', 'غالباً', 'كثيرا', 'كثيراً'],
+        ['always', 'دائما', 'دائماً'],
+    ],
+    'satisfaction': [
+        ['very dissatisfied', 'غير راض جدا', 'غير راضٍ جداً', 'غير راض على الإطلاق', 'غير راض تماما'],
+        ['dissatisfied', 'غير راض', 'غير راضٍ'],
+        ['neutral', 'neither satisfied nor dissatisfied', 'محايد'],
+        ['satisfied', 'راض', 'راضٍ'],
+        ['very satisfied', 'راض جدا', 'راضٍ جداً', 'راض تماما'],
+    ],
+    'quality': [
+        ['very poor', 'very bad', 'ضعيف جدا', 'ضعيف جداً', 'سيئ جدا', 'سيء جدا'],
+        ['poor', 'bad', 'ضعيف', 'سيئ', 'سيء'],
+        ['fair', 'average', 'acceptable', 'مقبول', 'متوسط'],
+        ['good', 'جيد'],
+        ['very good', 'جيد جدا', 'جيد جداً'],
+        ['excellent', 'ممتاز'],
+    ],
+    'level': [
+        ['very low', 'منخفض جدا', 'منخفض جداً', 'قليل جدا'],
+        ['low', 'منخفض', 'قليل'],
+        ['medium', 'moderate', 'متوسط'],
+        ['high', 'مرتفع', 'عال', 'عالي', 'كبير'],
+        ['very high', 'مرتفع جدا', 'مرتفع جداً', 'عال جدا', 'عالي جدا', 'كبير جدا'],
+    ],
+    'intensity': [
+        ['not at all', 'على الإطلاق', 'لا على الإطلاق', 'إطلاقا', 'أبدا'],
+        ['slightly', 'a little', 'قليلا', 'قليلاً', 'بدرجة قليلة'],
+        ['moderately', 'somewhat', 'إلى حد ما', 'بدرجة متوسطة'],
+        ['very', 'very much', 'كثيرا', 'كثيراً', 'بدرجة كبيرة'],
+        ['extremely', 'للغاية', 'بدرجة كبيرة جدا'],
+    ],
+    'importance': [
+        ['not important at all', 'غير مهم على الإطلاق', 'غير مهم إطلاقا'],
+        ['not important', 'unimportant', 'غير مهم'],
+        ['slightly important', 'مهم قليلا'],
+        ['moderately important', 'مهم إلى حد ما'],
+        ['important', 'مهم'],
+        ['very important', 'مهم جدا', 'مهم جداً'],
+        ['extremely important', 'مهم للغاية'],
+    ],
+    'likelihood': [
+        ['very unlikely', 'غير محتمل جدا', 'مستبعد جدا'],
+        ['unlikely', 'غير محتمل', 'مستبعد'],
+        ['neutral', 'not sure', 'محايد', 'غير متأكد'],
+        ['likely', 'محتمل'],
+        ['very likely', 'محتمل جدا'],
+    ],
+    'yes_no': [
+        ['no', 'لا'],
+        ['maybe', 'not sure', 'ربما', 'غير متأكد'],
+        ['yes', 'نعم'],
+    ],
+}
+
+# Arabic short vowels, tanween, shadda, sukun and the tatweel stretch character
+# (dropped from labels here and from answer keys in normalize.py)
+ARABIC_MARKS = re.compile('[\u064b-\u0652\u0670\u0640]')
+
+# Leading answer numbers such as "1 - ", "5)", "(3) "
+_LEADING_NUMBER = re.compile(r'^\(?\d+\s*[\)\.\-:]?\s*')
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Hamza and madda forms of alef, unified to a bare alef (also used by normalize.py)
+ALEF_VARIANTS = re.compile('[أإآ]')
+
+
+def normalize_label(text: str) -> str:
+    """
+    Normalize an answer label for dictionary lookup.
+
+    Lowercases, collapses whitespace (including non-breaking spaces), drops
+    leading answer numbers, and unifies Arabic spelling variants (diacritics,
+    tatweel, alef forms, taa marbuta, alef maqsura).
+
+    Args:
+        text: Answer label
+
+    Returns:
+        Normalized label
+    """
+    text = _WHITESPACE.sub(' ', str(text)).strip().lower()
+    text = _LEADING_NUMBER.sub('', text)
+    text = ARABIC_MARKS.sub('', text)
+    text = ALEF_VARIANTS.sub('ا', text)
+    text = text.replace('ة', 'ه').replace('ى', 'ي')
+    return text.strip(' .')
+
+
+def _compile_lookup() -> Dict[str, List[Tuple[str, int]]]:
+    """Build the normalized label -> [(scale, rank)] table (once, at import)."""
+    lookup: Dict[str, List[Tuple[str, int]]] = {}
+    for scale, steps in LIKERT_SCALES.items():
+        for rank, spellings in enumerate(steps):
+            for spelling in spellings:
+                entries = lookup.setdefault(normalize_label(spelling), [])
+                if (scale, rank) not in entries:
+                    entries.append((scale, rank))
+    return lookup
+
+
+_LIKERT_LOOKUP = _compile_lookup()
+
+
+@lru_cache(maxsize=4096)
+def _infer_scale(unique_values: Tuple[str, ...]) -> Tuple[bool, Tuple[str, ...]]:
+    """Cached core of infer_likert_order (arguments must be hashable)."""
+    if not (3 <= len(unique_values) <= 7):
+        return False, unique_values
+
+    # Rank of each value on every scale it belongs to
+    ranks: Dict[str, Dict[str, int]] = {}
+    for value in unique_values:
+        for scale, rank in _LIKERT_LOOKUP.get(normalize_label(value), ()):
+            ranks.setdefault(scale, {}).setdefault(value, rank)
+    if not ranks:
+        return False, unique_values
+
+    # The scale covering most values wins; ties go to the first listed scale
+    scale_order = list(LIKERT_SCALES)
+    best = max(ranks, key=lambda scale: (len(ranks[scale]), -scale_order.index(scale)))
+    matched = ranks[best]
+    if len(matched) < 2:
+        return False, unique_values
+
+    ordered = sorted(matched, key=lambda value: matched[value])
+    ordered.extend(value for value in unique_values if value not in matched)
+    return True, tuple(ordered)
+
+
+def infer_likert_order(unique_values: List[str]) -> Tuple[bool, List[str]]:
+    """
+    Recognize a Likert scale and suggest its natural order.
+
+    Values are looked up in a precompiled English/Arabic dictionary. If at
+    least two values belong to the same scale, they are ordered from the
+    lowest to the highest rank; values outside the scale keep their order
+    at the end. Results are memoized per value list.
+
+    Args:
+        unique_values: List of unique string values in column
+
+    Returns:
+        Tuple of (is_likert, suggested_order). suggested_order is the input
+        order when the column is not recognized as a Likert scale.
+    """
+    is_likert, order = _infer_scale(tuple(str(value) for value in unique_values))
+    return is_likert, list(order)
@@ -0,0 +1,202 @@
+"""
+Process-wide memory governor for session data.
+
+Sessions spill their sheets to their workspace (see SessionWorkspace.save_frames).
+The governor keeps the loaded sheets of recently used sessions in memory so a
+rerun does not load them again, tracks the bytes each session holds, and evicts
+the least recently used idle sessions once the budget is exceeded. Evicted
+sheets are loaded from the workspace again on their next access.
+
+Next to the sheets it keeps each session's shared analysis (see analysis.py),
+so columns are factorized once per upload rather than once per encoding run.
+Its codes count towards the session's bytes.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default budget for the loaded sheets of all sessions together
+DEFAULT_MEMORY_BUDGET_BYTES = 1024 * 1024 * 1024
+
+# Environment variable overriding the default budget (in MB)
+MEMORY_BUDGET_ENV = 'SPSS_PREP_MEMORY_BUDGET_MB'
+
+
+def frames_nbytes(frames: Dict[str, Any]) -> int:
+    """
+    Bytes held by a set of sheets, including Python objects and mapped columns.
+
+    Args:
+        frames: Dictionary of sheet name -> dataframe
+
+    Returns:
+        Total size in bytes
+    """
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames.values()))
+
+
+class MemoryGovernor:
+    """
+    LRU store of loaded session sheets with a byte budget.
+
+    The session that was used last is never evicted, so a single session
+    larger than the budget still works; it just does not keep others around.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        # session id -> (frames, bytes, last used), least recently used first
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], int, float]]' = OrderedDict()
+        # session id -> {sheet name: DatasetAnalysis} of the loaded sheets
+        self._analyses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_frames(self, workspace: Any) -> Optional[Dict[str, Any]]:
+        """
+        Get a session's sheets, loading them from its workspace if needed.
+
+        Args:
+            workspace: SessionWorkspace of the session
+
+        Returns:
+            Dictionary of sheet name -> dataframe, or None if the workspace
+            holds no sheets
+        """
+        session_id = workspace.session_id
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self.hits += 1
+                self._entries[session_id] = (entry[0], entry[1], time.time())
+                self._entries.move_to_end(session_id)
+                return entry[0]
+            self.misses += 1
+
+        frames: Optional[Dict[str, Any]] = workspace.load_frames()
+        if frames is None:
+            return None
+        self.put(session_id, frames)
+        return frames
+
+    def get_analyses(self, session_id: str, frames: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the shared analyses of a session's sheets, creating them once.
+
+        Args:
+            session_id: Id of the session
+            frames: The session's sheets (as returned by get_frames)
+
+        Returns:
+            Dictionary of sheet name -> DatasetAnalysis
+        """
+        from .analysis import analyze_frames
+
+        with self._lock:
+            analyses = self._analyses.get(session_id)
+            if analyses is None or any(frames.get(name) is not analysis.df for name, analysis in analyses.items()):
+                analyses = analyze_frames(frames)
+                if session_id in self._entries:
+                    self._analyses[session_id] = analyses
+            return analyses
+
+    def put(self, session_id: str, frames: Dict[str, Any]) -> None:
+        """
+        Keep a session's sheets in memory and evict others if over budget.
+
+        Args:
+            session_id: Id of the session
+            frames: Dictionary of sheet name -> dataframe
+        """
+        nbytes = frames_nbytes(frames)
+        with self._lock:
+            self._entries[session_id] = (frames, nbytes, time.time())
+            self._entries.move_to_end(session_id)
+            self._analyses.pop(session_id, None)
+            self._evict(keep=session_id)
+
+    def discard(self, session_ids: Iterable[str]) -> None:
+        """
+        Drop sessions from memory (after a reset or when their workspace expired).
+
+        Args:
+            session_ids: Ids of the sessions to drop
+        """
+        with self._lock:
+            for session_id in session_ids:
+                self._entries.pop(session_id, None)
+                self._analyses.pop(session_id, None)
+
+    def _session_bytes(self, session_id: str, frames_bytes: int) -> int:
+        """Bytes of a session's sheets plus its analyzed columns (lock held)."""
+        analyses = self._analyses.get(session_id, {})
+        return frames_bytes + int(sum(analysis.nbytes for analysis in analyses.values()))
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used sessions until the total fits (lock held)."""
+        sizes = {
+            session_id: self._session_bytes(session_id, nbytes)
+            for session_id, (_, nbytes, _) in self._entries.items()
+        }
+        total = sum(sizes.values())
+        for session_id in list(self._entries):
+            if total <= self.budget_bytes:
+                break
+            if session_id == keep:
+                continue
+            self._entries.pop(session_id)
+            self._analyses.pop(session_id, None)
+            nbytes = sizes[session_id]
+            total -= nbytes
+            self.evictions += 1
+            logger.info(f"Evicted sheets of idle session {session_id[:8]} ({nbytes} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Memory statistics.
+
+        Returns:
+            Dictionary with budget_bytes, bytes, sessions, hits, misses,
+            evictions and per_session (list of (session id, bytes, idle
+            seconds), most recently used first)
+        """
+        now = time.time()
+        with self._lock:
+            per_session: List[Tuple[str, int, float]] = [
+                (session_id, self._session_bytes(session_id, nbytes), now - last_used)
+                for session_id, (_, nbytes, last_used) in reversed(self._entries.items())
+            ]
+            return {
+                'budget_bytes': self.budget_bytes,
+                'bytes': sum(nbytes for _, nbytes, _ in per_session),
+                'sessions': len(per_session),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'per_session': per_session,
+            }
+
+
+_default_governor: Optional[MemoryGovernor] = None
+_default_governor_lock = threading.Lock()
+
+
+def get_default_governor() -> MemoryGovernor:
+    """Process-wide shared governor (budget from SPSS_PREP_MEMORY_BUDGET_MB if set)."""
+    global _default_governor
+    with _default_governor_lock:
+        if _default_governor is None:
+            budget = DEFAULT_MEMORY_BUDGET_BYTES
+            if os.environ.get(MEMORY_BUDGET_ENV):
+                budget = int(float(os.environ[MEMORY_BUDGET_ENV]) * 1024 * 1024)
+            _default_governor = MemoryGovernor(budget)
+        return _default_governor
@@ -0,0 +1,501 @@
+"""
+Multi-file merge with a shared codebook.
+Encodes several exports of the same questionnaire against one merged set of value
+codes and streams them into a single dataset with a source-file indicator.
+"""
+
+import io
+import os
+import tempfile
+from array import array
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple, Union
+import logging
+
+import pandas as pd
+import xlsxwriter
+
+from .analysis import DatasetAnalysis
+from .codebook import CODEBOOK_NAME, codebook_bytes
+from .encoder import (
+    SPSS_DATETIME_FORMAT, TEXT_TOP_VALUES, ColumnConfig, ColumnInfo, apply_encoding,
+    compact_text_columns, detect_columns, detect_columns_sample, detect_sheets,
+    spss_date_format, spss_string_width
+)
+from .jobs import build_output_bundle
+from .normalize import canonical_value_map
+from .sps_generator import generate_sps_syntax, save_sps_file
+from .verify import combine_reports, verify_encoding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Name of the column identifying the file each row came from
+SOURCE_COLUMN = 'source_file'
+
+# Pseudo sheet name under which the merged dataset is configured
+MERGED_SHEET = 'Merged'
+
+
+def load_files(
+    sources: Dict[str, Union[str, BinaryIO]],
+    max_workers: Optional[int] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Read the first sheet of several Excel files in parallel.
+
+    Args:
+        sources: Dictionary of file name -> path or binary stream
+        max_workers: Maximum number of worker threads
+
+    Returns:
+        Dictionary of file name -> dataframe, in the order of sources
+    """
+    def read(source: Union[str, BinaryIO]) -> pd.DataFrame:
+        return compact_text_columns(pd.read_excel(source, dtype=object))
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources) or 1, thread_name_prefix="load-file") as pool:
+        return dict(zip(sources, pool.map(read, sources.values())))
+
+
+def merge_column_info(
+    file_infos: Dict[str, Dict[str, Dict[str, Any]]],
+    normalize: bool = False
+) -> Dict[str, ColumnInfo]:
+    """
+    Combine per-file detection results into one shared codebook.
+
+    Value counts are summed across files (keyed by the string value), so the
+    merged order by frequency is the same no matter which file a value is most
+    common in. Ties keep the order in which values were first seen. A column
+    detected as dates in any file is a date column in all of them.
+
+    Args:
+        file_infos: Dictionary of file name -> detect_columns() result
+        normalize: Spellings were normalized per file; pick one canonical
+            spelling per answer across all files
+
+    Returns:
+        Column info in the detect_columns() format, over the union of columns
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for info in file_infos.values():
+        for col, col_info in info.items():
+            entry = merged.setdefault(col, {
+                'counts': Counter(),
+                'n_missing': 0,
+                'numeric_files': 0,
+                'datetime_files': 0,
+                'text_files': 0,
+                'max_width': 0,
+                'spss_formats': set(),
+                'files': 0,
+                'has_multi_response': False,
+                'is_sample': False,
+                'value_map': {},
+                'numbers': {},
+            })
+            for value, count in col_info['value_counts'].items():
+                entry['counts'][str(value)] += count
+            entry['n_missing'] += int(col_info['n_missing'])
+            entry['numeric_files'] += bool(col_info['is_numeric'])
+            entry['datetime_files'] += bool(col_info.get('is_datetime'))
+            entry['text_files'] += bool(col_info.get('is_text'))
+            entry['max_width'] = max(entry['max_width'], col_info.get('max_width', 0))
+            if col_info.get('spss_format'):
+                entry['spss_formats'].add(col_info['spss_format'])
+            entry['files'] += 1
+            entry['has_multi_response'] |= bool(col_info['has_multi_response'])
+            entry['is_sample'] |= bool(col_info.get('is_sample'))
+            entry['value_map'].update(col_info.get('value_map', {}))
+            if isinstance(col_info, ColumnInfo):
+                entry['numbers'].update(col_info.numeric_values() or {})
+
+    if normalize:
+        for entry in merged.values():
+            _merge_spellings(entry)
+
+    column_info = {}
+    for col, entry in merged.items():
+        extras: Dict[str, Any] = {'is_sample': True} if entry['is_sample'] else {}
+        if entry['datetime_files']:
+            # Dates in one file and other values in another: the timestamps have
+            # no value list to code, so the whole column is read as dates and the
+            # cells that are not dates are reported by the verification
+            if entry['datetime_files'] < entry['files']:
+                logger.warning(
+                    f"Column '{col}' holds dates in {entry['datetime_files']} of {entry['files']} "
+                    "files; reading it as dates in all of them"
+                )
+            column_info[col] = ColumnInfo(
+                n_missing=entry['n_missing'],
+                is_datetime=True,
+                spss_format=(
+                    SPSS_DATETIME_FORMAT if SPSS_DATETIME_FORMAT in entry['spss_formats']
+                    else next(iter(entry['spss_formats']))
+                ),
+                **extras
+            )
+            continue
+        if entry['text_files']:
+            # Free text in any file: only a summary of the most frequent answers
+            top_values = entry['counts'].most_common(TEXT_TOP_VALUES)
+            column_info[col] = ColumnInfo(
+                [value for value, _ in top_values],
+                [count for _, count in top_values],
+                n_missing=entry['n_missing'],
+                is_text=True,
+                max_width=entry['max_width'],
+                **extras
+            )
+            continue
+        value_counts = entry['counts'].most_common()
+        if entry['numeric_files'] == entry['files'] and not entry['value_map']:
+            # Numbers parsed per file, reused for Scale passthrough
+            extras['numbers'] = array('d', (entry['numbers'].get(value, float('nan')) for value, _ in value_counts))
+        column_info[col] = ColumnInfo(
+            [value for value, _ in value_counts],
+            [count for _, count in value_counts],
+            n_missing=entry['n_missing'],
+            is_numeric=entry['numeric_files'] == entry['files'],
+            has_multi_response=entry['has_multi_response'],
+            value_map=entry['value_map'],
+            **extras
+        )
+    return column_info
+
+
+def _merge_spellings(entry: Dict[str, Any]) -> None:
+    """Re-pick canonical spellings over the summed counts of all files."""
+    combined = canonical_value_map(pd.Series(entry['counts'], dtype='int64'))
+    if not combined:
+        return
+    counts: Counter = Counter()
+    for value, count in entry['counts'].items():
+        counts[combined.get(value, value)] += count
+    value_map = {raw: combined.get(value, value) for raw, value in entry['value_map'].items()}
+    value_map.update(combined)
+    entry['counts'] = counts
+    entry['value_map'] = {raw: value for raw, value in value_map.items() if raw != value}
+
+
+def build_shared_codebook(
+    file_frames: Dict[str, pd.DataFrame],
+    sample: bool = False,
+    max_workers: Optional[int] = None,
+    normalize: bool = False
+) -> Dict[str, ColumnInfo]:
+    """
+    Count values in every file in parallel and merge them into one codebook.
+
+    Args:
+        file_frames: Dictionary of file name -> dataframe
+        sample: Detect on row samples (fast first pass) instead of all rows
+        max_workers: Maximum number of worker threads
+        normalize: Collapse spellings of the same answer (see detect_columns)
+
+    Returns:
+        Merged column info (see merge_column_info)
+    """
+    if sample:
+        results = detect_sheets(file_frames, partial(detect_columns_sample, normalize=normalize), max_workers)
+        file_infos = {name: info for name, (info, _) in results.items()}
+    else:
+        file_infos = detect_sheets(file_frames, partial(detect_columns, normalize=normalize), max_workers)
+    return merge_column_info(file_infos, normalize)
+
+
+def detect_merged(
+    file_frames: Dict[str, pd.DataFrame],
+    normalize: bool = False
+) -> Dict[str, Dict[str, ColumnInfo]]:
+    """
+    Full-data shared codebook in the per-sheet layout used by the app.
+
+    Args:
+        file_frames: Dictionary of file name -> dataframe
+        normalize: Collapse spellings of the same answer (see detect_columns)
+
+    Returns:
+        Dictionary {MERGED_SHEET: merged column info}
+    """
+    return {MERGED_SHEET: build_shared_codebook(file_frames, normalize=normalize)}
+
+
+def source_mapping(file_names: Iterable[str]) -> Dict[str, int]:
+    """Codes of the source-file indicator (1..N in upload order)."""
+    return {name: idx + 1 for idx, name in enumerate(file_names)}
+
+
+def iter_encoded_files(
+    file_frames: Dict[str, pd.DataFrame],
+    configs: Dict[str, ColumnConfig],
+    columns: List[str],
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    reports: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+) -> Iterable[Tuple[str, pd.DataFrame]]:
+    """
+    Encode every file against the shared configs, yielding them in order.
+
+    Files are encoded in parallel, but at most max_workers of them are
+    encoded or waiting to be yielded at any time, so only that many encoded
+    frames are held in memory. Each yielded frame has the union of columns
+    (missing ones are empty) followed by the source-file code.
+
+    Args:
+        file_frames: Dictionary of file name -> dataframe
+        configs: Shared column configurations (keyed by original column name)
+        columns: Output column order (union of all files)
+        max_workers: Maximum number of worker threads (default: CPU count)
+        progress_callback: Optional callable receiving (done, total, file name),
+            called as files finish encoding
+        reports: Optional dictionary that receives the verification report
+            of each file (file name -> report, see verify.verify_encoding)
+
+    Yields:
+        Tuples of (file name, encoded dataframe)
+    """
+    codes = source_mapping(file_frames)
+    total = len(file_frames)
+
+    def encode(name: str) -> pd.DataFrame:
+        df = file_frames[name]
+        file_configs = {col: cfg for col, cfg in configs.items() if col in df.columns}
+        analysis = DatasetAnalysis(df)
+        encoded, _ = apply_encoding(df, file_configs, analysis=analysis)
+        if reports is not None:
+            reports[name] = verify_encoding(df, encoded, file_configs, analysis=analysis)
+        encoded = encoded.reindex(columns=columns)
+        encoded[SOURCE_COLUMN] = codes[name]
+        return encoded
+
+    workers = max(min(max_workers or os.cpu_count() or 1, total), 1)
+    names = iter(file_frames)
+    window: Deque[Tuple[str, Future]] = deque()
+    finished: Set[Future] = set()
+
+    def submit_next() -> None:
+        name = next(names, None)
+        if name is not None:
+            window.append((name, pool.submit(encode, name)))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode-file") as pool:
+        for _ in range(workers):
+            submit_next()
+        completed = 0
+        while window:
+            name, future = window[0]
+            while future not in finished:
+                # Progress follows completion order, reported on the consumer's thread
+                done, _ = wait([f for _, f in window if f not in finished], return_when=FIRST_COMPLETED)
+                for done_name, done_future in list(window):
+                    if done_future in done:
+                        finished.add(done_future)
+                        if progress_callback is not None:
+                            progress_callback(completed, total, done_name)
+                        completed += 1
+            window.popleft()
+            finished.discard(future)
+            yield name, future.result()
+            submit_next()
+
+
+def write_streamed_excel(
+    chunks: Iterable[pd.DataFrame],
+    columns: List[str],
+    output_path: Union[str, BinaryIO],
+    sheet_name: str = 'Sheet1'
+) -> int:
+    """
+    Write dataframes one after another into a single sheet.
+
+    Rows are streamed to the worksheet chunk by chunk, so the full dataset is
+    never concatenated in memory. Paths are written in xlsxwriter's
+    constant-memory mode, which flushes every finished row to disk; streams
+    keep all cells in memory until the workbook is closed, so large outputs
+    should go to a path (run_merge_pipeline does).
+
+    Args:
+        chunks: Iterable of dataframes sharing the given columns
+        columns: Header row
+        output_path: Path to output Excel file, or a writable binary stream
+        sheet_name: Name of sheet to create
+
+    Returns:
+        Number of data rows written
+    """
+    # Dates are stored as Excel date cells so SPSS reads them as date variables
+    options: Dict[str, Any] = {'default_date_format': 'yyyy-mm-dd hh:mm:ss'}
+    if isinstance(output_path, str):
+        options['constant_memory'] = True
+    else:
+        options['in_memory'] = True
+    workbook = xlsxwriter.Workbook(output_path, options)
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, columns)
+    widths = [len(str(col)) for col in columns]
+
+    row = 1
+    for chunk in chunks:
+        present = chunk.notna()
+        # Empty cells become None, which write_row skips
+        cells = chunk.astype(object).where(present, None)
+        for idx in range(chunk.shape[1]):
+            values = chunk.iloc[:, idx][present.iloc[:, idx]]
+            if len(values):
+                widths[idx] = max(widths[idx], int(values.astype(str).str.len().max()))
+        # Constant-memory mode needs the rows in order, so whole rows are written
+        for values in cells.to_numpy().tolist():
+            worksheet.write_row(row, 0, values)
+            row += 1
+
+    # Set column widths for readability
+    for idx, width in enumerate(widths):
+        worksheet.set_column(idx, idx, min(width + 2, 50))
+    workbook.close()
+    logger.info(f"Streamed {row - 1} rows to Excel")
+    return row - 1
+
+
+def run_merge_pipeline(
+    file_frames: Dict[str, pd.DataFrame],
+    configs: Dict[str, ColumnConfig],
+    encoded_name: str = 'encoded_data.xlsx',
+    sps_name: str = 'auto_import.sps',
+    include_save: bool = False,
+    sanitize_names: bool = True,
+    extra_files: Optional[Dict[str, bytes]] = None,
+    progress_callback: Optional[Callable[[int, int, str], None]] = None,
+    work_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Encode several files against one codebook into a single merged dataset.
+
+    The merged sheet is written in constant-memory mode to a temporary file,
+    which is then streamed into the bundle.
+
+    Args:
+        file_frames: Dictionary of file name -> dataframe
+        configs: Shared column configurations (keyed by original column name)
+        encoded_name: File name of the encoded Excel file inside the bundle
+        sps_name: File name of the .sps file inside the bundle
+        include_save: Whether to include SAVE OUTFILE in the syntax
+        sanitize_names: Rename columns to their sanitized SPSS names
+        extra_files: Optional additional files (name -> bytes) for the bundle
+        progress_callback: Optional callable receiving (done, total, message)
+        work_dir: Directory for the temporary Excel file (default: the
+            system temp directory), e.g. the session workspace
+
+    Returns:
+        Dictionary with encoded_frames (preview of the merged data), encoded_df,
+        mappings, verification (per column, summed over the files), sps_syntax
+        and bundle (zip bytes)
+    """
+    report = progress_callback or (lambda done, total, message: None)
+    total = len(file_frames) + 1
+
+    # Union of columns in first-seen order
+    columns: List[str] = []
+    for df in file_frames.values():
+        columns.extend(col for col in df.columns if col not in columns)
+
+    def output_name(col: str) -> str:
+        if sanitize_names and col in configs:
+            return configs[col].sanitized_name
+        return col
+
+    output_columns = [output_name(col) for col in columns] + [SOURCE_COLUMN]
+
+    preview: List[pd.DataFrame] = []
+    date_columns = [col for col, cfg in configs.items() if cfg.encoding_type == 'Date']
+    date_formats: Dict[str, set] = {col: set() for col in date_columns}
+    text_columns = [col for col, cfg in configs.items() if cfg.encoding_type == 'String']
+    string_widths: Dict[str, int] = {col: 1 for col in text_columns}
+
+    reports: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def chunks() -> Iterable[pd.DataFrame]:
+        for name, encoded in iter_encoded_files(
+            file_frames, configs, columns,
+            progress_callback=lambda done, _, name: report(done, total, f"Encoding '{name}'"),
+            reports=reports
+        ):
+            if sum(len(p) for p in preview) < 5:
+                preview.append(encoded.head(5))
+            for col in date_columns:
+                if encoded[col].notna().any():
+                    date_formats[col].add(spss_date_format(encoded[col]))
+            for col in text_columns:
+                string_widths[col] = max(string_widths[col], spss_string_width(encoded[col]))
+            yield encoded
+
+    with tempfile.TemporaryDirectory(prefix='merge-', dir=work_dir) as staging:
+        excel_path = os.path.join(staging, encoded_name)
+        write_streamed_excel(chunks(), output_columns, excel_path)
+        report(len(file_frames), total, "Writing files")
+
+        mappings = {
+            output_name(col): cfg.get_mapping()
+            for col, cfg in configs.items()
+            if cfg.encoding_type not in ('Ignore', 'Date', 'String')
+        }
+        mappings[SOURCE_COLUMN] = source_mapping(file_frames)
+        original_names = {output_name(col): col for col in columns if col in configs}
+        original_names[SOURCE_COLUMN] = 'Source file'
+        measure_types = {output_name(col): cfg.encoding_type for col, cfg in configs.items()}
+        measure_types[SOURCE_COLUMN] = 'Nominal'
+        # A time of day in any file makes the whole column DATETIME
+        variable_formats = {
+            output_name(col): (
+                SPSS_DATETIME_FORMAT if SPSS_DATETIME_FORMAT in formats or not formats
+                else next(iter(formats))
+            )
+            for col, formats in date_formats.items()
+        }
+        output_widths = {output_name(col): width for col, width in string_widths.items()}
+
+        sps_syntax = generate_sps_syntax(
+            excel_path=encoded_name,
+            mappings=mappings,
+            original_names=original_names,
+            sheet_name='Sheet1',
+            include_save=include_save,
+            save_path=encoded_name.replace('.xlsx', '.sav') if include_save else None,
+            use_relative_path=True,
+            measure_types=measure_types,
+            variable_formats=variable_formats,
+            string_widths=output_widths
+        )
+        sps_buffer = io.BytesIO()
+        save_sps_file(sps_syntax, sps_buffer)
+
+        files = {
+            sps_name: sps_buffer.getvalue(),
+            CODEBOOK_NAME: codebook_bytes([{
+                'sheet_name': 'Sheet1',
+                'file': encoded_name,
+                'mappings': mappings,
+                'original_names': original_names,
+                'measure_types': measure_types,
+            }]),
+        }
+        files.update(extra_files or {})
+        bundle = build_output_bundle(files, paths={encoded_name: excel_path})
+
+    report(total, total, "Done")
+    preview_df = (
+        pd.concat(preview, ignore_index=True).head(5) if preview
+        else pd.DataFrame(columns=columns + [SOURCE_COLUMN])
+    )
+    preview_df.columns = output_columns
+    return {
+        'encoded_frames': {MERGED_SHEET: preview_df},
+        'encoded_df': preview_df,
+        'mappings': {MERGED_SHEET: mappings},
+        'verification': {MERGED_SHEET: combine_reports({name: reports[name] for name in file_frames})},
+        'sps_syntax': sps_syntax,
+        'bundle': bundle,
+    }
@@ -0,0 +1,123 @@
+"""
+Answer normalization: collapse spellings of the same answer into one category.
+
+Trailing spaces, non-breaking spaces, case and Arabic letter variants (alef
+forms, taa marbuta/haa, alef maqsura, tatweel, diacritics) otherwise turn one
+answer into several categories. Detection records a raw -> canonical map per
+column, and encoding maps raw cells through it, so labels and data agree.
+
+All string work runs column-wide with pandas string methods on the distinct
+values of a column, never cell by cell.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List
+
+from .likert import ALEF_VARIANTS, ARABIC_MARKS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Any run of whitespace, including non-breaking spaces
+_WHITESPACE_RUN = r'\s+'
+
+
+def clean_whitespace(values: pd.Series) -> pd.Series:
+    """
+    Collapse whitespace runs (including NBSP) and strip the ends.
+
+    Args:
+        values: String values
+
+    Returns:
+        Cleaned values, used as the displayed spelling of an answer
+    """
+    return values.str.replace(_WHITESPACE_RUN, ' ', regex=True).str.strip()
+
+
+def normalize_answers(values: pd.Series) -> pd.Series:
+    """
+    Compute the comparison key of each answer.
+
+    Answers with the same key are the same category. The key is casefolded,
+    has clean whitespace and unified Arabic spelling.
+
+    Args:
+        values: String values
+
+    Returns:
+        Normalized keys aligned with values
+    """
+    keys = clean_whitespace(values).str.casefold()
+    keys = keys.str.replace(ARABIC_MARKS, '', regex=True)
+    keys = keys.str.replace(ALEF_VARIANTS, 'ا', regex=True)
+    return keys.str.replace('ة', 'ه', regex=False).str.replace('ى', 'ي', regex=False)
+
+
+def canonical_value_map(counts: pd.Series) -> Dict[str, str]:
+    """
+    Choose one spelling per answer and map every other spelling to it.
+
+    The canonical spelling is the most frequent whitespace-cleaned variant;
+    ties go to the variant seen first. Non-text values are left alone.
+
+    Args:
+        counts: Occurrence counts indexed by raw value (value_counts(sort=False))
+
+    Returns:
+        Dictionary of raw value -> canonical value, for values that change
+    """
+    import pandas as pd
+
+    text = [isinstance(value, str) for value in counts.index]
+    raw = pd.Series(list(counts.index[text]), dtype=object)
+    if raw.empty:
+        return {}
+
+    labels = clean_whitespace(raw)
+    variants = pd.DataFrame({
+        'raw': raw,
+        'label': labels,
+        'key': normalize_answers(labels),
+        'count': counts.to_numpy()[text],
+    })
+    by_label = variants.groupby(['key', 'label'], sort=False)['count'].sum().reset_index()
+    best = by_label.sort_values('count', ascending=False, kind='stable').drop_duplicates('key')
+    canonical = variants['key'].map(pd.Series(best['label'].to_numpy(), index=best['key'].to_numpy()))
+    return {
+        raw_value: canonical_value
+        for raw_value, canonical_value in zip(variants['raw'], canonical)
+        if raw_value != canonical_value
+    }
+
+
+def align_order(order: List[str], unique_values: List[str]) -> List[str]:
+    """
+    Rewrite an order in terms of another detection's canonical spellings.
+
+    The sample pass and the full pass can pick different spellings for the
+    same answer. Values are matched by their normalization key so an order
+    arranged on the sample keeps its positions.
+
+    Args:
+        order: Current ordered list of values
+        unique_values: Canonical values of the newer detection
+
+    Returns:
+        Order with matching values replaced and duplicates removed
+    """
+    import pandas as pd
+
+    if not order or not unique_values:
+        return list(order)
+    keys = normalize_answers(pd.Series(unique_values, dtype=object))
+    canonical_by_key = dict(zip(keys, unique_values))
+    order_keys = normalize_answers(pd.Series(order, dtype=object))
+
+    aligned: List[str] = []
+    for value, key in zip(order, order_keys):
+        value = canonical_by_key.get(key, value)
+        if value not in aligned:
+            aligned.append(value)
+    return aligned
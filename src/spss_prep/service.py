@@ -0,0 +1,394 @@
+"""
+Headless HTTP encoding service for other pipelines.
+
+Usage:
+    python -m spss_prep.service [--port 8765] [--workers 2] [--queue 8] [--timeout 120]
+
+Endpoints:
+    POST /encode   JSON body {"file": <base64 .xlsx>, "configs": {...}, "options": {...}}
+                   and returns the zip bundle (encoded workbook + .sps)
+    GET  /stats    Throughput and latency counters as JSON
+    GET  /health   "ok" while the service is running
+
+``configs`` uses the format written by ``python -m spss_prep.cli --write-config``
+({sheet: {column: ColumnConfig.to_dict()}}). When it is omitted, columns are
+detected and configured the way the app's cards start out. ``options`` accepts
+include_save, sanitize_names, split_sheets and normalize_answers (only used
+when columns are configured automatically).
+
+Encoding runs in a process pool, so a large workbook never blocks the server
+threads. At most ``workers + queue`` requests are accepted at a time; further
+requests get 503 right away instead of piling up.
+"""
+
+import argparse
+import base64
+import binascii
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_TIMEOUT = 120.0
+
+# Same limit as the app's upload size (200 MB), plus base64 overhead
+MAX_REQUEST_BYTES = 280 * 1024 * 1024
+
+# Generator options a request may set
+SERVICE_OPTIONS = ('include_save', 'sanitize_names', 'split_sheets', 'normalize_answers')
+
+# Spellings accepted for option values besides JSON true/false
+TRUE_STRINGS = ('true', '1', 'yes', 'on')
+FALSE_STRINGS = ('false', '0', 'no', 'off')
+
+
+class ServiceBusy(Exception):
+    """Raised when the worker pool and its queue are full."""
+
+
+class RequestError(ValueError):
+    """Raised for malformed requests (answered with 400)."""
+
+
+def encode_request(file_bytes: bytes, configs_data: Optional[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode one workbook (runs inside a worker process).
+
+    Args:
+        file_bytes: Raw .xlsx bytes
+        configs_data: {sheet: {column: config dict}} or None for defaults
+        options: Generator options (see SERVICE_OPTIONS)
+
+    Returns:
+        Dictionary with bundle (zip bytes) and rows (sheet -> row count)
+    """
+    from .cli import build_default_configs
+    from .encoder import ColumnConfig, load_workbook
+    from .jobs import run_workbook_pipeline
+
+    frames = load_workbook(io.BytesIO(file_bytes))
+    options = dict(options)
+    normalize_answers = options.pop('normalize_answers', False)
+    sanitize_names = options.get('sanitize_names', True)
+    if configs_data is None:
+        sheet_configs = build_default_configs(frames, sanitize_names, normalize_answers)
+    else:
+        sheet_configs = {
+            sheet_name: {col: ColumnConfig.from_dict(cfg) for col, cfg in configs.items()}
+            for sheet_name, configs in configs_data.items()
+        }
+        missing = [sheet_name for sheet_name in frames if sheet_name not in sheet_configs]
+        if missing:
+            raise RequestError(f"No configuration for sheet(s): {', '.join(missing)}")
+
+    result = run_workbook_pipeline(frames, sheet_configs, **options)
+    return {
+        'bundle': result['bundle'],
+        'rows': {sheet_name: len(df) for sheet_name, df in frames.items()},
+    }
+
+
+def parse_encode_request(body: bytes) -> Tuple[bytes, Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Validate the JSON body of an /encode request.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Tuple of (file bytes, configs or None, options)
+
+    Raises:
+        RequestError: If the body is not a valid request
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise RequestError(f"Body is not valid JSON: {str(e)}")
+    if not isinstance(payload, dict) or 'file' not in payload:
+        raise RequestError("Body must be a JSON object with a 'file' field")
+
+    try:
+        file_bytes = base64.b64decode(payload['file'], validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise RequestError("'file' must be base64-encoded .xlsx content")
+
+    configs = payload.get('configs')
+    if configs is not None and not (
+        isinstance(configs, dict) and all(isinstance(cfgs, dict) for cfgs in configs.values())
+    ):
+        raise RequestError("'configs' must map sheet names to {column: config} objects")
+
+    options = payload.get('options') or {}
+    if not isinstance(options, dict):
+        raise RequestError("'options' must be an object")
+    unknown = sorted(set(options) - set(SERVICE_OPTIONS))
+    if unknown:
+        raise RequestError(f"Unknown option(s): {', '.join(unknown)}")
+    return file_bytes, configs, {name: parse_flag(name, value) for name, value in options.items()}
+
+
+def parse_flag(name: str, value: Any) -> bool:
+    """
+    Read an on/off option of a request.
+
+    Args:
+        name: Option name (for the error message)
+        value: JSON boolean, or one of TRUE_STRINGS / FALSE_STRINGS
+
+    Returns:
+        The option value
+
+    Raises:
+        RequestError: For anything else (e.g. numbers or null)
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in TRUE_STRINGS:
+        return True
+    if isinstance(value, str) and value.strip().lower() in FALSE_STRINGS:
+        return False
+    raise RequestError(f"Option '{name}' must be true or false, got {json.dumps(value)}")
+
+
+class EncodingService:
+    """
+    Process pool with a bounded queue, request timeouts and counters.
+
+    A slot is taken when a request is submitted and given back when its
+    worker finishes, so a request that timed out keeps its slot until the
+    worker is actually free again.
+    """
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        timeout: float = DEFAULT_TIMEOUT
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._in_flight = 0
+        self._counters = {
+            'requests': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._rows_total = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _release(self, _future: Any) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def encode(self, file_bytes: bytes, configs: Optional[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encode a workbook on the worker pool.
+
+        Args:
+            file_bytes: Raw .xlsx bytes
+            configs: {sheet: {column: config dict}} or None for defaults
+            options: Generator options
+
+        Returns:
+            Result of encode_request
+
+        Raises:
+            ServiceBusy: If all workers and queue slots are taken
+            TimeoutError: If the request did not finish within the timeout
+        """
+        self._count('requests')
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise ServiceBusy("All workers are busy, retry later")
+
+        start = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(encode_request, file_bytes, configs, options)
+        future.add_done_callback(self._release)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drops the request if it is still queued; a running worker finishes on its own
+            future.cancel()
+            self._count('timed_out')
+            raise TimeoutError(f"Encoding did not finish within {self.timeout:.0f}s")
+        except Exception:
+            self._count('failed')
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._counters['completed'] += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+            self._rows_total += sum(result['rows'].values())
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Throughput and latency counters.
+
+        Returns:
+            Dictionary with request counts, in_flight, uptime_seconds,
+            requests_per_second, rows_per_second and mean/max latency
+        """
+        with self._lock:
+            uptime = time.monotonic() - self._started
+            completed = self._counters['completed']
+            return {
+                **self._counters,
+                'in_flight': self._in_flight,
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'uptime_seconds': uptime,
+                'requests_per_second': completed / uptime if uptime else 0.0,
+                'rows_per_second': self._rows_total / uptime if uptime else 0.0,
+                'latency_mean_seconds': self._latency_total / completed if completed else 0.0,
+                'latency_max_seconds': self._latency_max,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class EncodingServer(ThreadingHTTPServer):
+    """HTTP server that carries the EncodingService its handlers use."""
+
+    service: EncodingService
+
+
+class EncodingRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of an EncodingService (set as server.service)."""
+
+    server: EncodingServer
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self._send(status, body, 'application/json; charset=utf-8', headers)
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self._send(200, b'ok', 'text/plain')
+        elif self.path == '/stats':
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != '/encode':
+            self._send_json(404, {'error': f"Unknown path: {self.path}"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {'error': "Request too large"})
+            return
+
+        try:
+            file_bytes, configs, options = parse_encode_request(self.rfile.read(length))
+            result = self.server.service.encode(file_bytes, configs, options)
+        except RequestError as e:
+            self._send_json(400, {'error': str(e)})
+        except ServiceBusy as e:
+            self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        except TimeoutError as e:
+            self._send_json(504, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Encoding request failed: {str(e)}", exc_info=True)
+            self._send_json(500, {'error': str(e)})
+        else:
+            self._send(200, result['bundle'], 'application/zip', {
+                'Content-Disposition': 'attachment; filename="spss_output.zip"',
+            })
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+def create_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    service: Optional[EncodingService] = None
+) -> EncodingServer:
+    """
+    Create the HTTP server (call serve_forever() to run it).
+
+    Args:
+        host: Interface to bind (localhost by default)
+        port: Port to listen on (0 picks a free port)
+        service: Encoding service to use (a default one is created if None)
+
+    Returns:
+        Server with the service attached as server.service
+    """
+    server = EncodingServer((host, port), EncodingRequestHandler)
+    server.daemon_threads = True
+    server.service = service or EncodingService()
+    return server
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Run the service from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m spss_prep.service',
+        description='Serve the encoder over HTTP for other pipelines.'
+    )
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Interface to bind')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Worker processes')
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE_SIZE, help='Requests allowed to wait')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='Seconds per request')
+    args = parser.parse_args(argv)
+
+    service = EncodingService(args.workers, args.queue, args.timeout)
+    server = create_server(args.host, args.port, service)
+    logger.info(f"Encoding service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
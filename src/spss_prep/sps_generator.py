@@ -1,9 +1,12 @@
 """
 SPSS syntax (.sps) file generation.
 Creates GET DATA, VALUE LABELS, and SAVE OUTFILE blocks.
+
+In "recode in SPSS" mode the syntax reads the original upload instead of an
+encoded copy and turns answers into codes with RECODE ... INTO.
 """
 
-from typing import Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
 from .utils import format_spss_path, escape_spss_string, sanitize_variable_name, strip_bidi_characters
 import logging
 import os
@@ -20,7 +23,9 @@ def generate_sps_syntax(
     include_save: bool = False,
     save_path: Optional[str] = None,
     use_relative_path: bool = True,
-    measure_types: Optional[Dict[str, str]] = None
+    measure_types: Optional[Dict[str, str]] = None,
+    variable_formats: Optional[Dict[str, str]] = None,
+    string_widths: Optional[Dict[str, int]] = None
 ) -> str:
     """
     Generate complete SPSS syntax file content.
@@ -34,21 +39,118 @@ def generate_sps_syntax(
         save_path: Path for .sav file (if include_save is True)
         use_relative_path: Use relative path (for downloaded files in same folder)
         measure_types: Dictionary of sanitized_name -> measure type ('ORDINAL', 'NOMINAL', 'SCALE')
+        variable_formats: Dictionary of sanitized_name -> SPSS display format (e.g. 'DATETIME20')
+        string_widths: Dictionary of sanitized_name -> string width (bytes) of text variables
+        
+    Returns:
+        Complete SPSS syntax as string
+    """
+    lines = generate_header_lines(use_relative_path)
+    
+    if include_save and not save_path:
+        save_path = excel_path.replace('.xlsx', '.sav')
+    
+    lines.extend(generate_dataset_lines(
+        excel_path=excel_path,
+        mappings=mappings,
+        original_names=original_names,
+        sheet_name=sheet_name,
+        save_path=save_path if include_save else None,
+        use_relative_path=use_relative_path,
+        measure_types=measure_types,
+        variable_formats=variable_formats,
+        string_widths=string_widths
+    ))
+    
+    # Execute
+    lines.append("EXECUTE.")
+    
+    syntax = '\n'.join(lines)
+    logger.info("Generated SPSS syntax")
+    return syntax
+
+
+def generate_workbook_sps_syntax(
+    datasets: List[Dict[str, Any]],
+    include_save: bool = False,
+    use_relative_path: bool = True
+) -> str:
+    """
+    Generate SPSS syntax that imports several sheets as named datasets.
+    
+    Each dataset gets its own GET DATA block followed by DATASET NAME so
+    later imports do not replace it, then its labels and measure levels.
+    
+    Args:
+        datasets: One dictionary per sheet with keys excel_path, sheet_name,
+            dataset_name, mappings, original_names and (optionally) measure_types,
+            variable_formats and string_widths
+        include_save: Whether to include a SAVE OUTFILE command per dataset
+        use_relative_path: Use relative paths (for downloaded files in same folder)
         
     Returns:
         Complete SPSS syntax as string
     """
+    lines = generate_header_lines(use_relative_path)
+    
+    for dataset in datasets:
+        dataset_name = strip_bidi_characters(sanitize_variable_name(dataset['dataset_name']))
+        save_path = None
+        if include_save:
+            base, _ = os.path.splitext(dataset['excel_path'])
+            save_path = f"{base}_{dataset_name}.sav"
+        
+        lines.extend(generate_dataset_lines(
+            excel_path=dataset['excel_path'],
+            mappings=dataset['mappings'],
+            original_names=dataset['original_names'],
+            sheet_name=dataset['sheet_name'],
+            save_path=save_path,
+            use_relative_path=use_relative_path,
+            measure_types=dataset.get('measure_types'),
+            variable_formats=dataset.get('variable_formats'),
+            string_widths=dataset.get('string_widths'),
+            dataset_name=dataset_name
+        ))
+    
+    lines.append("EXECUTE.")
+    
+    syntax = '\n'.join(lines)
+    logger.info(f"Generated SPSS syntax for {len(datasets)} datasets")
+    return syntax
+
+
+def generate_header_lines(
+    use_relative_path: bool = True,
+    data_file: str = 'encoded_data.xlsx',
+    recode_in_spss: bool = False
+) -> List[str]:
+    """
+    Generate the header comment and (for relative paths) the CD block.
+    
+    Args:
+        use_relative_path: Whether the syntax refers to files by name only
+        data_file: Name of the Excel file the syntax reads
+        recode_in_spss: Whether the syntax recodes the original data itself
+        
+    Returns:
+        List of syntax lines
+    """
     lines = []
     
     # Header comment
     lines.append("* Auto-generated by SPSS Prep Tool")
-    lines.append("* This script imports encoded data and applies value labels")
+    if recode_in_spss:
+        lines.append("* This script imports the original data, recodes answers into codes")
+        lines.append("* and applies value labels")
+    else:
+        lines.append("* This script imports encoded data and applies value labels")
     lines.append("* Original column names are preserved as variable labels")
     lines.append("*")
     
     if use_relative_path:
         lines.append("* IMPORTANT INSTRUCTIONS:")
-        lines.append("* 1. Save both this .sps file and encoded_data.xlsx to the SAME folder")
+        lines.append(f"* 1. Save both this .sps file and {data_file} to the SAME folder")
         lines.append("* 2. Edit the CD command below to point to that folder")
         lines.append("* 3. Run this script in SPSS")
         lines.append("*")
@@ -62,26 +164,68 @@ def generate_sps_syntax(
         lines.append("* Change the path above to where you saved the files!")
         lines.append("")
     
-    # Determine path to use in GET DATA
-    if use_relative_path:
-        # Use just the filename (assumes same directory)
-        excel_filename = os.path.basename(excel_path)
-        file_path_for_spss = excel_filename
-    else:
-        file_path_for_spss = format_spss_path(excel_path)
+    return lines
+
+
+def generate_dataset_lines(
+    excel_path: str,
+    mappings: Dict[str, Dict[str, int]],
+    original_names: Dict[str, str],
+    sheet_name: str = 'Sheet1',
+    save_path: Optional[str] = None,
+    use_relative_path: bool = True,
+    measure_types: Optional[Dict[str, str]] = None,
+    dataset_name: Optional[str] = None,
+    variable_formats: Optional[Dict[str, str]] = None,
+    string_widths: Optional[Dict[str, int]] = None,
+    import_lines: Optional[List[str]] = None
+) -> List[str]:
+    """
+    Generate the import, labelling and (optional) save commands for one sheet.
     
-    # GET DATA block
-    # Clean sheet name from bidirectional Unicode characters
-    clean_sheet_name = strip_bidi_characters(sheet_name)
+    Args:
+        excel_path: Path to the encoded Excel file
+        mappings: Dictionary of column_name -> {value: code} mappings
+        original_names: Dictionary of sanitized_name -> original_name
+        sheet_name: Sheet name in Excel file
+        save_path: Path for a SAVE OUTFILE command, or None to skip it
+        use_relative_path: Use relative paths (for downloaded files in same folder)
+        measure_types: Dictionary of sanitized_name -> measure type
+        dataset_name: Name for a DATASET NAME command, or None to skip it
+        variable_formats: Dictionary of sanitized_name -> SPSS display format
+        string_widths: Dictionary of sanitized_name -> string width (bytes)
+        import_lines: Commands that import the data instead of GET DATA of
+            the encoded workbook (see generate_recode_import_lines)
+        
+    Returns:
+        List of syntax lines
+    """
+    lines = []
     
-    lines.append("* Import the data:")
-    lines.append("GET DATA")
-    lines.append("  /TYPE=XLSX")
-    lines.append(f'  /FILE="{file_path_for_spss}"')
-    lines.append(f'  /SHEET=name "{clean_sheet_name}"')
-    lines.append("  /READNAMES=ON.")
+    if import_lines is not None:
+        lines.extend(import_lines)
+    else:
+        file_path_for_spss = _spss_file_path(excel_path, use_relative_path)
+        
+        # GET DATA block
+        # Clean sheet name from bidirectional Unicode characters
+        clean_sheet_name = strip_bidi_characters(sheet_name)
+        
+        lines.append("* Import the data:")
+        lines.append("GET DATA")
+        lines.append("  /TYPE=XLSX")
+        lines.append(f'  /FILE="{file_path_for_spss}"')
+        lines.append(f'  /SHEET=name "{clean_sheet_name}"')
+        lines.append("  /READNAMES=ON.")
+    if dataset_name:
+        lines.append(f"DATASET NAME {dataset_name}.")
     lines.append("")
     
+    # ALTER TYPE (size free-text variables to their longest answer)
+    if string_widths:
+        lines.append(generate_string_widths_block(string_widths))
+        lines.append("")
+    
     # VALUE LABELS block
     if mappings:
         value_labels = generate_value_labels_block(mappings, original_names)
@@ -94,6 +238,11 @@ def generate_sps_syntax(
         lines.append(var_labels)
         lines.append("")
     
+    # FORMATS (display date/time variables as dates)
+    if variable_formats:
+        lines.append(generate_formats_block(variable_formats))
+        lines.append("")
+    
     # VARIABLE LEVEL (set measure types)
     if measure_types:
         var_level = generate_variable_level_block(measure_types)
@@ -102,17 +251,332 @@ def generate_sps_syntax(
             lines.append("")
     
     # SAVE OUTFILE (optional)
-    if include_save:
-        if not save_path:
-            save_path = excel_path.replace('.xlsx', '.sav')
-        lines.append(f'SAVE OUTFILE="{format_spss_path(save_path)}".')
+    if save_path:
+        if use_relative_path:
+            save_path_for_spss = os.path.basename(save_path)
+        else:
+            save_path_for_spss = format_spss_path(save_path)
+        lines.append(f'SAVE OUTFILE="{save_path_for_spss}".')
         lines.append("")
     
-    # Execute
+    return lines
+
+
+def _spss_file_path(excel_path: str, use_relative_path: bool) -> str:
+    """Path of a data file as written in GET DATA."""
+    if use_relative_path:
+        # Use just the filename (assumes same directory)
+        return os.path.basename(excel_path)
+    return format_spss_path(excel_path)
+
+
+def excel_column_letter(index: int) -> str:
+    """
+    Excel column letter of a 0-based column index (0 -> A, 26 -> AA).
+    
+    Args:
+        index: 0-based column index
+        
+    Returns:
+        Column letter(s)
+    """
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def format_spss_value(value: Any) -> str:
+    """
+    Write a value as an SPSS literal (quoted string or number).
+    
+    Args:
+        value: String or number
+        
+    Returns:
+        Literal for RECODE value lists
+    """
+    if isinstance(value, str):
+        return f"'{escape_spss_string(value)}'"
+    number = float(value)
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
+
+
+def raw_variable_names(n_columns: int, output_names: Sequence[str]) -> Tuple[List[str], Optional[str]]:
+    """
+    Names of the columns read with READNAMES=OFF, and a rename if they clash.
+    
+    SPSS names unnamed columns V1, V2, ... When a final variable name is one
+    of those, all raw columns are renamed first to a prefix no final name uses.
+    
+    Args:
+        n_columns: Number of columns read
+        output_names: Final variable names
+        
+    Returns:
+        Tuple of (raw variable names, RENAME command or None)
+    """
+    taken = {name.casefold() for name in output_names}
+    prefix = 'V'
+    while any(f"{prefix}{i}".casefold() in taken for i in range(1, n_columns + 1)):
+        prefix = 'raw' if prefix == 'V' else prefix + '_'
+    names = [f"{prefix}{i}" for i in range(1, n_columns + 1)]
+    if prefix == 'V':
+        return names, None
+    return names, f"RENAME VARIABLES (V1 TO V{n_columns} = {names[0]} TO {names[-1]})."
+
+
+def generate_recode_import_lines(
+    excel_path: str,
+    sheet_name: str,
+    n_rows: int,
+    columns: List[Dict[str, Any]],
+    use_relative_path: bool = True
+) -> List[str]:
+    """
+    Generate commands that read a sheet of the original upload and recode it.
+    
+    Row 1 (the question texts) is skipped with a CELLRANGE, so every column
+    keeps the type of its answers. Columns with value pairs become numeric
+    variables through RECODE ... INTO, text numbers through RECODE (CONVERT),
+    and the others are renamed. ADD FILES /KEEP restores the column order and
+    drops the raw columns.
+    
+    Args:
+        excel_path: Path to the original Excel file
+        sheet_name: Sheet name in the Excel file
+        n_rows: Number of data rows (below the header row)
+        columns: One dictionary per column, in sheet order, with name (final
+            variable name) and recode: None to keep the column, 'convert' for
+            text numbers, or a list of (raw value, number) pairs
+        use_relative_path: Use relative paths (for files in the same folder)
+        
+    Returns:
+        List of syntax lines
+    """
+    file_path_for_spss = _spss_file_path(excel_path, use_relative_path)
+    clean_sheet_name = strip_bidi_characters(sheet_name)
+    output_names = [strip_bidi_characters(column['name']) for column in columns]
+    last_cell = f"{excel_column_letter(max(len(columns), 1) - 1)}{max(n_rows, 1) + 1}"
+    
+    lines = []
+    lines.append("* Import the original data (row 1 holds the column names):")
+    lines.append("GET DATA")
+    lines.append("  /TYPE=XLSX")
+    lines.append(f'  /FILE="{file_path_for_spss}"')
+    lines.append(f'  /SHEET=name "{clean_sheet_name}"')
+    lines.append(f'  /CELLRANGE=RANGE "A2:{last_cell}"')
+    lines.append("  /READNAMES=OFF.")
+    
+    raw_names, rename_raw = raw_variable_names(len(columns), output_names)
+    if rename_raw:
+        lines.append(rename_raw)
+    lines.append("")
+    
+    recode_lines = []
+    renames = []
+    for raw_name, output_name, column in zip(raw_names, output_names, columns):
+        recode = column.get('recode')
+        if recode is None:
+            renames.append(f"  ({raw_name}={output_name})")
+        elif recode == 'convert':
+            recode_lines.append(f"RECODE {raw_name} (CONVERT) INTO {output_name}.")
+        elif recode:
+            recode_lines.append(f"RECODE {raw_name}")
+            recode_lines.extend(
+                f"  ({format_spss_value(value)}={format_spss_value(code)})"
+                for value, code in recode
+            )
+            recode_lines.append(f"  INTO {output_name}.")
+        else:
+            # Nothing maps to a code, so the variable is all system-missing
+            recode_lines.append(f"RECODE {raw_name} (ELSE=SYSMIS) INTO {output_name}.")
+    
+    if recode_lines:
+        lines.append("* Recode answers into their codes:")
+        lines.extend(recode_lines)
+        lines.append("")
+    if renames:
+        lines.append("RENAME VARIABLES")
+        lines.extend(renames[:-1])
+        lines.append(renames[-1] + '.')
+        lines.append("")
+    
+    # Keep the final variables in sheet order
+    lines.append("ADD FILES FILE=*")
+    keep = [' '.join(output_names[i:i + 8]) for i in range(0, len(output_names), 8)]
+    lines.append(f"  /KEEP={keep[0]}" + ('.' if len(keep) == 1 else ''))
+    for i, chunk in enumerate(keep[1:], start=2):
+        lines.append(f"    {chunk}" + ('.' if i == len(keep) else ''))
+    return lines
+
+
+def generate_recode_sps_syntax(
+    excel_path: str,
+    datasets: List[Dict[str, Any]],
+    include_save: bool = False,
+    use_relative_path: bool = True
+) -> str:
+    """
+    Generate SPSS syntax that recodes the original upload itself.
+    
+    Args:
+        excel_path: Path to the original Excel file
+        datasets: One dictionary per sheet with keys sheet_name, n_rows,
+            columns (see generate_recode_import_lines), mappings,
+            original_names and (optionally) measure_types, variable_formats
+            and string_widths. With several sheets each becomes a named dataset.
+        include_save: Whether to include a SAVE OUTFILE command per dataset
+        use_relative_path: Use relative paths (for files in the same folder)
+        
+    Returns:
+        Complete SPSS syntax as string
+    """
+    lines = generate_header_lines(use_relative_path, os.path.basename(excel_path), recode_in_spss=True)
+    base, _ = os.path.splitext(excel_path)
+    
+    for dataset in datasets:
+        dataset_name = None
+        save_path = f"{base}.sav" if include_save else None
+        if len(datasets) > 1:
+            dataset_name = strip_bidi_characters(sanitize_variable_name(dataset['sheet_name']))
+            save_path = f"{base}_{dataset_name}.sav" if include_save else None
+        
+        lines.extend(generate_dataset_lines(
+            excel_path=excel_path,
+            mappings=dataset['mappings'],
+            original_names=dataset['original_names'],
+            sheet_name=dataset['sheet_name'],
+            save_path=save_path,
+            use_relative_path=use_relative_path,
+            measure_types=dataset.get('measure_types'),
+            dataset_name=dataset_name,
+            variable_formats=dataset.get('variable_formats'),
+            string_widths=dataset.get('string_widths'),
+            import_lines=generate_recode_import_lines(
+                excel_path, dataset['sheet_name'], dataset['n_rows'],
+                dataset['columns'], use_relative_path
+            )
+        ))
+    
     lines.append("EXECUTE.")
     
     syntax = '\n'.join(lines)
-    logger.info("Generated SPSS syntax")
+    logger.info(f"Generated SPSS recode syntax for {len(datasets)} sheet(s)")
+    return syntax
+
+
+def generate_parts_import_lines(
+    excel_paths: List[str],
+    sheet_name: str,
+    string_widths: Optional[Dict[str, int]] = None,
+    use_relative_path: bool = True
+) -> List[str]:
+    """
+    Generate commands that import one sheet spread over several part files.
+    
+    Later parts are read first as temporary datasets; the first part is read
+    last and the others are added to it with ADD FILES, in order. Text
+    variables get their final width in every part so the parts match.
+    
+    Args:
+        excel_paths: Encoded Excel files holding the sheet, oldest first
+        sheet_name: Sheet name in each Excel file
+        string_widths: Dictionary of sanitized_name -> string width (bytes)
+        use_relative_path: Use relative paths (for files in the same folder)
+        
+    Returns:
+        List of syntax lines
+    """
+    clean_sheet_name = strip_bidi_characters(sheet_name)
+    
+    def get_data(excel_path: str) -> List[str]:
+        lines = [
+            "GET DATA",
+            "  /TYPE=XLSX",
+            f'  /FILE="{_spss_file_path(excel_path, use_relative_path)}"',
+            f'  /SHEET=name "{clean_sheet_name}"',
+            "  /READNAMES=ON.",
+        ]
+        if string_widths and len(excel_paths) > 1:
+            lines.append(generate_string_widths_block(string_widths))
+        return lines
+    
+    part_names = [f"append_part{index}" for index in range(2, len(excel_paths) + 1)]
+    lines = []
+    if part_names:
+        lines.append(f"* Import the data ({len(excel_paths)} parts, appended in order):")
+    else:
+        lines.append("* Import the data:")
+    for excel_path, part_name in zip(excel_paths[1:], part_names):
+        lines.extend(get_data(excel_path))
+        lines.append(f"DATASET NAME {part_name}.")
+    lines.extend(get_data(excel_paths[0]))
+    if part_names:
+        lines.append("ADD FILES FILE=*")
+        lines.extend(f"  /FILE={part_name}" for part_name in part_names[:-1])
+        lines.append(f"  /FILE={part_names[-1]}.")
+        lines.append("EXECUTE.")
+        lines.append(f"DATASET CLOSE {' '.join(part_names)}.")
+    return lines
+
+
+def generate_appended_sps_syntax(
+    datasets: List[Dict[str, Any]],
+    include_save: bool = False,
+    use_relative_path: bool = True
+) -> str:
+    """
+    Generate SPSS syntax for output that grew by appended part files.
+    
+    Args:
+        datasets: One dictionary per sheet with keys sheet_name, parts (encoded
+            Excel files holding the sheet, oldest first), mappings,
+            original_names and (optionally) measure_types, variable_formats
+            and string_widths. With several sheets each becomes a named dataset.
+        include_save: Whether to include a SAVE OUTFILE command per dataset
+        use_relative_path: Use relative paths (for files in the same folder)
+        
+    Returns:
+        Complete SPSS syntax as string
+    """
+    base, ext = os.path.splitext(datasets[0]['parts'][0])
+    data_file = os.path.basename(datasets[0]['parts'][0])
+    if any(len(dataset['parts']) > 1 for dataset in datasets):
+        data_file = f"{os.path.basename(base)}*{ext}"
+    lines = generate_header_lines(use_relative_path, data_file)
+    
+    for dataset in datasets:
+        dataset_name = None
+        save_path = f"{base}.sav" if include_save else None
+        if len(datasets) > 1:
+            dataset_name = strip_bidi_characters(sanitize_variable_name(dataset['sheet_name']))
+            save_path = f"{base}_{dataset_name}.sav" if include_save else None
+        
+        lines.extend(generate_dataset_lines(
+            excel_path=dataset['parts'][0],
+            mappings=dataset['mappings'],
+            original_names=dataset['original_names'],
+            sheet_name=dataset['sheet_name'],
+            save_path=save_path,
+            use_relative_path=use_relative_path,
+            measure_types=dataset.get('measure_types'),
+            dataset_name=dataset_name,
+            variable_formats=dataset.get('variable_formats'),
+            string_widths=dataset.get('string_widths'),
+            import_lines=generate_parts_import_lines(
+                dataset['parts'], dataset['sheet_name'], dataset.get('string_widths'), use_relative_path
+            )
+        ))
+    
+    lines.append("EXECUTE.")
+    
+    syntax = '\n'.join(lines)
+    logger.info(f"Generated SPSS syntax for {len(datasets)} appended dataset(s)")
     return syntax
 
 
@@ -124,7 +588,7 @@ def generate_value_labels_block(
     Generate VALUE LABELS block for SPSS syntax.
     
     Args:
-        mappings: Dictionary of column_name -> {value: code} mappings
+        mappings: Dictionary of variable name -> {value: code} mappings
         original_names: Dictionary of sanitized_name -> original_name
         
     Returns:
@@ -134,8 +598,8 @@ def generate_value_labels_block(
     
     var_lines = []
     for col_name, mapping in mappings.items():
-        # Use sanitized name and strip bidi characters
-        sanitized = strip_bidi_characters(sanitize_variable_name(col_name))
+        # Names are already the final variable names; only strip bidi characters
+        sanitized = strip_bidi_characters(col_name)
         
         # Sort by numeric code
         sorted_items = sorted(mapping.items(), key=lambda x: x[1])
@@ -202,13 +666,67 @@ def generate_variable_labels_block(original_names: Dict[str, str]) -> str:
     return '\n'.join(lines)
 
 
+def generate_string_widths_block(string_widths: Dict[str, int]) -> str:
+    """
+    Generate ALTER TYPE block declaring the width of string variables.
+    
+    GET DATA assumes very wide strings for text cells; this shrinks each
+    text variable to the width of its longest value.
+    
+    Args:
+        string_widths: Dictionary of sanitized_name -> width in bytes
+        
+    Returns:
+        ALTER TYPE block as string
+    """
+    lines = ["ALTER TYPE"]
+    
+    var_lines = [
+        f"  {strip_bidi_characters(var_name)} (A{width})"
+        for var_name, width in string_widths.items()
+    ]
+    
+    # Pairs are separated by whitespace; the last one gets a period
+    lines.extend(var_lines[:-1])
+    lines.append(var_lines[-1] + '.')
+    
+    return '\n'.join(lines)
+
+
+def generate_formats_block(variable_formats: Dict[str, str]) -> str:
+    """
+    Generate FORMATS block to set display formats (e.g. for dates).
+    
+    Args:
+        variable_formats: Dictionary of sanitized_name -> SPSS format
+                         (e.g. 'DATETIME20', 'DATE11')
+        
+    Returns:
+        FORMATS block as string
+    """
+    lines = ["FORMATS"]
+    
+    var_lines = [
+        f"  {strip_bidi_characters(var_name)} ({spss_format})"
+        for var_name, spss_format in variable_formats.items()
+    ]
+    
+    # Add forward slash after each variable except the last
+    for var_line in var_lines[:-1]:
+        lines.append(var_line + ' /')
+    # Last line gets period
+    lines.append(var_lines[-1] + '.')
+    
+    return '\n'.join(lines)
+
+
 def generate_variable_level_block(measure_types: Dict[str, str]) -> str:
     """
     Generate VARIABLE LEVEL block to set measure types.
     
     Args:
         measure_types: Dictionary of sanitized_name -> measure type
-                      ('Ordinal', 'Nominal', 'Scale', or 'Ignore')
+                      ('Ordinal', 'Nominal', 'Scale', 'Date', 'String', or 'Ignore')
         
     Returns:
         VARIABLE LEVEL block as string
@@ -218,6 +736,11 @@ def generate_variable_level_block(measure_types: Dict[str, str]) -> str:
     
     for var_name, measure_type in measure_types.items():
         measure_upper = measure_type.upper()
+        # Dates are continuous, text can only be nominal
+        if measure_upper == 'DATE':
+            measure_upper = 'SCALE'
+        elif measure_upper == 'STRING':
+            measure_upper = 'NOMINAL'
         if measure_upper in by_type and measure_type != 'Ignore':
             # Strip bidi characters from variable name
             clean_var_name = strip_bidi_characters(var_name)
@@ -244,17 +767,20 @@ def generate_variable_level_block(measure_types: Dict[str, str]) -> str:
     return '\n'.join(lines)
 
 
-def save_sps_file(syntax: str, output_path: str) -> None:
+def save_sps_file(syntax: str, output_path: Union[str, BinaryIO]) -> None:
     """
     Save SPSS syntax to .sps file with UTF-8 BOM encoding.
     The BOM is required for SPSS to properly display non-ASCII characters (e.g., Arabic).
     
     Args:
         syntax: SPSS syntax content
-        output_path: Path to output .sps file
+        output_path: Path to output .sps file, or a writable binary stream
     """
+    if not isinstance(output_path, str):
+        output_path.write(syntax.encode('utf-8-sig'))
+        logger.info("Saved SPSS syntax to stream")
+        return
+    
     with open(output_path, 'w', encoding='utf-8-sig') as f:
         f.write(syntax)
     logger.info(f"Saved SPSS syntax to: {output_path}")
-
-
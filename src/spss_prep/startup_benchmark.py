@@ -0,0 +1,160 @@
+"""
+Cold-start measurements for the library and the packaged executable.
+
+Usage:
+    python -m spss_prep.startup_benchmark
+        Time a fresh import of the library modules
+    python -m spss_prep.startup_benchmark dist/SPSS_Prep_Tool.exe [--runs 5]
+        Time how long the app takes from launch until its server answers
+
+Each measurement starts a new process, so nothing is served from warm
+module caches of the measuring interpreter.
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+# Modules that make up the library import path (no streamlit)
+LIBRARY_MODULES = ['spss_prep', 'spss_prep.encoder', 'spss_prep.sps_generator', 'spss_prep.utils', 'spss_prep.cli']
+
+# Streamlit's health endpoint answers once the server is ready
+HEALTH_URL = 'http://localhost:{port}/_stcore/health'
+
+
+def measure_import(
+    modules: List[str] = LIBRARY_MODULES,
+    runs: int = 3,
+    python_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Time importing modules in fresh interpreters.
+
+    Args:
+        modules: Module names to import together
+        runs: Number of fresh interpreters (the fastest run is reported)
+        python_path: Directory to put on PYTHONPATH (e.g. the src folder)
+
+    Returns:
+        Dictionary with seconds (fastest run) and loaded (set of module
+        names present in sys.modules after the import)
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {', '.join(modules)}\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(sys.modules))\n"
+    )
+    env = dict(os.environ)
+    if python_path:
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [python_path, env.get('PYTHONPATH')]))
+
+    timings = []
+    loaded: set = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+        loaded = set(output[1].split())
+    return {'seconds': min(timings), 'loaded': loaded}
+
+
+def _stop(process: subprocess.Popen) -> None:
+    """Stop a launched app together with its child processes."""
+    if os.name == 'nt':
+        # One-file executables unpack into a child process
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def measure_startup(command: List[str], port: int = 8501, timeout: float = 120.0) -> float:
+    """
+    Time an app launch until its server answers the health check.
+
+    Args:
+        command: Command starting the app (e.g. the frozen executable)
+        port: Port the server listens on
+        timeout: Seconds to wait before giving up
+
+    Returns:
+        Seconds from launch to the first successful health check
+
+    Raises:
+        TimeoutError: If the server did not come up in time
+    """
+    env = dict(os.environ)
+    env.update({
+        'STREAMLIT_SERVER_HEADLESS': 'true',
+        'STREAMLIT_SERVER_PORT': str(port),
+        'STREAMLIT_BROWSER_GATHER_USAGE_STATS': 'false',
+    })
+    url = HEALTH_URL.format(port=port)
+    options: Dict[str, Any] = {}
+    if os.name == 'nt':
+        options['creationflags'] = getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP')
+    else:
+        options['start_new_session'] = True
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **options
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"App exited with code {process.returncode} before starting")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.1)
+        raise TimeoutError(f"No answer from {url} after {timeout:.0f}s")
+    finally:
+        _stop(process)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m spss_prep.startup_benchmark',
+        description='Measure cold-start time of the library or the packaged app.'
+    )
+    parser.add_argument('command', nargs='*', help='App command to time (e.g. dist/SPSS_Prep_Tool.exe)')
+    parser.add_argument('--runs', type=int, default=3, help='Number of cold starts')
+    parser.add_argument('--port', type=int, default=8501, help='Port the app listens on')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds to wait per start')
+    args = parser.parse_args(argv)
+
+    if not args.command:
+        result = measure_import(runs=args.runs)
+        heavy = sorted({'pandas', 'numpy', 'streamlit'} & result['loaded'])
+        print(f"Library import: {result['seconds'] * 1000:.0f} ms (fastest of {args.runs})")
+        print(f"Heavy modules loaded: {', '.join(heavy) or 'none'}")
+        return 0
+
+    timings = [measure_startup(args.command, args.port, args.timeout) for _ in range(args.runs)]
+    print(f"Startup: min {min(timings):.2f}s | median {statistics.median(timings):.2f}s "
+          f"| max {max(timings):.2f}s ({args.runs} runs)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
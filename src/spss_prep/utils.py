@@ -7,6 +7,8 @@ import re
 import os
 from typing import List, Optional, Dict
 
+from .likert import infer_likert_order
+
 # Export strip_bidi_characters for use in other modules
 __all__ = ['sanitize_variable_name', 'generate_unique_var_names', 'format_spss_path', 
            'is_likely_likert', 'is_multi_response', 'escape_spss_string', 'strip_bidi_characters']
@@ -132,7 +134,7 @@ def is_likely_likert(unique_values: List[str]) -> bool:
     
     Criteria:
     - Between 3 and 7 unique values
-    - Contains common Likert keywords
+    - At least two values from the same known English/Arabic rating scale
     
     Args:
         unique_values: List of unique string values in column
@@ -140,27 +142,8 @@ def is_likely_likert(unique_values: List[str]) -> bool:
     Returns:
         True if likely Likert scale, False otherwise
     """
-    if not (3 <= len(unique_values) <= 7):
-        return False
-    
-    # Common Likert scale keywords (case-insensitive)
-    likert_keywords = [
-        'strongly disagree', 'disagree', 'neutral', 'agree', 'strongly agree',
-        'never', 'rarely', 'sometimes', 'often', 'always',
-        'very dissatisfied', 'dissatisfied', 'satisfied', 'very satisfied',
-        'not at all', 'slightly', 'moderately', 'very', 'extremely',
-        'poor', 'fair', 'good', 'very good', 'excellent',
-        'low', 'medium', 'high',
-        'yes', 'no', 'maybe'
-    ]
-    
-    # Check if any value matches Likert keywords
-    values_lower = [str(v).lower().strip() for v in unique_values]
-    for keyword in likert_keywords:
-        if keyword in values_lower:
-            return True
-    
-    return False
+    is_likert, _ = infer_likert_order(unique_values)
+    return is_likert
 
 
 def is_multi_response(value: str) -> bool:
@@ -0,0 +1,337 @@
+"""
+Round-trip verification of encoded output.
+
+Runs after every encoding and checks each configured column with
+whole-column operations:
+
+- non-empty cells before and after encoding: only answers without a code
+  may become empty,
+- unmapped answers (values the configuration has no code for), with the
+  most frequent ones,
+- cells per code (Scale columns: the sum of the numbers) against the input,
+- cells per code against the value counts detect_columns recorded.
+
+The input side reuses the distinct values and per-value cell counts of the
+shared column analysis (see analysis.py) that encoding already factorized, and
+applies the configuration to the distinct values itself instead of reusing the
+encoder's lookup table. The encoded side is counted with one ``bincount``, so
+verification adds O(uniques) work and one counting pass per encoded column.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .encoder import parse_numbers
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+    from .analysis import ColumnAnalysis, DatasetAnalysis
+    from .encoder import ColumnConfig
+
+# Unmapped answers listed per column
+MAX_LISTED_VALUES = 5
+
+# Widest code range counted with bincount (wider ranges are sorted instead)
+MAX_BINCOUNT_SPAN = 1 << 16
+
+
+def code_counts(values: np.ndarray) -> Tuple[Dict[float, int], int]:
+    """
+    Number of cells holding each code of an encoded column.
+
+    Args:
+        values: Encoded column (integer array, or float array with NaN for
+            empty cells)
+
+    Returns:
+        Tuple of (dictionary of code -> number of cells, number of non-empty cells)
+    """
+    import numpy as np
+
+    present = values
+    if values.dtype.kind == 'f':
+        present = values[~np.isnan(values)]
+        whole = present.astype(np.int64)
+        if np.array_equal(whole, present):
+            # Whole codes with empty cells: count them like an integer column
+            present = whole
+    if present.dtype.kind == 'i' and len(present):
+        low = int(present.min())
+        high = int(present.max())
+        if high - low < MAX_BINCOUNT_SPAN:
+            offset = min(low, 0)
+            counts = np.bincount(present - offset if offset else present)
+            return {offset + int(i): int(counts[i]) for i in np.flatnonzero(counts)}, len(present)
+
+    # Empty cells (NaN) end up as one trailing entry
+    uniques, counts = np.unique(values, return_counts=True)
+    if len(uniques) and uniques.dtype.kind == 'f' and np.isnan(uniques[-1]):
+        uniques, counts = uniques[:-1], counts[:-1]
+    return dict(zip(uniques.tolist(), counts.tolist())), int(counts.sum())
+
+
+def _top_values(keys: List[str], counts: np.ndarray, mask: np.ndarray) -> List[str]:
+    """Most frequent distinct values among those selected by mask."""
+    import numpy as np
+
+    positions = np.flatnonzero(mask)
+    order = np.argsort(-counts[positions], kind='stable')[:MAX_LISTED_VALUES]
+    return [keys[i] for i in positions[order]]
+
+
+def _quoted(values: List[str]) -> str:
+    return ', '.join(repr(value) for value in values)
+
+
+def verify_column(
+    source: pd.Series,
+    encoded: Optional[pd.Series],
+    config: ColumnConfig,
+    info: Optional[Dict[str, Any]] = None,
+    analysis: Optional[ColumnAnalysis] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Check one encoded column against its input.
+
+    Args:
+        source: Input column
+        encoded: Encoded column (None when nothing was encoded, e.g. Recode
+            in SPSS; only unmapped answers are checked then)
+        config: Configuration the column was encoded with
+        info: Detection results of the column (enables the comparison with
+            detection; full-data results only)
+        analysis: Shared analysis of the input column (factorized here when
+            not given)
+
+    Returns:
+        Dictionary with type, before and after (non-empty cells), unmapped
+        (cells that lost their answer), unmapped_values, issues (list of
+        messages, empty when the column is intact) and skipped (checks that
+        could not run); None for types that pass through unchanged
+    """
+    import numpy as np
+
+    encoding_type = config.encoding_type
+    issues = []
+    skipped = []
+    if encoding_type == 'Date':
+        if encoded is None:
+            return None
+        before = int(source.notna().sum())
+        lost = source.notna().to_numpy() & encoded.isna().to_numpy()
+        unmapped = int(lost.sum())
+        unmapped_values = [str(value) for value in source[lost].unique()[:MAX_LISTED_VALUES]]
+        after = int(encoded.notna().sum())
+        if unmapped:
+            issues.append(f"{unmapped} cell(s) could not be read as dates and became empty: {_quoted(unmapped_values)}")
+    elif encoding_type in ('Ordinal', 'Nominal', 'Scale'):
+        if analysis is None:
+            from .analysis import ColumnAnalysis
+
+            analysis = ColumnAnalysis(source)
+        keys = analysis.keys
+        counts = analysis.counts
+        outputs = _output_values(analysis.uniques, keys, config)
+        lost = np.isnan(outputs)
+        before = int(counts.sum())
+        unmapped = int(counts[lost].sum())
+        unmapped_values = _top_values(keys, counts, lost) if unmapped else []
+        after = None
+        if unmapped and encoding_type == 'Scale':
+            issues.append(f"{unmapped} non-numeric cell(s) became empty: {_quoted(unmapped_values)}")
+        elif unmapped:
+            issues.append(f"{unmapped} cell(s) with answers that have no code became empty: {_quoted(unmapped_values)}")
+
+        if encoded is not None:
+            values = encoded.to_numpy()
+            if values.dtype.kind not in 'if':
+                values = encoded.to_numpy(dtype=float, na_value=np.nan)
+            if encoding_type == 'Scale':
+                # Integer columns have no empty cells
+                after = int(np.count_nonzero(~np.isnan(values))) if values.dtype.kind == 'f' else len(values)
+            else:
+                actual, after = code_counts(values)
+            if after != before - unmapped:
+                issues.append(f"{before} non-empty cell(s) before encoding, {after} after (expected {before - unmapped})")
+
+            if encoding_type == 'Scale':
+                expected_sum = float(np.dot(outputs[~lost], counts[~lost]))
+                actual_sum = float(np.nansum(values))
+                if not np.isclose(actual_sum, expected_sum):
+                    issues.append(f"sum of the numbers is {actual_sum:g}, the input sums to {expected_sum:g}")
+            else:
+                expected: Dict[float, int] = {}
+                for code, count in zip(outputs[~lost].tolist(), counts[~lost].tolist()):
+                    expected[code] = expected.get(code, 0) + count
+                differences = _count_differences(actual, expected, 'the input')
+                issues.extend(differences)
+                if info is None or info.get('is_sample') or info.get('is_text') or info.get('is_datetime'):
+                    skipped.append('cells per code against detection (no full detection results)')
+                elif not differences:
+                    issues.extend(_count_issues(actual, config, info))
+    else:
+        return None
+
+    return {
+        'type': encoding_type,
+        'before': before,
+        'after': after,
+        'unmapped': unmapped,
+        'unmapped_values': unmapped_values,
+        'issues': issues,
+        'skipped': skipped,
+    }
+
+
+def _output_values(values: pd.Index, keys: List[str], config: ColumnConfig) -> np.ndarray:
+    """Code (Scale: number) the configuration gives each distinct raw value, NaN for none."""
+    import numpy as np
+
+    if config.encoding_type == 'Scale':
+        numbers = config.get_numbers()
+        outputs = np.array([numbers.get(key, np.nan) for key in keys], dtype=float)
+        unseen = np.array([key not in numbers for key in keys], dtype=bool)
+        if unseen.any():
+            outputs[unseen] = parse_numbers(values[unseen])
+        return outputs
+    mapping = config.get_mapping()
+    value_map = config.value_map
+    return np.array([mapping.get(value_map.get(key, key), np.nan) for key in keys], dtype=float)
+
+
+def _count_differences(actual: Dict[float, int], expected: Dict[float, int], source: str) -> List[str]:
+    """Describe the codes whose number of cells differs from the one expected from source."""
+    differences = [
+        f"code {code:g}: {actual.get(code, 0)} (expected {expected.get(code, 0)})"
+        for code in sorted(set(expected) | set(actual))
+        if actual.get(code, 0) != expected.get(code, 0)
+    ]
+    if not differences:
+        return []
+    shown = ', '.join(differences[:MAX_LISTED_VALUES])
+    more = f" and {len(differences) - MAX_LISTED_VALUES} more" if len(differences) > MAX_LISTED_VALUES else ""
+    return [f"cells per code differ from {source}: {shown}{more}"]
+
+
+def _count_issues(actual: Dict[float, int], config: ColumnConfig, info: Dict[str, Any]) -> List[str]:
+    """Compare cells per code with the counts detection recorded for the mapped answers."""
+    mapping = config.get_mapping()
+    value_map = config.value_map
+    expected: Dict[float, int] = {}
+    for value, count in info['value_counts'].items():
+        code = mapping.get(value_map.get(value, value))
+        if code is not None:
+            expected[code] = expected.get(code, 0) + int(count)
+    return _count_differences(actual, expected, 'detection')
+
+
+def verify_encoding(
+    df: pd.DataFrame,
+    encoded_df: Optional[pd.DataFrame],
+    configs: Dict[str, ColumnConfig],
+    column_info: Optional[Dict[str, Any]] = None,
+    analysis: Optional[DatasetAnalysis] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Check every encoded column of a sheet (see verify_column).
+
+    Args:
+        df: Input sheet
+        encoded_df: Encoded sheet, before renaming (None if nothing was encoded)
+        configs: Column configurations used for encoding
+        column_info: Detection results of the sheet (column -> ColumnInfo);
+            the comparison with detection is skipped (and recorded) without them
+        analysis: Shared DatasetAnalysis of df, as passed to apply_encoding
+
+    Returns:
+        Dictionary of column name -> report, for every checked column
+    """
+    from .analysis import analysis_for
+
+    analysis = analysis_for(df, analysis)
+    report = {}
+    for col, config in configs.items():
+        if col not in df.columns:
+            continue
+        result = verify_column(
+            df[col],
+            encoded_df[col] if encoded_df is not None else None,
+            config,
+            (column_info or {}).get(col),
+            analysis.column(col) if config.encoding_type in ('Ordinal', 'Nominal', 'Scale') else None
+        )
+        if result is not None:
+            report[col] = result
+    return report
+
+
+def combine_reports(reports: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Add up the reports of several files encoded into one dataset.
+
+    Args:
+        reports: Dictionary of file name -> report (see verify_encoding)
+
+    Returns:
+        Report per column with summed counts; issues name their file,
+        skipped checks are listed once
+    """
+    combined: Dict[str, Dict[str, Any]] = {}
+    for name, report in reports.items():
+        for col, result in report.items():
+            total = combined.setdefault(col, {
+                'type': result['type'], 'before': 0, 'after': 0, 'unmapped': 0,
+                'unmapped_values': [], 'issues': [], 'skipped': [],
+            })
+            total['before'] += result['before']
+            total['after'] = None if total['after'] is None or result['after'] is None else total['after'] + result['after']
+            total['unmapped'] += result['unmapped']
+            total['unmapped_values'].extend(
+                value for value in result['unmapped_values'] if value not in total['unmapped_values']
+            )
+            total['issues'].extend(f"{name}: {issue}" for issue in result['issues'])
+            total['skipped'].extend(
+                check for check in result.get('skipped', []) if check not in total['skipped']
+            )
+    for total in combined.values():
+        del total['unmapped_values'][MAX_LISTED_VALUES:]
+    return combined
+
+
+def verification_issues(verification: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Columns with discrepancies.
+
+    Args:
+        verification: Dictionary of sheet name -> report (see verify_encoding)
+
+    Returns:
+        Dictionary of sheet name -> {column: issues}, only for columns with issues
+    """
+    issues = {}
+    for sheet_name, report in verification.items():
+        sheet_issues = {col: result['issues'] for col, result in report.items() if result['issues']}
+        if sheet_issues:
+            issues[sheet_name] = sheet_issues
+    return issues
+
+
+def skipped_checks(verification: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Columns where some checks could not run (see verify_column).
+
+    Args:
+        verification: Dictionary of sheet name -> report (see verify_encoding)
+
+    Returns:
+        Dictionary of sheet name -> {column: skipped checks}, only for such columns
+    """
+    skipped = {}
+    for sheet_name, report in verification.items():
+        sheet_skipped = {col: result['skipped'] for col, result in report.items() if result.get('skipped')}
+        if sheet_skipped:
+            skipped[sheet_name] = sheet_skipped
+    return skipped
@@ -0,0 +1,393 @@
+"""
+Watch-folder daemon that encodes exports dropped into a shared folder.
+
+Usage:
+    python -m spss_prep.watcher exports/ [--configs configs/] [--workers 2] [--interval 2] [--settle 5]
+
+The folder is polled (no filesystem notifications, so it works on network
+shares too). A new or replaced .xlsx file is encoded once its size and
+modification time have stayed the same for ``settle`` seconds and it is a
+complete zip archive, so files still being copied are left alone. The bundle
+is written next to the input as ``<name>_spss.zip``, the same name the CLI
+uses.
+
+Each export is matched to a saved configuration (written with
+``python -m spss_prep.cli --write-config``) from the configs folder: a
+configuration is used when its sheets and columns are exactly those of the
+export, preferring ``<name>.json`` over other files. Exports without a match
+are configured automatically, the way the app's cards start out.
+
+Encoding runs in a process pool with ``workers`` processes, so at most that
+many exports are encoded at a time and the rest wait in the queue. Every
+finished file is logged with its processing time, its latency since it was
+first seen and the queue depth.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_SETTLE = 5.0
+DEFAULT_WORKERS = 2
+
+# Suffix of the bundle written next to each export (as the CLI names it)
+OUTPUT_SUFFIX = '_spss.zip'
+
+
+def is_export(name: str) -> bool:
+    """Whether a file name looks like an export to encode (not an Excel lock or hidden file)."""
+    return name.lower().endswith('.xlsx') and not name.startswith(('~$', '.'))
+
+
+def output_path(path: str) -> str:
+    """Path of the bundle written for an export."""
+    return f"{os.path.splitext(path)[0]}{OUTPUT_SUFFIX}"
+
+
+def match_config(
+    frames: Dict[str, Any],
+    config_paths: List[str],
+    stem: str
+) -> Tuple[Optional[str], Optional[Dict[str, Dict[str, Any]]]]:
+    """
+    Find the saved configuration that fits a workbook.
+
+    Args:
+        frames: Dictionary of sheet name -> dataframe
+        config_paths: JSON files written with --write-config
+        stem: File name of the export without extension (``<stem>.json`` is tried first)
+
+    Returns:
+        Tuple of (path, configurations), or (None, None) if none fits
+    """
+    from .cli import load_configs
+
+    ordered = sorted(config_paths, key=lambda p: os.path.splitext(os.path.basename(p))[0] != stem)
+    for path in ordered:
+        try:
+            sheet_configs = load_configs(path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f"Skipping {os.path.basename(path)}: not a saved configuration ({str(e)})")
+            continue
+        if all(
+            sheet_name in sheet_configs and set(sheet_configs[sheet_name]) == set(df.columns)
+            for sheet_name, df in frames.items()
+        ):
+            return path, sheet_configs
+    return None, None
+
+
+def encode_export(path: str, config_paths: List[str], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode one export and write its bundle next to it (runs inside a worker process).
+
+    Args:
+        path: Path of the .xlsx export
+        config_paths: Saved configurations to match against
+        options: include_save, sanitize_names, split_sheets and normalize_answers
+
+    Returns:
+        Dictionary with output (bundle path), config (matched file or None),
+        rows (sheet -> row count), issues (round-trip discrepancies, see
+        verify.verification_issues) and seconds (processing time)
+    """
+    from .cli import build_default_configs, detect_workbook
+    from .encoder import load_workbook
+    from .jobs import run_workbook_pipeline
+    from .verify import verification_issues
+
+    start = time.perf_counter()
+    frames = load_workbook(path)
+    options = dict(options)
+    normalize_answers = options.pop('normalize_answers', False)
+    config_path, sheet_configs = match_config(
+        frames, config_paths, os.path.splitext(os.path.basename(path))[0]
+    )
+    column_info = None
+    if sheet_configs is None:
+        column_info = detect_workbook(frames, normalize_answers)
+        sheet_configs = build_default_configs(
+            frames, options.get('sanitize_names', True), normalize_answers, column_info=column_info
+        )
+
+    result = run_workbook_pipeline(frames, sheet_configs, column_info=column_info, **options)
+
+    # Write next to the input under a hidden name first, so readers never see half a zip
+    output = output_path(path)
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(output) or '.', prefix='.staging-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(result['bundle'])
+        os.replace(staging, output)
+    except OSError:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+
+    return {
+        'output': output,
+        'config': config_path,
+        'rows': {sheet_name: len(df) for sheet_name, df in frames.items()},
+        'issues': verification_issues(result['verification']),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class FolderWatcher:
+    """
+    Polls a folder and encodes settled exports on a bounded process pool.
+
+    A file is remembered by its size and modification time: it is submitted
+    once that signature has not changed for ``settle`` seconds, and submitted
+    again only if the file is replaced later. Exports whose bundle is newer
+    than the export itself count as done, so a restarted watcher does not
+    redo them.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        config_dir: Optional[str] = None,
+        workers: int = DEFAULT_WORKERS,
+        interval: float = DEFAULT_INTERVAL,
+        settle: float = DEFAULT_SETTLE,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        self.folder = folder
+        self.config_dir = config_dir or folder
+        self.workers = workers
+        self.interval = interval
+        self.settle = settle
+        self.options = dict(options or {})
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        # path -> (signature, time first seen with it)
+        self._settling: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # path -> signature of the last version submitted
+        self._done: Dict[str, Tuple[int, int]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._started = time.monotonic()
+        self._counters = {'completed': 0, 'failed': 0}
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def config_paths(self) -> List[str]:
+        """Saved configurations in the configs folder."""
+        return sorted(glob.glob(os.path.join(self.config_dir, '*.json')))
+
+    def scan(self) -> List[str]:
+        """
+        Poll the folder once and submit exports that have settled.
+
+        Returns:
+            Paths submitted by this poll
+        """
+        now = time.monotonic()
+        submitted: List[str] = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError as e:
+            logger.error(f"Cannot list {self.folder}: {str(e)}")
+            return submitted
+
+        present = set()
+        for entry in entries:
+            if not is_export(entry.name) or not entry.is_file():
+                continue
+            path = entry.path
+            present.add(path)
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            with self._lock:
+                if path in self._pending or self._done.get(path) == signature:
+                    continue
+                if self._is_up_to_date(path, stat.st_mtime):
+                    self._done[path] = signature
+                    continue
+
+            seen = self._settling.get(path)
+            if seen is None or seen[0] != signature:
+                self._settling[path] = (signature, now)
+                continue
+            if now - seen[1] < self.settle or not zipfile.is_zipfile(path):
+                continue
+
+            del self._settling[path]
+            self._submit(path, signature, seen[1])
+            submitted.append(path)
+
+        # Forget files that were removed
+        for path in set(self._settling) - present:
+            del self._settling[path]
+        return submitted
+
+    def _is_up_to_date(self, path: str, mtime: float) -> bool:
+        """Whether the export already has a bundle written after it."""
+        try:
+            return os.path.getmtime(output_path(path)) >= mtime
+        except OSError:
+            return False
+
+    def _submit(self, path: str, signature: Tuple[int, int], first_seen: float) -> None:
+        with self._lock:
+            self._done[path] = signature
+            future = self._executor.submit(encode_export, path, self.config_paths(), self.options)
+            self._pending[path] = future
+            depth = len(self._pending)
+        logger.info(f"Queued {os.path.basename(path)} (queue depth {depth})")
+        future.add_done_callback(lambda done: self._finished(path, first_seen, done))
+
+    def _finished(self, path: str, first_seen: float, future: Future) -> None:
+        latency = time.monotonic() - first_seen
+        with self._lock:
+            self._pending.pop(path, None)
+            depth = len(self._pending)
+        name = os.path.basename(path)
+        try:
+            result = future.result()
+        except Exception as e:
+            with self._lock:
+                self._counters['failed'] += 1
+            logger.error(f"Encoding {name} failed after {latency:.2f}s (queue depth {depth}): {str(e)}")
+            return
+
+        with self._lock:
+            self._counters['completed'] += 1
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+        config = os.path.basename(result['config']) if result['config'] else 'automatic configuration'
+        logger.info(
+            f"Encoded {name} -> {os.path.basename(result['output'])} "
+            f"({sum(result['rows'].values())} rows, {config}) in {result['seconds']:.2f}s, "
+            f"latency {latency:.2f}s, queue depth {depth}"
+        )
+        for sheet_name, sheet_issues in result['issues'].items():
+            for col, messages in sheet_issues.items():
+                for message in messages:
+                    logger.warning(f"{name}: {sheet_name}: {col}: {message}")
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every submitted export has finished.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits forever)
+
+        Returns:
+            True if the queue is empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                futures = list(self._pending.values())
+            if not futures:
+                return True
+            for future in futures:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    future.exception(timeout=remaining)
+                except TimeoutError:
+                    return False
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Poll until stop_event is set.
+
+        Args:
+            stop_event: Event that ends the loop (runs until interrupted if None)
+        """
+        stop_event = stop_event or threading.Event()
+        logger.info(
+            f"Watching {self.folder} every {self.interval:g}s "
+            f"({self.workers} worker(s), configs from {self.config_dir})"
+        )
+        while not stop_event.is_set():
+            self.scan()
+            stop_event.wait(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters of the watcher.
+
+        Returns:
+            Dictionary with completed, failed, queue_depth, settling,
+            uptime_seconds and mean/max latency
+        """
+        with self._lock:
+            completed = self._counters['completed']
+            return {
+                **self._counters,
+                'queue_depth': len(self._pending),
+                'settling': len(self._settling),
+                'uptime_seconds': time.monotonic() - self._started,
+                'latency_mean_seconds': self._latency_total / completed if completed else 0.0,
+                'latency_max_seconds': self._latency_max,
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker processes (exports still queued are dropped)."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Run the watcher from the command line."""
+    parser = argparse.ArgumentParser(
+        prog='python -m spss_prep.watcher',
+        description='Encode Excel exports dropped into a folder.'
+    )
+    parser.add_argument('folder', help='Folder to watch')
+    parser.add_argument('--configs', help='Folder with saved configurations (default: the watched folder)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Exports encoded at a time')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Seconds between polls')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help='Seconds a file must stay unchanged before it is encoded')
+    parser.add_argument('--include-save', action='store_true', help='Add SAVE OUTFILE to the syntax')
+    parser.add_argument('--keep-names', action='store_true', help='Do not sanitize variable names')
+    parser.add_argument('--split-sheets', action='store_true', help='One Excel file per sheet')
+    parser.add_argument('--normalize-answers', action='store_true',
+                        help='Merge spelling variants when configuring automatically')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        print(f"error: {args.folder} is not a folder", file=sys.stderr)
+        return 2
+
+    watcher = FolderWatcher(
+        args.folder,
+        config_dir=args.configs,
+        workers=args.workers,
+        interval=args.interval,
+        settle=args.settle,
+        options={
+            'include_save': args.include_save,
+            'sanitize_names': not args.keep_names,
+            'split_sheets': args.split_sheets,
+            'normalize_answers': args.normalize_answers,
+        }
+    )
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""
+Per-session output workspaces.
+Gives each session its own directory for generated files, with TTL-based cleanup
+and disk quotas so concurrent sessions never share or accumulate temp files.
+
+A workspace also holds the session's data between runs: sheets are spilled to
+uncompressed Arrow (Feather) files that are memory-mapped back on access, and
+the session state (configurations, detection results and previews) is pickled
+next to them. An idle session then keeps almost nothing on the heap, and a
+reconnecting browser can resume the session without uploading and parsing the
+workbook again.
+
+Because pickles are loaded back, the workspace root is private to the user
+running the app: it is created with mode 0o700, and a root owned by another
+user (e.g. planted in the shared temp directory) is refused.
+"""
+
+import json
+import os
+import pickle
+import re
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Root directory holding one subdirectory per session
+WORKSPACE_ROOT = os.path.join(tempfile.gettempdir(), 'spss_prep_sessions')
+
+# Idle sessions are removed after this many seconds
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+# Maximum bytes a single session may keep on disk
+DEFAULT_SESSION_QUOTA_BYTES = 500 * 1024 * 1024
+
+# Maximum bytes all sessions together may keep on disk
+DEFAULT_TOTAL_QUOTA_BYTES = 5 * 1024 * 1024 * 1024
+
+# Marker file whose mtime records the last use of a workspace
+_LAST_USED_MARKER = '.last_used'
+
+# Session ids are uuid4 hex strings; anything else never maps to a directory
+_SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Lists the files holding the current frames of a workspace
+_FRAMES_MANIFEST = 'frames.json'
+
+_cleanup_thread: Optional[threading.Thread] = None
+_cleanup_lock = threading.Lock()
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """Raised when a session workspace holds more data than its quota allows."""
+
+
+class SessionWorkspace:
+    """A private output directory for one user session."""
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        root: str = WORKSPACE_ROOT,
+        quota_bytes: int = DEFAULT_SESSION_QUOTA_BYTES
+    ):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.path = os.path.join(root, self.session_id)
+        ensure_private_root(root)
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self.touch()
+
+    @classmethod
+    def resume(
+        cls,
+        session_id: Optional[str],
+        root: str = WORKSPACE_ROOT,
+        quota_bytes: int = DEFAULT_SESSION_QUOTA_BYTES
+    ) -> Optional['SessionWorkspace']:
+        """
+        Reopen the workspace of an earlier session, e.g. after a reconnect.
+
+        Args:
+            session_id: Id of the earlier session (from the page URL)
+            root: Workspace root directory
+            quota_bytes: Maximum bytes the session may keep on disk
+
+        Returns:
+            The workspace, or None if the id is invalid or has expired
+        """
+        if not session_id or not _SESSION_ID_PATTERN.match(session_id):
+            return None
+        if not os.path.isdir(os.path.join(root, session_id)):
+            return None
+        return cls(session_id, root, quota_bytes)
+
+    def touch(self) -> None:
+        """Mark the workspace as recently used."""
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        marker = os.path.join(self.path, _LAST_USED_MARKER)
+        with open(marker, 'a'):
+            pass
+        os.utime(marker, None)
+
+    def file_path(self, filename: str) -> str:
+        """
+        Get the path of a file inside the workspace.
+
+        Args:
+            filename: Bare file name (no directories)
+
+        Returns:
+            Absolute path inside the session directory
+        """
+        self.touch()
+        return os.path.join(self.path, os.path.basename(filename))
+
+    def usage_bytes(self) -> int:
+        """Total size of the files currently stored in the workspace."""
+        return directory_size(self.path)
+
+    def ensure_quota(self, incoming_bytes: int = 0, replaced_bytes: int = 0) -> None:
+        """
+        Check the workspace against its quota, before or after a write.
+
+        Args:
+            incoming_bytes: Bytes about to be written
+            replaced_bytes: Bytes of stored files that the write replaces
+
+        Raises:
+            WorkspaceQuotaExceeded: If the workspace is (or would be) over quota
+        """
+        usage = self.usage_bytes() - replaced_bytes + incoming_bytes
+        if usage > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Session workspace would use {usage} bytes (quota {self.quota_bytes})"
+            )
+
+    def cleanup(self) -> None:
+        """Delete the workspace and everything in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _write_atomic(self, filename: str, data: bytes) -> None:
+        """Write a file so readers see either the old or the new content."""
+        path = self.file_path(filename)
+        fd, staging = tempfile.mkstemp(dir=self.path, prefix='.staging-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(staging, path)
+        except OSError:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+
+    def save_bytes(self, filename: str, data: bytes) -> None:
+        """
+        Store a file (e.g. the output bundle) if it fits in the quota.
+
+        Args:
+            filename: Bare file name inside the workspace
+            data: File content
+
+        Raises:
+            WorkspaceQuotaExceeded: If storing it would exceed the quota
+                (nothing is written then)
+        """
+        self.ensure_quota(len(data), _file_size(self.file_path(filename)))
+        self._write_atomic(filename, data)
+
+    def save_json(self, filename: str, data: Any) -> None:
+        """
+        Store JSON-serializable data (e.g. column configurations).
+
+        Args:
+            filename: Bare file name inside the workspace
+            data: Data to store
+        """
+        self._write_atomic(filename, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def load_json(self, filename: str) -> Optional[Any]:
+        """
+        Read data stored with save_json.
+
+        Args:
+            filename: Bare file name inside the workspace
+
+        Returns:
+            The stored data, or None if the file does not exist
+        """
+        try:
+            with open(self.file_path(filename), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_object(self, filename: str, obj: Any) -> None:
+        """
+        Store a Python object that JSON cannot hold (e.g. detection results).
+
+        The object is pickled, so only ever load it from a private workspace
+        (see ensure_private_root).
+
+        Args:
+            filename: Bare file name inside the workspace
+            obj: Picklable object
+        """
+        self._write_atomic(filename, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_object(self, filename: str) -> Optional[Any]:
+        """
+        Read an object stored with save_object.
+
+        Args:
+            filename: Bare file name inside the workspace
+
+        Returns:
+            The stored object, or None if the file does not exist
+        """
+        try:
+            with open(self.file_path(filename), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_frames(self, frames: Dict[str, Any]) -> None:
+        """
+        Spill sheets to disk, replacing previously saved frames.
+
+        Numeric, date and Arrow text columns go to one uncompressed Feather
+        file per sheet so they can be memory-mapped on load. Columns Arrow
+        cannot hold exactly (Python objects such as mixed cells) are pickled
+        next to it together with the column names and index.
+
+        Files get fresh names on every save, so frames still mapped by a
+        running job are never overwritten.
+
+        Args:
+            frames: Dictionary of sheet name -> dataframe
+
+        Raises:
+            WorkspaceQuotaExceeded: If the sheets (estimated from their size in
+                memory) would not fit in the quota; nothing is written then
+        """
+        import numpy as np
+        import pandas as pd
+
+        from .encoder import arrow_strings_available, is_text_dtype
+        from .memory import frames_nbytes
+
+        previous = self.load_json(_FRAMES_MANIFEST)
+        previous_bytes = sum(
+            _file_size(self.file_path(sheet['stem'] + suffix))
+            for sheet in (previous or {}).get('sheets', [])
+            for suffix in ('.pkl', '.arrow')
+        )
+        # Checked up front, so an oversized upload never lands on disk
+        self.ensure_quota(frames_nbytes(frames), previous_bytes)
+        token = uuid.uuid4().hex[:8]
+        sheets = []
+        for position, (sheet_name, df) in enumerate(frames.items()):
+            stem = f"frames-{token}-{position}"
+            keys = [f"c{index}" for index in range(df.shape[1])]
+            arrow_keys = []
+            objects = {}
+            for index, key in enumerate(keys):
+                values = df.iloc[:, index]
+                native = isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufmM'
+                if arrow_strings_available() and (native or is_text_dtype(values.dtype)):
+                    arrow_keys.append(key)
+                else:
+                    objects[key] = values.reset_index(drop=True)
+            sidecar = {
+                'columns': df.columns,
+                'index': None if df.index.equals(pd.RangeIndex(len(df))) else df.index,
+                'objects': objects,
+            }
+            self.save_object(f"{stem}.pkl", sidecar)
+            if arrow_keys:
+                _write_feather(df, keys, arrow_keys, self.file_path(f"{stem}.arrow"))
+            sheets.append({'name': sheet_name, 'stem': stem, 'rows': len(df),
+                           'keys': keys, 'arrow_keys': arrow_keys})
+
+        self.save_json(_FRAMES_MANIFEST, {'sheets': sheets})
+        for sheet in (previous or {}).get('sheets', []):
+            for suffix in ('.pkl', '.arrow'):
+                try:
+                    os.remove(self.file_path(sheet['stem'] + suffix))
+                except OSError:
+                    # Still mapped by another reader (Windows); removed with the workspace
+                    pass
+
+    def has_frames(self) -> bool:
+        """Whether frames have been saved in this workspace."""
+        return os.path.exists(self.file_path(_FRAMES_MANIFEST))
+
+    def load_frames(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the saved sheets, memory-mapping their Arrow columns.
+
+        Returns:
+            Dictionary of sheet name -> dataframe, or None if nothing was saved
+            (or a sheet's files are gone)
+        """
+        import pandas as pd
+
+        manifest = self.load_json(_FRAMES_MANIFEST)
+        if manifest is None:
+            return None
+
+        frames = {}
+        for sheet in manifest['sheets']:
+            sidecar = self.load_object(f"{sheet['stem']}.pkl")
+            if sidecar is None:
+                return None
+            columns = dict(sidecar['objects'])
+            if sheet['arrow_keys']:
+                mapped = _read_feather(self.file_path(f"{sheet['stem']}.arrow"))
+                columns.update({key: mapped[key] for key in sheet['arrow_keys']})
+            df = pd.DataFrame(
+                {key: columns[key] for key in sheet['keys']},
+                index=pd.RangeIndex(sheet['rows']),
+                copy=False
+            )
+            df.columns = sidecar['columns']
+            if sidecar['index'] is not None:
+                df.index = sidecar['index']
+            frames[sheet['name']] = df
+        return frames
+
+
+def _write_feather(df: Any, keys: List[str], arrow_keys: List[str], path: str) -> None:
+    """Write the Arrow-compatible columns of a frame as uncompressed Feather."""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    positions = {key: index for index, key in enumerate(keys)}
+    table = pa.table({key: pa.array(df.iloc[:, positions[key]], from_pandas=True) for key in arrow_keys})
+    staging = f"{path}.staging"
+    # Uncompressed and in one chunk, so columns are mapped instead of decoded or concatenated
+    feather.write_feather(table, staging, compression='uncompressed', chunksize=max(len(df), 1))
+    os.replace(staging, path)
+
+
+def _arrow_types_mapper(arrow_type: Any) -> Any:
+    """Map Arrow text types back to the dtypes compact_text_columns uses."""
+    import pandas as pd
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    return None
+
+
+def _read_feather(path: str) -> Any:
+    """Memory-map a Feather file as a dataframe without copying its buffers."""
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(types_mapper=_arrow_types_mapper, split_blocks=True, self_destruct=True)
+
+
+def ensure_private_root(root: str) -> None:
+    """
+    Create the workspace root readable only by the current user, or check an existing one.
+
+    Args:
+        root: Workspace root directory
+
+    Raises:
+        PermissionError: If the root is a symlink or owned by another user
+    """
+    os.makedirs(root, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        # Windows: the temp directory is already per user
+        return
+    info = os.lstat(root)
+    if stat.S_ISLNK(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Workspace root {root} is not a directory owned by the current user")
+    if info.st_mode & 0o077:
+        os.chmod(root, 0o700)
+
+
+def _file_size(path: str) -> int:
+    """Size of a file, 0 if it does not exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def directory_size(path: str) -> int:
+    """Sum of file sizes below a directory."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _last_used(path: str) -> float:
+    marker = os.path.join(path, _LAST_USED_MARKER)
+    try:
+        return os.path.getmtime(marker)
+    except OSError:
+        return os.path.getmtime(path)
+
+
+def cleanup_workspaces(
+    root: str = WORKSPACE_ROOT,
+    ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    total_quota_bytes: int = DEFAULT_TOTAL_QUOTA_BYTES
+) -> List[str]:
+    """
+    Remove expired session workspaces and enforce the total disk quota.
+
+    Workspaces idle for longer than ttl_seconds are deleted first. If the
+    remaining workspaces still exceed total_quota_bytes, the least recently
+    used ones are deleted until the total fits.
+
+    Args:
+        root: Workspace root directory
+        ttl_seconds: Idle time after which a workspace expires
+        total_quota_bytes: Maximum combined size of all workspaces
+
+    Returns:
+        List of removed session ids
+    """
+    if not os.path.isdir(root):
+        return []
+
+    now = time.time()
+    sessions: List[Tuple[float, int, str]] = []
+    removed = []
+    for session_id in os.listdir(root):
+        path = os.path.join(root, session_id)
+        if not os.path.isdir(path):
+            continue
+        try:
+            last_used = _last_used(path)
+        except OSError:
+            continue
+        if now - last_used > ttl_seconds:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(session_id)
+        else:
+            sessions.append((last_used, directory_size(path), session_id))
+
+    total = sum(size for _, size, _ in sessions)
+    for _, size, session_id in sorted(sessions):
+        if total <= total_quota_bytes:
+            break
+        shutil.rmtree(os.path.join(root, session_id), ignore_errors=True)
+        removed.append(session_id)
+        total -= size
+
+    if removed:
+        logger.info(f"Removed {len(removed)} session workspaces")
+    return removed
+
+
+def start_cleanup_thread(
+    root: str = WORKSPACE_ROOT,
+    ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    total_quota_bytes: int = DEFAULT_TOTAL_QUOTA_BYTES,
+    interval_seconds: float = 300
+) -> threading.Thread:
+    """
+    Start the process-wide background cleanup thread (once per process).
+
+    Args:
+        root: Workspace root directory
+        ttl_seconds: Idle time after which a workspace expires
+        total_quota_bytes: Maximum combined size of all workspaces
+        interval_seconds: Time between cleanup passes
+
+    Returns:
+        The running cleanup thread
+    """
+    global _cleanup_thread
+
+    def loop() -> None:
+        from .memory import get_default_governor
+
+        while True:
+            try:
+                removed = cleanup_workspaces(root, ttl_seconds, total_quota_bytes)
+                get_default_governor().discard(removed)
+            except Exception as e:
+                logger.error(f"Workspace cleanup failed: {str(e)}", exc_info=True)
+            time.sleep(interval_seconds)
+
+    with _cleanup_lock:
+        if _cleanup_thread is None or not _cleanup_thread.is_alive():
+            _cleanup_thread = threading.Thread(
+                target=loop, name="workspace-cleanup", daemon=True
+            )
+            _cleanup_thread.start()
+    return _cleanup_thread
@@ -0,0 +1,85 @@
+"""
+Unit tests for the shared per-sheet analysis.
+Run with: pytest tests/
+"""
+
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from analysis import DatasetAnalysis, analyze_frames
+from encoder import ColumnConfig, apply_encoding, save_encoded_workbook
+from memory import MemoryGovernor, frames_nbytes
+
+
+class TestDatasetAnalysis:
+    """Tests for factorizing once and working on distinct values."""
+    
+    def test_column_factorized_once(self):
+        """Test that every stage gets the same column analysis."""
+        df = pd.DataFrame({'Q1': ['Yes', 'No', None, 'Yes']})
+        analysis = DatasetAnalysis(df)
+        column = analysis.column('Q1')
+        
+        assert analysis.column('Q1') is column
+        assert list(column.keys) == ['Yes', 'No']
+        assert list(column.counts) == [2, 1]
+        assert column.has_missing
+    
+    def test_encoding_uses_shared_analysis(self):
+        """Test that apply_encoding reuses the lookup of a given analysis."""
+        df = pd.DataFrame({'Q1': ['Yes', 'No', 'Yes']})
+        config = ColumnConfig('Q1', ['No', 'Yes'], 'Nominal')
+        analysis = DatasetAnalysis(df)
+        
+        encoded_df, _ = apply_encoding(df, {'Q1': config}, analysis=analysis)
+        
+        assert encoded_df['Q1'].tolist() == [2, 1, 2]
+        assert analysis.column('Q1').lookup(config).tolist()[:2] == [2.0, 1.0]
+    
+    def test_content_widths_match_written_cells(self):
+        """Test that widths from distinct values match measuring every cell."""
+        df = pd.DataFrame({
+            'Q1': ['Agree', None, 'Strongly agree'],
+            'Age': ['19', '23.5', None],
+            'Notes': ['short', 'a longer comment', None],
+        })
+        configs = {
+            'Q1': ColumnConfig('Q1', ['Agree', 'Strongly agree'], 'Ordinal'),
+            'Age': ColumnConfig('Age', [], 'Scale', numbers={'19': 19.0, '23.5': 23.5}),
+            'Notes': ColumnConfig('Notes', [], 'String'),
+        }
+        analysis = DatasetAnalysis(df)
+        encoded_df, _ = apply_encoding(df, configs, analysis=analysis)
+        
+        measured = [
+            int(encoded_df[col].fillna('').astype(str).str.len().max())
+            for col in encoded_df.columns
+        ]
+        assert analysis.content_widths(configs) == measured
+    
+    def test_writer_uses_given_widths(self):
+        """Test that save_encoded_workbook sets widths without measuring cells."""
+        df = pd.DataFrame({'q1': [1, 2]})
+        buffer = io.BytesIO()
+        
+        save_encoded_workbook({'Sheet1': df}, buffer, {'Sheet1': [30]})
+        
+        worksheet = openpyxl.load_workbook(buffer)['Sheet1']
+        assert round(worksheet.column_dimensions['A'].width) == 33
+    
+    def test_governor_keeps_analyses_per_upload(self):
+        """Test that analyses are created once and dropped with the session."""
+        frames = {'Sheet1': pd.DataFrame({'Q1': np.array(['a', 'b'] * 500, dtype=object)})}
+        governor = MemoryGovernor()
+        governor.put('s', frames)
+        
+        analyses = governor.get_analyses('s', frames)
+        analyses['Sheet1'].column('Q1')
+        
+        assert governor.get_analyses('s', frames) is analyses
+        assert governor.stats()['bytes'] == frames_nbytes(frames) + analyses['Sheet1'].nbytes
+        governor.discard(['s'])
+        assert governor.get_analyses('s', frames) is not analyses
+        assert set(analyze_frames(frames)) == {'Sheet1'}
@@ -0,0 +1,76 @@
+"""
+Unit tests for incremental append mode.
+Run with: pytest tests/
+"""
+
+import os
+
+import pytest
+import pandas as pd
+from append import AppendError, run_append
+from cli import main
+
+
+def write_survey(path, satisfaction, ages):
+    """Write a survey export with the given answers."""
+    pd.DataFrame({'Satisfaction': satisfaction, 'Age': ages}).to_excel(path, index=False)
+
+
+ANSWERS = ['Satisfied', 'Neutral', 'Very satisfied', 'Dissatisfied']
+
+
+class TestRunAppend:
+    """Tests for run_append."""
+
+    def test_first_run_and_append(self, tmp_path):
+        """Test that later runs encode only the new rows with the frozen codes."""
+        survey = str(tmp_path / 'survey.xlsx')
+        output_dir = str(tmp_path / 'out')
+        write_survey(survey, ANSWERS, [20, 30, 40, 50])
+
+        first = run_append(survey, output_dir)
+        assert first['new_rows'] == {'Sheet1': 4}
+        assert first['part'] == 'encoded_data.xlsx'
+
+        write_survey(survey, ANSWERS + ['Neutral', 'Satisfied'], [20, 30, 40, 50, 60, 70])
+        second = run_append(survey, output_dir)
+        assert second['new_rows'] == {'Sheet1': 2}
+        assert second['total_rows'] == {'Sheet1': 6}
+        assert second['part'] == 'encoded_data_002.xlsx'
+
+        part = pd.read_excel(os.path.join(output_dir, 'encoded_data_002.xlsx'))
+        first_part = pd.read_excel(os.path.join(output_dir, 'encoded_data.xlsx'))
+        assert part['Satisfaction'].tolist() == [first_part['Satisfaction'][1], first_part['Satisfaction'][0]]
+        assert part['Age'].tolist() == [60, 70]
+        assert '/FILE=append_part2.' in second['sps_syntax']
+
+        third = run_append(survey, output_dir)
+        assert third['new_rows'] == {'Sheet1': 0}
+        assert third['part'] is None
+
+    def test_unseen_answers(self, tmp_path):
+        """Test that answers the frozen configuration does not know are reported."""
+        survey = str(tmp_path / 'survey.xlsx')
+        output_dir = str(tmp_path / 'out')
+        write_survey(survey, ANSWERS, [20, 30, 40, 50])
+        run_append(survey, output_dir)
+
+        write_survey(survey, ANSWERS + ['Delighted'], [20, 30, 40, 50, 60])
+        result = run_append(survey, output_dir)
+
+        assert result['unseen'] == {'Sheet1': {'Satisfaction': ['Delighted']}}
+        part = pd.read_excel(os.path.join(output_dir, 'encoded_data_002.xlsx'))
+        assert part['Satisfaction'].isna().all()
+
+    def test_changed_rows_rejected(self, tmp_path):
+        """Test that an export that rewrote processed rows is not appended."""
+        survey = str(tmp_path / 'survey.xlsx')
+        output_dir = str(tmp_path / 'out')
+        write_survey(survey, ANSWERS, [20, 30, 40, 50])
+        run_append(survey, output_dir)
+
+        write_survey(survey, ANSWERS + ['Neutral'], [20, 30, 40, 51, 60])
+        with pytest.raises(AppendError):
+            run_append(survey, output_dir)
+
+        assert main([survey, '--append', output_dir]) == 2
@@ -0,0 +1,81 @@
+"""
+Unit tests for the content-addressed result cache.
+Run with: pytest tests/
+"""
+
+import os
+import time
+
+import pandas as pd
+from encoder import ColumnConfig
+from cache import ArtifactCache, cache_key, hash_bytes
+from jobs import run_cached_encoding_pipeline
+
+
+def make_configs(start_value=1):
+    return {
+        'Q1': ColumnConfig('Q1', ['Low', 'High'], 'Ordinal', start_value=start_value)
+    }
+
+
+class TestCacheKey:
+    """Tests for cache key canonicalization."""
+    
+    def test_same_settings_same_key(self):
+        """Test that equal configurations produce equal keys."""
+        options = {'include_save': False, 'sanitize_names': True}
+        assert cache_key('abc', make_configs(), options) == cache_key('abc', make_configs(), dict(options))
+    
+    def test_settings_change_key(self):
+        """Test that any configuration or option change alters the key."""
+        options = {'include_save': False}
+        base = cache_key('abc', make_configs(), options)
+        assert cache_key('abd', make_configs(), options) != base
+        assert cache_key('abc', make_configs(start_value=0), options) != base
+        assert cache_key('abc', make_configs(), {'include_save': True}) != base
+
+
+class TestArtifactCache:
+    """Tests for the on-disk LRU store."""
+    
+    def test_pipeline_hit_after_miss(self, tmp_path):
+        """Test that a second identical run is served from the cache."""
+        cache = ArtifactCache(root=str(tmp_path))
+        df = pd.DataFrame({'Q1': ['Low', 'High', 'Low']})
+        input_hash = hash_bytes(b'upload')
+        
+        first = run_cached_encoding_pipeline({'Sheet1': df}, {'Sheet1': make_configs()}, input_hash, cache)
+        second = run_cached_encoding_pipeline({'Sheet1': df}, {'Sheet1': make_configs()}, input_hash, cache)
+        
+        assert not first.get('cached')
+        assert second['cached']
+        assert second['bundle'] == first['bundle']
+        assert second['sps_syntax'] == first['sps_syntax']
+        assert second['encoded_df']['Q1'].tolist() == [1, 2, 1]
+        assert second['mappings'] == first['mappings'] == {'Sheet1': {'Q1': {'Low': 1, 'High': 2}}}
+        assert set(second) == set(first)
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entry is evicted first."""
+        cache = ArtifactCache(root=str(tmp_path), max_bytes=10 ** 9)
+        result = {
+            'bundle': b'x' * 1000,
+            'sps_syntax': 'EXECUTE.',
+            'encoded_df': pd.DataFrame({'a': [1]})
+        }
+        cache.put('old', result)
+        cache.put('new', result)
+        earlier = time.time() - 60
+        os.utime(tmp_path / 'old', (earlier, earlier))
+        os.utime(tmp_path / 'new', (earlier + 1, earlier + 1))
+        assert cache.get('old') is not None  # 'old' is now the most recently used
+        
+        cache.max_bytes = 1500
+        cache.evict()
+        
+        assert cache.get('old') is not None
+        assert cache.get('new') is None
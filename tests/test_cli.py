@@ -0,0 +1,59 @@
+"""
+Unit tests for the command-line interface.
+Run with: pytest tests/
+"""
+
+import json
+import os
+import zipfile
+
+import pandas as pd
+from cli import main
+
+
+def write_survey(path):
+    """Write a small survey export."""
+    pd.DataFrame({
+        'Satisfaction': ['Satisfied', 'Neutral', 'Very satisfied', 'Dissatisfied'],
+        'Age': [20, 30, 40, 50],
+    }).to_excel(path, index=False)
+
+
+class TestCli:
+    """Tests for python -m spss_prep.cli."""
+    
+    def test_default_configs(self, tmp_path):
+        """Test that a bundle is written with automatically suggested configs."""
+        survey = str(tmp_path / 'survey.xlsx')
+        config_path = str(tmp_path / 'configs.json')
+        write_survey(survey)
+        
+        assert main([survey, '--write-config', config_path]) == 0
+        
+        with zipfile.ZipFile(str(tmp_path / 'survey_spss.zip')) as bundle:
+            assert sorted(bundle.namelist()) == ['auto_import.sps', 'codebook.json', 'encoded_data.xlsx']
+        with open(config_path, encoding='utf-8') as f:
+            configs = json.load(f)['Sheet1']
+        assert configs['Satisfaction']['encoding_type'] == 'Ordinal'
+        assert configs['Satisfaction']['unique_values'] == ['Dissatisfied', 'Neutral', 'Satisfied', 'Very satisfied']
+        assert configs['Age']['encoding_type'] == 'Scale'
+    
+    def test_saved_configs(self, tmp_path):
+        """Test that edited configurations are applied."""
+        survey = str(tmp_path / 'survey.xlsx')
+        config_path = str(tmp_path / 'configs.json')
+        output = str(tmp_path / 'out.zip')
+        write_survey(survey)
+        main([survey, '--write-config', config_path])
+        with open(config_path, encoding='utf-8') as f:
+            configs = json.load(f)
+        configs['Sheet1']['Satisfaction']['direction'] = 'Descending'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(configs, f)
+        
+        assert main([survey, '--config', config_path, '-o', output]) == 0
+        
+        with zipfile.ZipFile(output) as bundle:
+            syntax = bundle.read('auto_import.sps').decode('utf-8-sig')
+        assert "1 'Very satisfied'" in syntax
+        assert os.path.exists(output)
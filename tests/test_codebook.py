@@ -0,0 +1,94 @@
+"""
+Unit tests for the codebook and the decoder.
+Run with: pytest tests/
+"""
+
+import io
+import json
+import zipfile
+
+import pytest
+import pandas as pd
+from codebook import CODEBOOK_NAME, decode_column, decode_frame, load_codebook
+from encoder import ColumnConfig
+from jobs import run_workbook_pipeline
+
+
+@pytest.fixture
+def bundle():
+    """Bundle of a small survey with an ordinal, a nominal and a numeric column."""
+    df = pd.DataFrame({
+        'How satisfied?': ['Low', 'High', 'Medium', None],
+        'Gender': ['F', 'M', 'F', 'M'],
+        'Age': [20, 30, 40, 50],
+    })
+    configs = {
+        'How satisfied?': ColumnConfig('How satisfied?', ['Low', 'Medium', 'High'], 'Ordinal',
+                                       direction='Descending', sanitized_name='How_satisfied'),
+        'Gender': ColumnConfig('Gender', ['M', 'F'], 'Nominal', start_value=0),
+        'Age': ColumnConfig('Age', [], 'Scale'),
+    }
+    result = run_workbook_pipeline({'Sheet1': df}, {'Sheet1': configs})
+    return df, result['bundle']
+
+
+class TestCodebook:
+    """Tests for the codebook written into bundles."""
+
+    def test_bundle_codebook(self, bundle, tmp_path):
+        """Test that the codebook records names, measures and value labels."""
+        _, data = bundle
+        path = tmp_path / 'bundle.zip'
+        path.write_bytes(data)
+
+        codebook = load_codebook(str(path))
+        variables = codebook['sheets']['Sheet1']['variables']
+        assert codebook['sheets']['Sheet1']['file'] == 'encoded_data.xlsx'
+        assert variables['How_satisfied'] == {
+            'label': 'How satisfied?',
+            'measure': 'Ordinal',
+            'values': {'1': 'High', '2': 'Medium', '3': 'Low'},
+        }
+        assert variables['Gender']['values'] == {'0': 'M', '1': 'F'}
+        assert 'values' not in variables['Age']
+
+    def test_round_trip(self, bundle):
+        """Test that decoding the encoded workbook gives back the original answers."""
+        df, data = bundle
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            encoded = pd.read_excel(io.BytesIO(archive.read('encoded_data.xlsx')))
+            codebook = json.loads(archive.read(CODEBOOK_NAME))
+
+        decoded, unknown = decode_frame(encoded, codebook['sheets']['Sheet1'])
+
+        assert unknown == {}
+        assert list(decoded.columns) == list(df.columns)
+        assert decoded['How satisfied?'].tolist()[:3] == df['How satisfied?'].tolist()[:3]
+        assert decoded['How satisfied?'].isna().tolist() == df['How satisfied?'].isna().tolist()
+        assert decoded['How satisfied?'].cat.ordered
+        assert list(decoded['How satisfied?'].cat.categories) == ['High', 'Medium', 'Low']
+        assert decoded['Gender'].astype(str).tolist() == df['Gender'].tolist()
+        assert decoded['Age'].tolist() == df['Age'].tolist()
+
+
+class TestDecodeColumn:
+    """Tests for the vectorized column decoder."""
+
+    def test_unknown_codes(self):
+        """Test that codes without a label become missing and are counted."""
+        values = pd.Series([1.0, 2.0, 7.0, None, 0.5, '2'], dtype=object)
+
+        decoded, unknown = decode_column(values, {'1': 'Yes', '2': 'No'})
+
+        assert decoded.isna().tolist() == [False, False, True, True, True, False]
+        assert decoded.dropna().tolist() == ['Yes', 'No', 'No']
+        assert unknown == 2
+
+    def test_names_match_case_insensitively(self):
+        """Test that variables renamed in case by SPSS are still found."""
+        sheet = {'variables': {'Q1': {'label': 'Question 1', 'measure': 'Nominal', 'values': {'1': 'Yes'}}}}
+
+        decoded, _ = decode_frame(pd.DataFrame({'q1': [1, 1], 'Other': [3, 4]}), sheet)
+
+        assert list(decoded.columns) == ['Question 1', 'Other']
+        assert decoded['Question 1'].tolist() == ['Yes', 'Yes']
@@ -3,11 +3,17 @@ Unit tests for encoding and utility functions.
 Run with: pytest tests/
 """
 
+import pickle
+from datetime import datetime
+
 import pytest
 import pandas as pd
 from utils import sanitize_variable_name, generate_unique_var_names, format_spss_path, is_likely_likert, escape_spss_string, strip_bidi_characters
-from encoder import ColumnConfig, detect_columns, apply_encoding
-from sps_generator import generate_value_labels_block
+from encoder import ColumnConfig, ColumnInfo, default_column_config, detect_columns, detect_columns_sample, detect_sheets, merge_column_order, apply_bulk_order, apply_encoding, save_encoded_workbook, load_workbook, spss_string_width, compact_text_columns, is_text_dtype
+import encoder
+from likert import _infer_scale, infer_likert_order
+from normalize import align_order, canonical_value_map
+from sps_generator import excel_column_letter, format_spss_value, generate_value_labels_block, generate_workbook_sps_syntax, generate_sps_syntax
 
 
 class TestSanitizeVariableName:
@@ -147,6 +153,27 @@ class TestEscapeSPSSString:
         assert escape_spss_string(text_with_bidi) == "It''s great"
 
 
+class TestApplyBulkOrder:
+    """Tests for committing a whole order at once."""
+    
+    def test_full_order(self):
+        """Test that a complete pasted list replaces the order."""
+        assert apply_bulk_order(['A', 'B', 'C'], ['C', 'A', 'B']) == ['C', 'A', 'B']
+    
+    def test_partial_order_keeps_rest(self):
+        """Test that values left out follow in their previous order."""
+        assert apply_bulk_order(['A', 'B', 'C', 'D'], ['D', '', 'B']) == ['D', 'B', 'A', 'C']
+    
+    def test_whitespace_and_repeats(self):
+        """Test that pasted lines match values despite surrounding spaces."""
+        assert apply_bulk_order(['Agree ', 'Disagree'], ['  Disagree', 'Agree', 'Agree']) == ['Disagree', 'Agree ']
+    
+    def test_unknown_value_rejected(self):
+        """Test that a typo is reported instead of silently dropped."""
+        with pytest.raises(ValueError):
+            apply_bulk_order(['A', 'B'], ['A', 'X'])
+
+
 class TestIsLikelyLikert:
     """Tests for Likert scale detection."""
     
@@ -161,6 +188,48 @@ class TestIsLikelyLikert:
         assert not is_likely_likert(['Apple', 'Banana', 'Cherry'])
         assert not is_likely_likert(['Yes', 'No'])  # Only 2 values
         assert not is_likely_likert(['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'])  # Too many
+    
+    def test_arabic_likert_detection(self):
+        """Test detection of Arabic scales, including spelling variants."""
+        assert is_likely_likert(['موافق', 'محايد', 'غير موافق'])
+        assert is_likely_likert(['أحياناً', 'دائماً', 'ابدا'])  # Tanween and bare alef
+
+
+class TestInferLikertOrder:
+    """Tests for suggested Likert orderings."""
+    
+    def test_frequency_order_is_replaced_by_scale_order(self):
+        """Test that values are ordered from the lowest to the highest rank."""
+        is_likert, order = infer_likert_order(['Agree', 'Neutral', 'Strongly Agree', 'Disagree'])
+        
+        assert is_likert
+        assert order == ['Disagree', 'Neutral', 'Agree', 'Strongly Agree']
+    
+    def test_arabic_order(self):
+        """Test ordering of an Arabic agreement scale."""
+        _, order = infer_likert_order(['موافق', 'موافق بشدة', 'غير موافق بشدة', 'محايد', 'غير موافق'])
+        
+        assert order == ['غير موافق بشدة', 'غير موافق', 'محايد', 'موافق', 'موافق بشدة']
+    
+    def test_unknown_values_are_appended(self):
+        """Test that values outside the scale keep their place at the end."""
+        _, order = infer_likert_order(['Often', 'Other', 'Never', '1 - Always'])
+        
+        assert order == ['Never', 'Often', '1 - Always', 'Other']
+    
+    def test_non_likert_keeps_order(self):
+        """Test that unrecognized columns keep the detected order."""
+        assert infer_likert_order(['Cairo', 'Riyadh', 'Amman']) == (False, ['Cairo', 'Riyadh', 'Amman'])
+    
+    def test_results_are_memoized(self):
+        """Test that the same value set is only analysed once."""
+        values = ['Poor', 'Good', 'Excellent', 'Fair']
+        infer_likert_order(values)
+        hits = _infer_scale.cache_info().hits
+        
+        infer_likert_order(values)
+        
+        assert _infer_scale.cache_info().hits == hits + 1
 
 
 class TestColumnConfig:
@@ -211,6 +280,59 @@ class TestColumnConfig:
         )
         mapping = config.get_mapping()
         assert mapping == {}
+    
+    def test_immutable_and_hashable(self):
+        """Test that equal settings hash equal and attributes cannot change."""
+        config = ColumnConfig('q1', ['A', 'B'], 'Nominal')
+        
+        assert config == ColumnConfig('q1', ('A', 'B'), 'Nominal')
+        assert len({config, ColumnConfig('q1', ['A', 'B'], 'Nominal')}) == 1
+        assert config != config.replace(direction='Descending')
+        assert not hasattr(config, '__dict__')
+        with pytest.raises(AttributeError):
+            config.start_value = 5
+    
+    def test_mapping_and_codes_are_cached(self):
+        """Test that the mapping is built once and matches the code array."""
+        config = ColumnConfig('q1', ['A', 'B', 'C'], start_value=0, direction='Descending')
+        
+        assert config.get_mapping() is config.get_mapping()
+        assert config.get_codes().tolist() == [2, 1, 0]
+    
+    def test_pickle_round_trip(self):
+        """Test that configs survive pickling (e.g. to worker processes)."""
+        config = ColumnConfig('q1', ['A', 'B'], value_map={'a': 'A'})
+        
+        restored = pickle.loads(pickle.dumps(config))
+        
+        assert restored == config
+        assert restored.get_mapping() == {'A': 1, 'B': 2}
+
+
+class TestColumnInfo:
+    """Tests for the compact detection record."""
+    
+    def test_reads_like_a_dictionary(self):
+        """Test the detect_columns() keys on top of the parallel arrays."""
+        info = ColumnInfo(['Agree', 'Neutral'], [5, 2], n_missing=1, value_map={})
+        
+        assert info['unique_values'] == ['Agree', 'Neutral']
+        assert info['value_counts'] == {'Agree': 5, 'Neutral': 2}
+        assert info['n_unique'] == 2
+        assert info.get('is_sample') is None
+        
+        info['is_sample'] = True
+        assert info.pop('is_sample') is True
+        assert 'is_sample' not in info
+        assert info.to_dict()['n_missing'] == 1
+    
+    def test_text_keeps_summary_only(self):
+        """Test that free text exposes no category list."""
+        info = ColumnInfo(['Nothing'], [20], n_unique=101, is_text=True)
+        
+        assert info['unique_values'] == []
+        assert info['value_counts'] == {'Nothing': 20}
+        assert info['n_unique'] == 101
 
 
 class TestDetectColumns:
@@ -238,6 +360,78 @@ class TestDetectColumns:
         
         info = detect_columns(df)
         assert info['Q1']['n_missing'] == 2
+    
+    def test_sample_detection_small_frame(self):
+        """Test that small frames are scanned completely."""
+        df = pd.DataFrame({'Q1': ['A', 'B', 'A']})
+        
+        info, is_sample = detect_columns_sample(df, n_rows=10)
+        assert not is_sample
+        assert 'is_sample' not in info['Q1']
+    
+    def test_sample_detection_large_frame(self):
+        """Test that large frames are detected on a flagged sample."""
+        df = pd.DataFrame({'Q1': ['A', 'B'] * 50})
+        
+        info, is_sample = detect_columns_sample(df, n_rows=20)
+        assert is_sample
+        assert info['Q1']['is_sample']
+        assert sum(info['Q1']['value_counts'].values()) == 20
+    
+    def test_merge_column_order_keeps_user_order(self):
+        """Test that late-discovered values are appended after the user order."""
+        merged = merge_column_order(['B', 'A'], ['A', 'C', 'B', 'D'])
+        assert merged == ['B', 'A', 'C', 'D']
+
+
+class TestWorkbooks:
+    """Tests for multi-sheet detection and output."""
+    
+    def test_detect_sheets(self):
+        """Test that every sheet is detected independently."""
+        frames = {
+            'Form A': pd.DataFrame({'Q1': ['Yes', 'No']}),
+            'Form B': pd.DataFrame({'Q1': ['Low', 'Medium', 'High']})
+        }
+        
+        info = detect_sheets(frames)
+        
+        assert list(info) == ['Form A', 'Form B']
+        assert info['Form A']['Q1']['n_unique'] == 2
+        assert info['Form B']['Q1']['n_unique'] == 3
+    
+    def test_workbook_round_trip(self, tmp_path):
+        """Test that several sheets are written to and read from one workbook."""
+        frames = {
+            'Form A': pd.DataFrame({'Q1': [1, 2]}),
+            'Form B': pd.DataFrame({'Q2': [3, 4, 5]})
+        }
+        path = str(tmp_path / 'encoded.xlsx')
+        
+        save_encoded_workbook(frames, path)
+        loaded = load_workbook(path)
+        
+        assert list(loaded) == ['Form A', 'Form B']
+        assert loaded['Form B']['Q2'].tolist() == [3, 4, 5]
+    
+    def test_workbook_syntax_names_each_dataset(self):
+        """Test that each sheet gets its own GET DATA and DATASET NAME block."""
+        datasets = [
+            {
+                'excel_path': 'encoded_data.xlsx', 'sheet_name': name, 'dataset_name': name,
+                'mappings': {'Q1': {'Yes': 1}}, 'original_names': {'Q1': 'Q1'}
+            }
+            for name in ('Form A', 'Form B')
+        ]
+        
+        syntax = generate_workbook_sps_syntax(datasets, include_save=True)
+        
+        assert syntax.count('GET DATA') == 2
+        assert '/SHEET=name "Form A"' in syntax
+        assert 'DATASET NAME Form_A.' in syntax
+        assert 'DATASET NAME Form_B.' in syntax
+        assert 'SAVE OUTFILE="encoded_data_Form_B.sav".' in syntax
+        assert syntax.endswith('EXECUTE.')
 
 
 class TestGenerateValueLabelsBlock:
@@ -288,6 +482,20 @@ class TestGenerateValueLabelsBlock:
         assert "It''s bad" in block
 
 
+class TestRecodeSyntax:
+    """Tests for the building blocks of recode-in-SPSS syntax."""
+    
+    def test_excel_column_letter(self):
+        """Test column letters past Z."""
+        assert [excel_column_letter(i) for i in (0, 25, 26, 701, 702)] == ['A', 'Z', 'AA', 'ZZ', 'AAA']
+    
+    def test_format_spss_value(self):
+        """Test that strings are quoted and whole numbers lose their decimals."""
+        assert format_spss_value("It's") == "'It''s'"
+        assert format_spss_value(3.0) == '3'
+        assert format_spss_value(2.5) == '2.5'
+
+
 class TestApplyEncoding:
     """Tests for applying encoding to dataframes."""
     
@@ -328,6 +536,257 @@ class TestApplyEncoding:
         
         assert pd.isna(encoded_df['Q1'].iloc[1])
 
+    
+    def test_scale_passes_numbers_through(self):
+        """Test that Scale columns keep their numbers instead of becoming missing."""
+        df = pd.DataFrame({'Age': pd.Series([18, '25', None, 'N/A'], dtype=object)})
+        config = ColumnConfig('Age', ['18', '25', 'N/A'], 'Scale')
+        
+        encoded_df, mappings = apply_encoding(df, {'Age': config})
+        
+        assert encoded_df['Age'].tolist()[:2] == [18.0, 25.0]
+        assert encoded_df['Age'].isna().tolist() == [False, False, True, True]
+        assert 'Age' not in mappings
+    
+    def test_scale_whole_numbers_stay_integers(self):
+        """Test that whole numbers are written as integers."""
+        df = pd.DataFrame({'Age': pd.Series([18, 25, 30], dtype=object)})
+        config = ColumnConfig('Age', [], 'Scale')
+        
+        encoded_df, _ = apply_encoding(df, {'Age': config})
+        
+        assert encoded_df['Age'].dtype == 'int64'
+        assert encoded_df['Age'].tolist() == [18, 25, 30]
+    
+    def test_scale_reuses_detected_numbers(self, monkeypatch):
+        """Test that values parsed during detection are not parsed again."""
+        df = pd.DataFrame({'Score': pd.Series([1.5, '2.5', 1.5], dtype=object)})
+        info = detect_columns(df)['Score']
+        config = default_column_config('Score', info)
+        assert info.numeric_values() == {'1.5': 1.5, '2.5': 2.5}
+        
+        def fail(values):
+            raise AssertionError("numbers parsed twice")
+        monkeypatch.setattr(encoder, 'parse_numbers', fail)
+        encoded_df, _ = apply_encoding(df, {'Score': config})
+        
+        assert config.encoding_type == 'Scale'
+        assert encoded_df['Score'].tolist() == [1.5, 2.5, 1.5]
+
+
+class TestDateColumns:
+    """Tests for date/time column handling."""
+    
+    def test_timestamps_detected_without_value_lists(self):
+        """Test that Excel timestamps are not treated as categories."""
+        df = pd.DataFrame({
+            'Timestamp': [datetime(2024, 3, 1, 9, 15), datetime(2024, 3, 1, 9, 20), None],
+            'Q1': ['Yes', 'No', 'Yes'],
+        }, dtype=object)
+        
+        info = detect_columns(df)
+        
+        assert info['Timestamp']['is_datetime']
+        assert info['Timestamp']['unique_values'] == []
+        assert info['Timestamp']['value_counts'] == {}
+        assert info['Timestamp']['n_missing'] == 1
+        assert info['Timestamp']['spss_format'] == 'DATETIME20'
+        assert not info['Q1']['is_datetime']
+    
+    def test_date_strings(self):
+        """Test that date text is recognized, free text and numbers are not."""
+        df = pd.DataFrame({
+            'Born': ['2001-05-04', '1999-12-31', '2003-01-15'],
+            'Comment': ['Great, thanks', 'Too long', 'ok'],
+            'Age': [20, 30, 40],
+        }, dtype=object)
+        
+        info = detect_columns(df)
+        
+        assert info['Born']['is_datetime']
+        assert info['Born']['spss_format'] == 'DATE11'
+        assert not info['Comment']['is_datetime']
+        assert not info['Age']['is_datetime']
+    
+    def test_dates_encoded_as_native_dates(self):
+        """Test that date columns become datetimes without value labels."""
+        df = pd.DataFrame({'Born': ['2001-05-04', None, '1999-12-31']}, dtype=object)
+        config = ColumnConfig('Born', [], encoding_type='Date')
+        
+        encoded_df, mappings = apply_encoding(df, {'Born': config})
+        
+        assert pd.api.types.is_datetime64_any_dtype(encoded_df['Born'])
+        assert encoded_df['Born'].iloc[0] == pd.Timestamp(2001, 5, 4)
+        assert pd.isna(encoded_df['Born'].iloc[1])
+        assert mappings == {}
+    
+    def test_formats_in_syntax(self):
+        """Test that date variables get a FORMATS command and SCALE level."""
+        syntax = generate_sps_syntax(
+            excel_path='encoded_data.xlsx',
+            mappings={},
+            original_names={'Timestamp': 'Timestamp'},
+            measure_types={'Timestamp': 'Date'},
+            variable_formats={'Timestamp': 'DATETIME20'}
+        )
+        
+        assert 'FORMATS\n  Timestamp (DATETIME20).' in syntax
+        assert 'Timestamp (SCALE).' in syntax
+        assert 'VALUE LABELS' not in syntax
+
+
+class TestFreeTextColumns:
+    """Tests for the high-cardinality / free-text guard."""
+    
+    def test_free_text_detected_with_capped_summary(self):
+        """Test that open-ended answers keep only a top-K summary."""
+        comments = [f"Answer number {i}" for i in range(100)] + ['Nothing'] * 20
+        df = pd.DataFrame({'Comments': comments, 'Q1': ['Yes', 'No'] * 60})
+        
+        info = detect_columns(df)
+        
+        assert info['Comments']['is_text']
+        assert info['Comments']['n_unique'] == 101
+        assert info['Comments']['unique_values'] == []
+        assert len(info['Comments']['value_counts']) == 10
+        assert info['Comments']['value_counts']['Nothing'] == 20
+        assert info['Comments']['max_width'] == len("Answer number 99")
+        assert not info['Q1']['is_text']
+    
+    def test_few_distinct_answers_stay_categorical(self):
+        """Test that small sets of labels are not treated as free text."""
+        df = pd.DataFrame({'Dept': [f"Dept {i % 40}" for i in range(400)]})
+        
+        info = detect_columns(df)
+        
+        assert not info['Dept']['is_text']
+        assert info['Dept']['n_unique'] == 40
+    
+    def test_string_width_counts_bytes(self):
+        """Test that Arabic text is measured in UTF-8 bytes."""
+        assert spss_string_width(pd.Series(['نعم', 'ok', None])) == 6
+    
+    def test_strings_pass_through(self):
+        """Test that String columns are not encoded."""
+        df = pd.DataFrame({'Comments': ['Great course', None]})
+        config = ColumnConfig('Comments', [], encoding_type='String')
+        
+        encoded_df, mappings = apply_encoding(df, {'Comments': config})
+        
+        assert encoded_df['Comments'].iloc[0] == 'Great course'
+        assert mappings == {}
+    
+    def test_alter_type_in_syntax(self):
+        """Test that string variables get an A-width and NOMINAL level."""
+        syntax = generate_sps_syntax(
+            excel_path='encoded_data.xlsx',
+            mappings={},
+            original_names={'Comments': 'Comments'},
+            measure_types={'Comments': 'String'},
+            string_widths={'Comments': 120}
+        )
+        
+        assert 'ALTER TYPE\n  Comments (A120).' in syntax
+        assert 'Comments (NOMINAL).' in syntax
+
+
+
+class TestCompactTextColumns:
+    """Tests for Arrow-backed text storage."""
+    
+    def make_survey(self):
+        """Object dataframe as read from an export."""
+        comments = [f"Comment {i}" for i in range(60)]
+        return pd.DataFrame({
+            'Q1': (['Agree', 'Neutral', None, 'Agree'] * 15),
+            'Comments': comments,
+            'Age': [20, 30, 40, 50] * 15,
+        }, dtype=object)
+    
+    def test_text_columns_use_arrow(self):
+        """Test that answers are dictionary-encoded and free text is stored as strings."""
+        df = self.make_survey()
+        compact = compact_text_columns(df)
+        
+        assert 'dictionary' in str(compact['Q1'].dtype)
+        assert compact['Comments'].dtype == 'string[pyarrow]'
+        assert compact['Age'].dtype == object
+        assert is_text_dtype(compact['Q1'].dtype) and not is_text_dtype(compact['Age'].dtype)
+        assert compact['Q1'].memory_usage(deep=True) < df['Q1'].memory_usage(deep=True)
+    
+    def test_same_results_as_object_columns(self):
+        """Test that detection and encoding do not depend on the storage."""
+        df = self.make_survey()
+        compact = compact_text_columns(df)
+        
+        info, compact_info = detect_columns(df), detect_columns(compact)
+        for col in df.columns:
+            assert compact_info[col]['unique_values'] == info[col]['unique_values']
+            assert compact_info[col]['is_numeric'] == info[col]['is_numeric']
+            assert compact_info[col]['is_text'] == info[col]['is_text']
+        
+        configs = {'Q1': ColumnConfig('Q1', ['Neutral', 'Agree'])}
+        encoded, _ = apply_encoding(df, configs)
+        compact_encoded, _ = apply_encoding(compact, configs)
+        assert compact_encoded['Q1'].equals(encoded['Q1'])
+    
+    def test_object_fallback_without_pyarrow(self, monkeypatch):
+        """Test that columns stay Python objects when pyarrow is missing."""
+        monkeypatch.setattr(encoder, 'arrow_strings_available', lambda: False)
+        df = self.make_survey()
+        
+        assert compact_text_columns(df)['Q1'].dtype == object
+
+
+
+class TestNormalizeAnswers:
+    """Tests for merging spelling variants of answers."""
+    
+    def test_variants_collapse_to_most_common_spelling(self):
+        """Test that case, spaces and NBSP variants become one category."""
+        df = pd.DataFrame({'Q1': ['Agree', 'Agree', 'agree ', 'AGREE', 'Neutral\u00a0', 'Neutral', None]})
+        
+        info = detect_columns(df, normalize=True)
+        
+        assert info['Q1']['unique_values'] == ['Agree', 'Neutral']
+        assert info['Q1']['value_counts'] == {'Agree': 4, 'Neutral': 2}
+        assert info['Q1']['value_map'] == {'agree ': 'Agree', 'AGREE': 'Agree', 'Neutral\u00a0': 'Neutral'}
+    
+    def test_arabic_letter_variants(self):
+        """Test that alef forms, taa marbuta, tatweel and diacritics are unified."""
+        counts = pd.Series([5, 2, 1, 1], index=['موافقة', 'موافقه', 'مـوافقة', 'مُوافِقة'])
+        assert canonical_value_map(counts) == {'موافقه': 'موافقة', 'مـوافقة': 'موافقة', 'مُوافِقة': 'موافقة'}
+        
+        counts = pd.Series([3, 1], index=['أوافق', 'اوافق'])
+        assert canonical_value_map(counts) == {'اوافق': 'أوافق'}
+    
+    def test_off_by_default(self):
+        """Test that detection keeps exact spellings unless asked."""
+        df = pd.DataFrame({'Q1': ['Agree', 'agree']})
+        
+        info = detect_columns(df)
+        
+        assert info['Q1']['unique_values'] == ['Agree', 'agree']
+        assert info['Q1']['value_map'] == {}
+    
+    def test_encoding_uses_value_map(self):
+        """Test that raw cells are encoded through the recorded map."""
+        df = pd.DataFrame({'Q1': ['Agree', ' agree', 'Disagree', None]})
+        info = detect_columns(compact_text_columns(df), normalize=True)
+        config = ColumnConfig('Q1', ['Disagree', 'Agree'], value_map=info['Q1']['value_map'])
+        
+        encoded_df, mappings = apply_encoding(compact_text_columns(df), {'Q1': config})
+        
+        assert encoded_df['Q1'].tolist()[:3] == [2, 2, 1]
+        assert pd.isna(encoded_df['Q1'].iloc[3])
+        assert mappings['Q1'] == {'Disagree': 1, 'Agree': 2}
+        assert ColumnConfig.from_dict(config.to_dict()).value_map == {' agree': 'Agree'}
+    
+    def test_align_order(self):
+        """Test that an order from the sample follows the full pass's spellings."""
+        assert align_order(['agree', 'Disagree'], ['Agree', 'Disagree', 'Neutral']) == ['Agree', 'Disagree']
+        assert align_order(['Agree', 'AGREE', 'Other'], ['Agree']) == ['Agree', 'Other']
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
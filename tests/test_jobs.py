@@ -0,0 +1,133 @@
+"""
+Unit tests for background job execution.
+Run with: pytest tests/
+"""
+
+import io
+import threading
+import zipfile
+
+import pytest
+import pandas as pd
+from encoder import ColumnConfig
+from jobs import CANCELLED, DONE, FAILED, submit_job, run_encoding_pipeline, run_workbook_pipeline
+
+
+class TestJob:
+    """Tests for the background job handle."""
+    
+    def test_successful_job(self):
+        """Test that a finished job exposes its result and progress."""
+        def work(x, progress_callback):
+            progress_callback(1, 2, "half")
+            return x * 2
+        
+        job = submit_job(work, 21)
+        assert job.wait(timeout=5) == 42
+        assert job.status == DONE
+        assert job.progress == 1.0
+    
+    def test_failed_job(self):
+        """Test that exceptions are captured on the job."""
+        def work(progress_callback):
+            raise ValueError("boom")
+        
+        job = submit_job(work)
+        with pytest.raises(ValueError):
+            job.wait(timeout=5)
+        assert job.status == FAILED
+    
+    def test_cancelled_job(self):
+        """Test that cancellation stops the job at the next checkpoint."""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def work(progress_callback):
+            started.set()
+            release.wait(5)
+            progress_callback(1, 2, "checkpoint")
+            return "not reached"
+        
+        job = submit_job(work)
+        started.wait(5)
+        job.cancel()
+        release.set()
+        job.wait(timeout=5)
+        assert job.status == CANCELLED
+        assert job.result is None
+
+
+class TestRunEncodingPipeline:
+    """Tests for the end-to-end encoding pipeline."""
+    
+    def test_pipeline_builds_bundle(self):
+        """Test that the pipeline bundles both files and reports progress."""
+        df = pd.DataFrame({'Q 1': ['Low', 'High', 'Low']})
+        configs = {
+            'Q 1': ColumnConfig('Q 1', ['Low', 'High'], 'Ordinal', sanitized_name='Q_1')
+        }
+        steps = []
+        
+        result = run_encoding_pipeline(
+            df, configs,
+            extra_files={'README.txt': b'hello'},
+            progress_callback=lambda done, total, msg: steps.append((done, total))
+        )
+        
+        assert "Q_1 1 'Low' 2 'High'" in result['sps_syntax']
+        assert steps[-1] == (2, 2)
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            assert sorted(bundle.namelist()) == ['README.txt', 'auto_import.sps', 'codebook.json', 'encoded_data.xlsx']
+            encoded = pd.read_excel(io.BytesIO(bundle.read('encoded_data.xlsx')))
+            sps = bundle.read('auto_import.sps')
+        assert encoded['Q_1'].tolist() == [1, 2, 1]
+        assert sps.startswith(b'\xef\xbb\xbf')
+    
+    def test_workbook_pipeline_split_sheets(self):
+        """Test that split_sheets writes one file per sheet."""
+        frames = {
+            'Form A': pd.DataFrame({'Q1': ['Yes', 'No']}),
+            'Form B': pd.DataFrame({'Q1': ['No', 'No']})
+        }
+        sheet_configs = {
+            name: {'Q1': ColumnConfig('Q1', ['Yes', 'No'], 'Nominal')} for name in frames
+        }
+        
+        result = run_workbook_pipeline(frames, sheet_configs, split_sheets=True)
+        
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            names = sorted(bundle.namelist())
+        assert names == ['auto_import.sps', 'codebook.json', 'encoded_data_Form_A.xlsx', 'encoded_data_Form_B.xlsx']
+        assert '/FILE="encoded_data_Form_B.xlsx"' in result['sps_syntax']
+        assert result['encoded_frames']['Form B']['Q1'].tolist() == [2, 2]
+    
+    def test_recode_in_spss(self):
+        """Test that recode mode ships only syntax that recodes the original file."""
+        df = pd.DataFrame({
+            'Q 1': pd.Series(['Low', 'High', 'Low'], dtype=object),
+            'V1': pd.Series(['7', '8', None], dtype=object),
+            'Notes': pd.Series(['a', 'b', 'c'], dtype=object),
+        })
+        configs = {
+            'Q 1': ColumnConfig('Q 1', ['Low', 'High'], 'Ordinal', sanitized_name='Q_1'),
+            'V1': ColumnConfig('V1', [], 'Scale'),
+            'Notes': ColumnConfig('Notes', [], 'String'),
+        }
+        
+        result = run_workbook_pipeline(
+            {'Sheet1': df}, {'Sheet1': configs}, recode_in_spss=True, source_name='survey.xlsx'
+        )
+        
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            assert bundle.namelist() == ['auto_import.sps', 'codebook.json']
+        syntax = result['sps_syntax']
+        assert result['encoded_frames'] == {}
+        assert '/FILE="survey.xlsx"' in syntax
+        assert '/CELLRANGE=RANGE "A2:C4"' in syntax
+        # V1 is also a final name, so the raw columns are renamed first
+        assert 'RENAME VARIABLES (V1 TO V3 = raw1 TO raw3).' in syntax
+        assert "RECODE raw1\n  ('Low'=1)\n  ('High'=2)\n  INTO Q_1." in syntax
+        assert 'RECODE raw2 (CONVERT) INTO V1.' in syntax
+        assert '(raw3=Notes).' in syntax
+        assert '/KEEP=Q_1 V1 Notes.' in syntax
+        assert "Q_1 1 'Low' 2 'High'" in syntax
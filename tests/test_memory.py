@@ -0,0 +1,69 @@
+"""
+Unit tests for the process-wide memory governor.
+Run with: pytest tests/
+"""
+
+import pandas as pd
+from memory import MemoryGovernor, frames_nbytes
+from workspace import SessionWorkspace
+
+
+def make_frames(n_rows=1000):
+    return {'Sheet1': pd.DataFrame({'score': [1.0] * n_rows})}
+
+
+class TestMemoryGovernor:
+    """Tests for LRU eviction of idle session data."""
+    
+    def test_frames_loaded_once(self, tmp_path):
+        """Test that repeated access is served from memory."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        ws.save_frames(make_frames())
+        governor = MemoryGovernor()
+        
+        first = governor.get_frames(ws)
+        second = governor.get_frames(ws)
+        
+        assert first is second
+        assert (governor.hits, governor.misses) == (1, 1)
+        assert governor.stats()['bytes'] == frames_nbytes(first)
+    
+    def test_least_recently_used_evicted(self):
+        """Test that the idle session goes first when over budget."""
+        size = frames_nbytes(make_frames())
+        governor = MemoryGovernor(budget_bytes=2 * size)
+        governor.put('a', make_frames())
+        governor.put('b', make_frames())
+        governor.put('a', make_frames())
+        governor.put('c', make_frames())
+        
+        stats = governor.stats()
+        assert [session_id for session_id, _, _ in stats['per_session']] == ['c', 'a']
+        assert stats['evictions'] == 1
+    
+    def test_active_session_kept_over_budget(self):
+        """Test that a session larger than the budget is still served."""
+        governor = MemoryGovernor(budget_bytes=1)
+        governor.put('a', make_frames())
+        governor.put('b', make_frames())
+        
+        assert [session_id for session_id, _, _ in governor.stats()['per_session']] == ['b']
+    
+    def test_evicted_session_reloads_from_disk(self, tmp_path):
+        """Test that evicted sheets come back from the workspace."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        ws.save_frames(make_frames(3))
+        governor = MemoryGovernor()
+        governor.get_frames(ws)
+        governor.discard([ws.session_id])
+        
+        frames = governor.get_frames(ws)
+        
+        assert frames['Sheet1']['score'].tolist() == [1.0, 1.0, 1.0]
+        assert governor.misses == 2
+    
+    def test_missing_workspace_data(self, tmp_path):
+        """Test that a workspace without sheets is not cached."""
+        governor = MemoryGovernor()
+        assert governor.get_frames(SessionWorkspace(root=str(tmp_path))) is None
+        assert governor.stats()['sessions'] == 0
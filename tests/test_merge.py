@@ -0,0 +1,168 @@
+"""
+Unit tests for merging several files with a shared codebook.
+Run with: pytest tests/
+"""
+
+import io
+import os
+import threading
+import time
+import zipfile
+
+import pandas as pd
+import merge
+from encoder import ColumnConfig, default_column_config
+from merge import (
+    SOURCE_COLUMN, build_shared_codebook, iter_encoded_files, run_merge_pipeline, write_streamed_excel
+)
+
+
+def make_files():
+    """Two exports of the same form with a value only seen in the second."""
+    return {
+        'wave1.xlsx': pd.DataFrame({
+            'Gender': ['Male', 'Female', 'Male'],
+            'Age': [20, 30, 40],
+        }),
+        'wave2.xlsx': pd.DataFrame({
+            'Gender': ['Female', 'Female', 'Other', None],
+            'Age': [25, 35, 45, 55],
+        }),
+    }
+
+
+class TestSharedCodebook:
+    """Tests for merged value detection."""
+    
+    def test_counts_are_summed_across_files(self):
+        """Test that value order follows the combined frequency."""
+        info = build_shared_codebook(make_files())
+        
+        assert info['Gender']['unique_values'] == ['Female', 'Male', 'Other']
+        assert info['Gender']['value_counts'] == {'Female': 3, 'Male': 2, 'Other': 1}
+        assert info['Gender']['n_missing'] == 1
+        assert info['Age']['is_numeric']
+        assert info['Age'].numeric_values()['55'] == 55.0
+    
+    def test_spellings_merged_across_files(self):
+        """Test that one canonical spelling is picked over all files."""
+        files = {
+            'wave1.xlsx': pd.DataFrame({'Gender': ['male ', 'male ', 'Female']}),
+            'wave2.xlsx': pd.DataFrame({'Gender': ['Male', 'Male', 'Male', 'female']}),
+        }
+        info = build_shared_codebook(files, normalize=True)
+        
+        assert info['Gender']['unique_values'] == ['Male', 'Female']
+        assert info['Gender']['value_map'] == {'male ': 'Male', 'male': 'Male', 'female': 'Female'}
+    
+    def test_dates_in_some_files(self):
+        """Test that a column with dates in one file and text in another is merged as dates."""
+        files = {
+            'wave1.xlsx': pd.DataFrame({'Visit': pd.to_datetime(['2024-01-05', '2024-01-06'])}),
+            'wave2.xlsx': pd.DataFrame({'Visit': ['unknown', 'n/a', '2024-02-01']}),
+        }
+        info = build_shared_codebook(files)
+        assert info['Visit']['is_datetime']
+
+        configs = {'Visit': default_column_config('Visit', info['Visit'])}
+        result = run_merge_pipeline(files, configs)
+
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            merged = pd.read_excel(io.BytesIO(bundle.read('encoded_data.xlsx')))
+        assert merged['Visit'].notna().tolist() == [True, True, False, False, True]
+        assert result['verification']['Merged']['Visit']['unmapped'] == 2
+        assert result['verification']['Merged']['Visit']['issues']
+
+    def test_union_of_columns(self):
+        """Test that columns present in only one file are included."""
+        files = make_files()
+        files['wave2.xlsx']['Comment'] = ['a', 'b', 'c', 'd']
+        
+        info = build_shared_codebook(files)
+        
+        assert list(info) == ['Gender', 'Age', 'Comment']
+
+
+class TestMergePipeline:
+    """Tests for the merged output."""
+    
+    def test_shared_codes_and_source_column(self):
+        """Test that every file is coded with the same mapping."""
+        files = make_files()
+        info = build_shared_codebook(files)
+        configs = {
+            'Gender': ColumnConfig('Gender', info['Gender']['unique_values'], 'Nominal'),
+            'Age': ColumnConfig('Age', [], 'Ignore'),
+        }
+        
+        result = run_merge_pipeline(files, configs)
+        
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            merged = pd.read_excel(io.BytesIO(bundle.read('encoded_data.xlsx')))
+        assert len(merged) == 7
+        assert merged['Gender'].tolist()[:6] == [2, 1, 2, 1, 1, 3]
+        assert merged[SOURCE_COLUMN].tolist() == [1, 1, 1, 2, 2, 2, 2]
+        assert result['mappings']['Merged'][SOURCE_COLUMN] == {'wave1.xlsx': 1, 'wave2.xlsx': 2}
+        assert "'wave2.xlsx'" in result['sps_syntax']
+    
+    def test_streamed_row_count(self):
+        """Test that chunks are written one after another."""
+        chunks = [pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [3]})]
+        buffer = io.BytesIO()
+        
+        assert write_streamed_excel(chunks, ['a'], buffer) == 3
+        assert pd.read_excel(buffer)['a'].tolist() == [1, 2, 3]
+    
+    def test_merged_sheet_written_in_constant_memory(self, monkeypatch, tmp_path):
+        """Test that the pipeline writes to a temporary file in constant-memory mode."""
+        files = make_files()
+        configs = {'Gender': ColumnConfig('Gender', ['Female', 'Male', 'Other'], 'Nominal')}
+        opened = []
+        workbook = merge.xlsxwriter.Workbook
+
+        def recording_workbook(target, options):
+            opened.append((target, dict(options)))
+            return workbook(target, options)
+
+        monkeypatch.setattr(merge.xlsxwriter, 'Workbook', recording_workbook)
+        result = run_merge_pipeline(files, configs, work_dir=str(tmp_path))
+
+        [(target, options)] = opened
+        assert isinstance(target, str) and target.startswith(str(tmp_path))
+        assert options.get('constant_memory') and not options.get('in_memory')
+        assert not os.listdir(tmp_path)
+        with zipfile.ZipFile(io.BytesIO(result['bundle'])) as bundle:
+            merged = pd.read_excel(io.BytesIO(bundle.read('encoded_data.xlsx')))
+        assert merged['Gender'].tolist()[:6] == [2, 1, 2, 1, 1, 3]
+        assert merged['Age'].tolist() == [20, 30, 40, 25, 35, 45, 55]
+
+    def test_files_in_flight_are_bounded(self, monkeypatch):
+        """Test that no more than max_workers files are encoded ahead of the consumer."""
+        files = {f'wave{i}.xlsx': pd.DataFrame({'Gender': ['Male', 'Female']}) for i in range(8)}
+        configs = {'Gender': ColumnConfig('Gender', ['Male', 'Female'], 'Nominal')}
+        started = []
+        lock = threading.Lock()
+        encode = merge.apply_encoding
+
+        def slow_encoding(df, *args, **kwargs):
+            with lock:
+                started.append(df)
+            time.sleep(0.01)
+            return encode(df, *args, **kwargs)
+
+        monkeypatch.setattr(merge, 'apply_encoding', slow_encoding)
+        names = []
+        ahead = []
+        progress = []
+        for name, encoded in iter_encoded_files(
+            files, configs, ['Gender'], max_workers=2,
+            progress_callback=lambda done, total, name: progress.append(done)
+        ):
+            time.sleep(0.02)
+            with lock:
+                ahead.append(len(started) - len(names))
+            names.append(name)
+
+        assert names == list(files)
+        assert max(ahead) <= 2
+        assert progress == list(range(8))
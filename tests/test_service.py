@@ -0,0 +1,135 @@
+"""
+Unit tests for the HTTP encoding service.
+Run with: pytest tests/
+"""
+
+import base64
+import io
+import json
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+import pandas as pd
+from service import EncodingService, RequestError, create_server, parse_encode_request
+
+
+def survey_payload(**extra):
+    """JSON body for a small survey export."""
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        'Satisfaction': ['Satisfied', 'Neutral', 'Very satisfied'],
+        'Age': [20, 30, 40],
+    }).to_excel(buffer, index=False)
+    payload = {'file': base64.b64encode(buffer.getvalue()).decode('ascii'), **extra}
+    return json.dumps(payload).encode('utf-8')
+
+
+def request(url, body=None):
+    """Send a request and return (status, body)."""
+    try:
+        with urllib.request.urlopen(url, data=body, timeout=60) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+@pytest.fixture
+def running_service():
+    """Serve one worker without a queue on a free localhost port."""
+    service = EncodingService(workers=1, queue_size=0, timeout=60.0)
+    server = create_server(port=0, service=service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+class TestEncodingService:
+    """Tests for the /encode, /stats and /health endpoints."""
+    
+    def test_encode_with_default_configs(self, running_service):
+        """Test that a workbook comes back as a bundle and is counted."""
+        service, url = running_service
+        status, body = request(f"{url}/encode", survey_payload())
+        
+        assert status == 200
+        with zipfile.ZipFile(io.BytesIO(body)) as bundle:
+            assert sorted(bundle.namelist()) == ['auto_import.sps', 'codebook.json', 'encoded_data.xlsx']
+            syntax = bundle.read('auto_import.sps').decode('utf-8')
+        assert "1 'Neutral' 2 'Satisfied' 3 'Very satisfied'" in syntax
+        
+        status, body = request(f"{url}/stats")
+        stats = json.loads(body)
+        assert stats['completed'] == 1
+        assert stats['in_flight'] == 0
+        assert stats['latency_max_seconds'] > 0
+    
+    def test_encode_with_configs(self, running_service):
+        """Test that supplied configurations are used."""
+        _, url = running_service
+        configs = {'Sheet1': {
+            'Satisfaction': {
+                'column_name': 'Satisfaction',
+                'unique_values': ['Very satisfied', 'Satisfied', 'Neutral'],
+                'encoding_type': 'Ordinal',
+                'start_value': 1,
+                'sanitized_name': 'sat',
+            },
+        }}
+        status, body = request(f"{url}/encode", survey_payload(configs=configs))
+        
+        assert status == 200
+        with zipfile.ZipFile(io.BytesIO(body)) as bundle:
+            syntax = bundle.read('auto_import.sps').decode('utf-8')
+        assert "sat 1 'Very satisfied' 2 'Satisfied' 3 'Neutral'" in syntax
+    
+    def test_bad_requests(self, running_service):
+        """Test that malformed requests are answered with 400."""
+        service, url = running_service
+        assert request(f"{url}/encode", b'not json')[0] == 400
+        assert request(f"{url}/encode", survey_payload(options={'verbose': True}))[0] == 400
+        assert request(f"{url}/encode", survey_payload(options={'include_save': 'maybe'}))[0] == 400
+        assert request(f"{url}/encode", survey_payload(configs={'Other': {}}))[0] == 400
+        assert request(f"{url}/missing")[0] == 404
+        assert request(f"{url}/health") == (200, b'ok')
+    
+    def test_option_values(self):
+        """Test that option strings are parsed, not coerced with bool()."""
+        _, _, options = parse_encode_request(survey_payload(options={
+            'include_save': 'false', 'sanitize_names': 'Yes', 'split_sheets': '0', 'normalize_answers': True,
+        }))
+        
+        assert options == {
+            'include_save': False, 'sanitize_names': True, 'split_sheets': False, 'normalize_answers': True,
+        }
+        for value in (1, None, 'maybe', []):
+            with pytest.raises(RequestError):
+                parse_encode_request(survey_payload(options={'include_save': value}))
+        with pytest.raises(RequestError):
+            parse_encode_request(survey_payload(options=['include_save']))
+    
+    def test_full_queue_is_rejected(self, running_service):
+        """Test that requests beyond workers + queue get 503."""
+        service, url = running_service
+        service._slots.acquire()
+        try:
+            status, _ = request(f"{url}/encode", survey_payload())
+        finally:
+            service._slots.release()
+        
+        assert status == 503
+        assert service.stats()['rejected'] == 1
+    
+    def test_timeout(self, running_service):
+        """Test that slow requests are answered with 504."""
+        service, url = running_service
+        service.timeout = 0.001
+        status, _ = request(f"{url}/encode", survey_payload())
+        
+        assert status == 504
+        assert service.stats()['timed_out'] == 1
@@ -0,0 +1,52 @@
+"""
+Cold-start tests for the library import path.
+Run with: pytest tests/
+"""
+
+import os
+import subprocess
+import sys
+
+from startup_benchmark import measure_import
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# Upper bound for a fresh import of the library modules
+IMPORT_BUDGET_SECONDS = 0.5
+
+
+class TestLibraryImport:
+    """Tests that importing the library stays cheap."""
+    
+    def test_no_heavy_modules(self):
+        """Test that the library import path never loads streamlit, pandas or numpy."""
+        result = measure_import(runs=1, python_path=SRC_DIR)
+        
+        assert 'streamlit' not in result['loaded']
+        assert 'pandas' not in result['loaded']
+        assert 'numpy' not in result['loaded']
+        assert 'spss_prep.app' not in result['loaded']
+    
+    def test_import_time_budget(self):
+        """Test that a fresh import stays within the time budget."""
+        result = measure_import(runs=3, python_path=SRC_DIR)
+        
+        assert result['seconds'] < IMPORT_BUDGET_SECONDS
+    
+    def test_package_import_loads_no_submodules(self):
+        """Test that submodules are only imported on first access."""
+        result = measure_import(['spss_prep'], runs=1, python_path=SRC_DIR)
+        
+        assert not [name for name in result['loaded'] if name.startswith('spss_prep.')]
+    
+    def test_star_import_stays_light(self):
+        """Test that the modules in __all__ load neither streamlit nor pandas."""
+        code = "import sys\nfrom spss_prep import *\nprint(' '.join(sys.modules))"
+        env = dict(os.environ, PYTHONPATH=SRC_DIR)
+        loaded = subprocess.run(
+            [sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        
+        assert 'streamlit' not in loaded
+        assert 'pandas' not in loaded
+        assert 'spss_prep.encoder' in loaded
@@ -0,0 +1,160 @@
+"""
+Unit tests for the round-trip verification of encoded output.
+Run with: pytest tests/
+"""
+
+import time
+
+import numpy as np
+import pytest
+import pandas as pd
+import analysis as analysis_module
+from analysis import DatasetAnalysis
+from encoder import ColumnConfig, apply_encoding, detect_columns
+from jobs import run_workbook_pipeline
+from verify import code_counts, verification_issues, verify_encoding
+
+
+@pytest.fixture
+def survey():
+    """Small survey with an ordinal, a nominal and a numeric column."""
+    df = pd.DataFrame({
+        'Satisfaction': ['Low', 'High', 'Medium', None, 'High', 'Maybe'],
+        'Gender': ['F', 'M', 'F', 'M', None, 'F'],
+        'Age': ['20', '30', 'n/a', '50', '60', None],
+    })
+    configs = {
+        'Satisfaction': ColumnConfig('Satisfaction', ['Low', 'Medium', 'High'], 'Ordinal'),
+        'Gender': ColumnConfig('Gender', ['M', 'F'], 'Nominal'),
+        'Age': ColumnConfig('Age', [], 'Scale'),
+    }
+    return df, configs
+
+
+class TestVerifyEncoding:
+    """Tests for verify_encoding."""
+
+    def test_counts_and_unmapped_answers(self, survey):
+        """Test that answers without a code and non-numeric cells are reported."""
+        df, configs = survey
+        encoded, _ = apply_encoding(df, configs)
+
+        report = verify_encoding(df, encoded, configs, column_info=detect_columns(df))
+
+        assert report['Satisfaction']['before'] == 5
+        assert report['Satisfaction']['after'] == 4
+        assert report['Satisfaction']['unmapped_values'] == ['Maybe']
+        assert report['Satisfaction']['issues'] == [
+            "1 cell(s) with answers that have no code became empty: 'Maybe'"
+        ]
+        assert report['Gender'] == {
+            'type': 'Nominal', 'before': 5, 'after': 5, 'unmapped': 0, 'unmapped_values': [], 'issues': [],
+            'skipped': [],
+        }
+        assert report['Age']['unmapped_values'] == ['n/a']
+        assert verification_issues({'Sheet1': report}) == {
+            'Sheet1': {'Satisfaction': report['Satisfaction']['issues'], 'Age': report['Age']['issues']}
+        }
+
+    def test_damaged_output_detected(self, survey):
+        """Test that lost cells, wrong codes and wrong numbers in the output are found."""
+        df, configs = survey
+        encoded, _ = apply_encoding(df, configs)
+        encoded.loc[0, 'Gender'] = encoded.loc[1, 'Gender']
+        encoded.loc[2, 'Gender'] = None
+        encoded.loc[0, 'Age'] = 21
+
+        report = verify_encoding(df, encoded, configs)
+
+        assert report['Gender']['issues'] == [
+            "5 non-empty cell(s) before encoding, 4 after (expected 5)",
+            "cells per code differ from the input: code 1: 3 (expected 2), code 2: 1 (expected 3)",
+        ]
+        assert report['Age']['issues'][-1] == "sum of the numbers is 161, the input sums to 160"
+
+    def test_detection_comparison(self, survey):
+        """Test that codes are compared with detection, and that a missing detection is recorded."""
+        df, configs = survey
+        encoded, _ = apply_encoding(df, configs)
+        column_info = {**detect_columns(df), 'Gender': {'value_counts': {'M': 2, 'F': 2}}}
+
+        report = verify_encoding(df, encoded, configs, column_info=column_info)
+        assert report['Gender']['issues'] == ["cells per code differ from detection: code 2: 3 (expected 2)"]
+
+        report = verify_encoding(df, encoded, configs)
+        assert report['Gender']['issues'] == []
+        assert report['Gender']['skipped'] == ['cells per code against detection (no full detection results)']
+        assert report['Age']['skipped'] == []
+
+
+class TestCodeCounts:
+    """Tests for code_counts."""
+
+    def test_integer_and_float_columns(self):
+        """Test that empty cells are left out and wide or fractional codes are counted."""
+        assert code_counts(np.array([1, 2, 2, 5])) == ({1: 1, 2: 2, 5: 1}, 4)
+        assert code_counts(np.array([0.0, np.nan, 0.0, -3.0])) == ({-3.0: 1, 0.0: 2}, 3)
+        assert code_counts(np.array([1.5, 1e9, 1.5])) == ({1.5: 2, 1e9: 1}, 3)
+        assert code_counts(np.array([np.nan])) == ({}, 0)
+        assert code_counts(np.array([2.0, np.nan, 2.5])) == ({2.0: 1, 2.5: 1}, 2)
+
+
+class TestVerificationCost:
+    """Tests that verification stays cheap next to encoding."""
+
+    # Upper bound of verification time as a share of encoding time
+    BUDGET = 0.5
+
+    @pytest.fixture
+    def large_survey(self):
+        rng = np.random.default_rng(0)
+        answers = np.array(['Very low', 'Low', 'Medium', 'High', 'Very high', None], dtype=object)
+        df = pd.DataFrame({f'Q{i}': pd.array(rng.choice(answers, 200_000), dtype='str') for i in range(6)})
+        configs = {col: ColumnConfig(col, list(answers[:-1]), 'Ordinal') for col in df.columns}
+        return df, configs
+
+    def test_input_not_scanned_again(self, large_survey, monkeypatch):
+        """Test that the input side comes from the analysis encoding already built."""
+        df, configs = large_survey
+        analysis = DatasetAnalysis(df)
+        encoded, _ = apply_encoding(df, configs, analysis=analysis)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("input column scanned again")
+
+        monkeypatch.setattr(analysis_module.ColumnAnalysis, '__init__', fail)
+        monkeypatch.setattr(pd.Series, 'value_counts', fail)
+        report = verify_encoding(df, encoded, configs, analysis=analysis)
+
+        assert report['Q0']['before'] == df['Q0'].notna().sum()
+        assert verification_issues({'Sheet1': report}) == {}
+
+    def test_within_budget(self, large_survey):
+        """Test that verifying costs a fraction of encoding."""
+        df, configs = large_survey
+        encode_times, verify_times = [], []
+        for _ in range(3):
+            analysis = DatasetAnalysis(df)
+            start = time.perf_counter()
+            encoded, _ = apply_encoding(df, configs, analysis=analysis)
+            encode_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            verify_encoding(df, encoded, configs, analysis=analysis)
+            verify_times.append(time.perf_counter() - start)
+
+        assert min(verify_times) < self.BUDGET * min(encode_times)
+
+
+class TestPipelineVerification:
+    """Tests for the check every run carries."""
+
+    def test_clean_run(self, survey):
+        """Test that a run with every answer mapped reports no discrepancies."""
+        df, configs = survey
+        df = df[df['Satisfaction'] != 'Maybe'].assign(Age=[20, 30, 40, 50, 60])
+
+        result = run_workbook_pipeline({'Sheet1': df}, {'Sheet1': configs},
+                                       column_info={'Sheet1': detect_columns(df)})
+
+        assert set(result['verification']['Sheet1']) == {'Satisfaction', 'Gender', 'Age'}
+        assert verification_issues(result['verification']) == {}
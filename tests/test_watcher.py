@@ -0,0 +1,107 @@
+"""
+Unit tests for the watch-folder daemon.
+Run with: pytest tests/
+"""
+
+import json
+import os
+import zipfile
+from concurrent.futures import Future
+
+import pytest
+import pandas as pd
+from cli import main as cli_main
+from watcher import FolderWatcher, match_config, output_path
+
+
+def write_survey(path, columns=('Satisfaction', 'Age')):
+    """Write a small survey export."""
+    data = {
+        'Satisfaction': ['Satisfied', 'Neutral', 'Very satisfied', 'Dissatisfied'],
+        'Age': [20, 30, 40, 50],
+        'City': ['A', 'B', 'A', 'B'],
+    }
+    pd.DataFrame({col: data[col] for col in columns}).to_excel(path, index=False)
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    """Watcher on an empty folder that encodes as soon as a file is seen twice."""
+    folder = tmp_path / 'exports'
+    folder.mkdir()
+    watcher = FolderWatcher(str(folder), workers=1, settle=0.0)
+    yield watcher
+    watcher.shutdown()
+
+
+class TestMatchConfig:
+    """Tests for matching exports to saved configurations."""
+    
+    def test_match_by_columns(self, tmp_path):
+        """Test that only configurations with the export's columns are used, by name first."""
+        survey = str(tmp_path / 'survey.xlsx')
+        write_survey(survey)
+        cli_main([survey, '--write-config', str(tmp_path / 'other.json')])
+        cli_main([survey, '--write-config', str(tmp_path / 'survey.json')])
+        write_survey(str(tmp_path / 'wide.xlsx'), ('Satisfaction', 'Age', 'City'))
+        cli_main([str(tmp_path / 'wide.xlsx'), '--write-config', str(tmp_path / 'wide.json')])
+        frames = {'Sheet1': pd.read_excel(survey)}
+        paths = sorted(str(p) for p in tmp_path.glob('*.json'))
+        
+        path, configs = match_config(frames, paths, 'survey')
+        assert os.path.basename(path) == 'survey.json'
+        assert set(configs['Sheet1']) == {'Satisfaction', 'Age'}
+        
+        path, _ = match_config(frames, paths, 'survey_2026_10_19')
+        assert os.path.basename(path) == 'other.json'
+        
+        assert match_config(frames, [str(tmp_path / 'wide.json')], 'survey') == (None, None)
+
+
+class TestFolderWatcher:
+    """Tests for polling, debouncing and encoding."""
+    
+    def test_encodes_settled_export_once(self, watcher):
+        """Test that an export is encoded with its saved configuration after it settled."""
+        survey = os.path.join(watcher.folder, 'survey.xlsx')
+        config_path = os.path.join(watcher.folder, 'survey.json')
+        write_survey(survey)
+        cli_main([survey, '--write-config', config_path, '-o', os.path.join(watcher.folder, 'x.zip')])
+        os.remove(os.path.join(watcher.folder, 'x.zip'))
+        with open(config_path, encoding='utf-8') as f:
+            configs = json.load(f)
+        configs['Sheet1']['Satisfaction']['direction'] = 'Descending'
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(configs, f)
+        
+        assert watcher.scan() == []
+        assert watcher.scan() == [survey]
+        assert watcher.wait_idle(timeout=60)
+        
+        with zipfile.ZipFile(output_path(survey)) as bundle:
+            syntax = bundle.read('auto_import.sps').decode('utf-8-sig')
+        assert "1 'Very satisfied'" in syntax
+        assert watcher.stats()['completed'] == 1
+        assert watcher.scan() == []
+    
+    def test_incomplete_file_waits(self, watcher):
+        """Test that a file that is not a complete workbook yet is not submitted."""
+        partial = os.path.join(watcher.folder, 'survey.xlsx')
+        with open(partial, 'wb') as f:
+            f.write(b'PK\x03\x04 still copying')
+        open(os.path.join(watcher.folder, '~$survey.xlsx'), 'wb').close()
+        
+        assert watcher.scan() == []
+        assert watcher.scan() == []
+        assert watcher.stats()['settling'] == 1
+    
+    def test_wait_idle_times_out(self, watcher):
+        """Test that wait_idle gives up on an export that outlasts the timeout."""
+        running = Future()
+        watcher._pending[os.path.join(watcher.folder, 'slow.xlsx')] = running
+        
+        assert watcher.wait_idle(timeout=0.05) is False
+        
+        running.set_result(None)
+        watcher._pending.clear()
+        assert watcher.wait_idle(timeout=0.05) is True
@@ -0,0 +1,168 @@
+"""
+Unit tests for per-session output workspaces.
+Run with: pytest tests/
+"""
+
+import os
+import time
+
+import pytest
+from workspace import SessionWorkspace, WorkspaceQuotaExceeded, cleanup_workspaces
+
+
+class TestSessionWorkspace:
+    """Tests for session workspace isolation and quotas."""
+    
+    def test_sessions_get_separate_paths(self, tmp_path):
+        """Test that two sessions never share an output path."""
+        a = SessionWorkspace(root=str(tmp_path))
+        b = SessionWorkspace(root=str(tmp_path))
+        
+        assert a.file_path('encoded_data.xlsx') != b.file_path('encoded_data.xlsx')
+        assert os.path.dirname(a.file_path('x')) == a.path
+    
+    def test_file_path_strips_directories(self, tmp_path):
+        """Test that file names cannot escape the workspace."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        assert ws.file_path('../../etc/passwd') == os.path.join(ws.path, 'passwd')
+    
+    def test_quota(self, tmp_path):
+        """Test that exceeding the session quota raises."""
+        ws = SessionWorkspace(root=str(tmp_path), quota_bytes=10)
+        ws.ensure_quota()
+        with open(ws.file_path('big.bin'), 'wb') as f:
+            f.write(b'x' * 100)
+        with pytest.raises(WorkspaceQuotaExceeded):
+            ws.ensure_quota()
+
+    def test_quota_checked_before_writing(self, tmp_path):
+        """Test that oversized sheets and files are refused before they reach the disk."""
+        import pandas as pd
+        
+        ws = SessionWorkspace(root=str(tmp_path), quota_bytes=4000)
+        ws.save_frames({'Sheet1': pd.DataFrame({'a': [1.0] * 100})})
+        with pytest.raises(WorkspaceQuotaExceeded):
+            ws.save_frames({'Sheet1': pd.DataFrame({'a': [1.0] * 1000})})
+        assert len([name for name in os.listdir(ws.path) if name.startswith('frames-')]) == 2
+        # Replacing the saved sheets only counts the difference
+        ws.save_frames({'Sheet1': pd.DataFrame({'b': [2.0] * 100})})
+        
+        usage = ws.usage_bytes()
+        ws.save_bytes('bundle.zip', b'x' * (4000 - usage))
+        ws.save_bytes('bundle.zip', b'y' * (4000 - usage))
+        with pytest.raises(WorkspaceQuotaExceeded):
+            ws.save_bytes('bundle.zip', b'z' * (4001 - usage))
+        with open(ws.file_path('bundle.zip'), 'rb') as f:
+            assert f.read(1) == b'y'
+    
+    @pytest.mark.skipif(not hasattr(os, 'getuid'), reason="POSIX permissions")
+    def test_root_is_private(self, tmp_path, monkeypatch):
+        """Test that the root is created private and a foreign or linked root is refused."""
+        root = tmp_path / 'sessions'
+        ws = SessionWorkspace(root=str(root))
+        assert os.stat(root).st_mode & 0o777 == 0o700
+        assert os.stat(ws.path).st_mode & 0o077 == 0
+        
+        os.chmod(root, 0o777)
+        SessionWorkspace(root=str(root))
+        assert os.stat(root).st_mode & 0o777 == 0o700
+        
+        os.symlink(root, tmp_path / 'link')
+        with pytest.raises(PermissionError):
+            SessionWorkspace(root=str(tmp_path / 'link'))
+        
+        monkeypatch.setattr(os, 'getuid', lambda: os.stat(root).st_uid + 1)
+        with pytest.raises(PermissionError):
+            SessionWorkspace(root=str(root))
+
+
+class TestCleanupWorkspaces:
+    """Tests for TTL and total-quota cleanup."""
+    
+    def test_expired_workspaces_removed(self, tmp_path):
+        """Test that idle workspaces past the TTL are deleted."""
+        old = SessionWorkspace(root=str(tmp_path))
+        fresh = SessionWorkspace(root=str(tmp_path))
+        stale_time = time.time() - 3600
+        os.utime(os.path.join(old.path, '.last_used'), (stale_time, stale_time))
+        
+        removed = cleanup_workspaces(str(tmp_path), ttl_seconds=60)
+        
+        assert removed == [old.session_id]
+        assert os.path.isdir(fresh.path)
+    
+    def test_total_quota_evicts_least_recently_used(self, tmp_path):
+        """Test that the oldest workspaces go first when over the total quota."""
+        old = SessionWorkspace(root=str(tmp_path))
+        new = SessionWorkspace(root=str(tmp_path))
+        for ws in (old, new):
+            with open(ws.file_path('data.bin'), 'wb') as f:
+                f.write(b'x' * 100)
+        earlier = time.time() - 30
+        os.utime(os.path.join(old.path, '.last_used'), (earlier, earlier))
+        
+        removed = cleanup_workspaces(str(tmp_path), ttl_seconds=3600, total_quota_bytes=150)
+        
+        assert removed == [old.session_id]
+        assert os.path.isdir(new.path)
+
+
+class TestSessionData:
+    """Tests for spilling session data to the workspace and resuming it."""
+    
+    def test_frames_round_trip(self, tmp_path):
+        """Test that spilled sheets load back with the same values and dtypes."""
+        import pandas as pd
+        from encoder import compact_text_columns
+        
+        df = compact_text_columns(pd.DataFrame({
+            'Answer': pd.Series(['Agree', 'Disagree', None], dtype=object),
+            'Mixed': pd.Series([1, 'two', None], dtype=object),
+            2024: [1.5, 2.5, None],
+        }))
+        ws = SessionWorkspace(root=str(tmp_path))
+        ws.save_frames({'Form A': df, 'Form B': df.set_index(pd.Index([7, 8, 9]))})
+        
+        frames = SessionWorkspace.resume(ws.session_id, root=str(tmp_path)).load_frames()
+        
+        assert list(frames) == ['Form A', 'Form B']
+        pd.testing.assert_frame_equal(frames['Form A'], df)
+        assert list(frames['Form B'].index) == [7, 8, 9]
+        assert frames['Form A']['Mixed'].tolist()[:2] == [1, 'two']
+    
+    def test_save_frames_replaces_previous_files(self, tmp_path):
+        """Test that a new upload does not leave the old sheets behind."""
+        import pandas as pd
+        
+        ws = SessionWorkspace(root=str(tmp_path))
+        ws.save_frames({'Sheet1': pd.DataFrame({'a': [1.0, 2.0]})})
+        ws.save_frames({'Sheet1': pd.DataFrame({'b': [3.0]})})
+        
+        assert len([name for name in os.listdir(ws.path) if name.startswith('frames-')]) == 2
+        assert list(ws.load_frames()['Sheet1'].columns) == ['b']
+    
+    def test_missing_data_loads_as_none(self, tmp_path):
+        """Test that a fresh workspace has nothing to resume."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        assert not ws.has_frames()
+        assert ws.load_frames() is None
+        assert ws.load_object('state.pkl') is None
+        assert ws.load_json('state.json') is None
+    
+    def test_objects_and_json_round_trip(self, tmp_path):
+        """Test that configurations and detection results are saved alongside."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        ws.save_json('configs.json', {'Sheet1': {'Q1': {'encoding_type': 'Ordinal'}}})
+        ws.save_object('state.pkl', {2024: ('a', 'b')})
+        
+        assert ws.load_json('configs.json') == {'Sheet1': {'Q1': {'encoding_type': 'Ordinal'}}}
+        assert ws.load_object('state.pkl') == {2024: ('a', 'b')}
+    
+    def test_resume_rejects_unknown_ids(self, tmp_path):
+        """Test that only existing, well-formed session ids are reopened."""
+        ws = SessionWorkspace(root=str(tmp_path))
+        
+        assert SessionWorkspace.resume(ws.session_id, root=str(tmp_path)).path == ws.path
+        assert SessionWorkspace.resume('0' * 32, root=str(tmp_path)) is None
+        assert SessionWorkspace.resume('../etc', root=str(tmp_path)) is None
+        assert SessionWorkspace.resume(None, root=str(tmp_path)) is None